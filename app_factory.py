@@ -0,0 +1,234 @@
+"""
+App Factory
+Builds one FastAPI app from the subsystem routers (chat, kb, sat, mock_tests,
+generation) on a shared service container. Every service is built once per
+process: on first use, or at startup for the names listed in warmup.
+
+Usage:
+    python app_factory.py                        # all subsystems on API_SERVER_PORT
+    python serve.py app_factory:app --workers 4  # production
+"""
+
+import time
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import metrics
+import services
+import tracing
+from config import API_SERVER_PORT, REQUEST_DEADLINE, SERVER_WARMUP, HEALTH_REQUIRED
+from health import UP, UNKNOWN, health_monitor
+from resilience import breaker_states, deadline_scope
+from routers import chat, generation, kb, mock_tests, sat
+from runtime_settings import runtime_settings
+from service_registry import registry
+
+SUBSYSTEMS = {
+    'chat': chat.router,
+    'kb': kb.router,
+    'sat': sat.router,
+    'mock_tests': mock_tests.router,
+    'generation': generation.router,
+}
+
+
+def mock_test_status() -> Dict[str, Any]:
+    """Mock test MCP session pool state (not connected until first use or warm-up)."""
+    if not registry.is_initialized('mock_test_client'):
+        return {"mcp_connected": False, "mcp_sessions": []}
+    client = registry.get('mock_test_client')
+    return {"mcp_connected": client.is_connected(), "mcp_sessions": client.pool.get_stats()}
+
+
+class RequestContextMiddleware:
+    """
+    Per-request plumbing in one pure ASGI layer.
+
+    This layer:
+    - opens the request's root span, whose trace ID is returned in X-Trace-Id
+    - times the request, labelled by route template rather than raw path
+    - picks up model swaps and knowledge base updates made by other workers
+    - gives the request a deadline budget that every downstream call draws from
+
+    It runs in the request's own task and passes the response through
+    untouched apart from the header. BaseHTTPMiddleware would add a task and
+    a streaming wrapper per layer.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method, path = scope["method"], scope["path"]
+        status = 500
+        metrics.REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            with tracing.span(
+                f"{method} {path}",
+                tracing.SPAN_KIND_SERVER,
+                traceparent=Headers(scope=scope).get("traceparent"),
+                **{'http.method': method, 'http.target': path}
+            ) as root:
+                async def send_with_trace_id(message: Message):
+                    nonlocal status
+                    if message["type"] == "http.response.start":
+                        status = message["status"]
+                        if root is not None:
+                            MutableHeaders(scope=message).append("X-Trace-Id", root.trace_id)
+                    await send(message)
+
+                await runtime_settings.apoll()
+                with deadline_scope(REQUEST_DEADLINE):
+                    await self.app(scope, receive, send_with_trace_id)
+
+                if root is not None:
+                    # The router has stored the matched route in the scope by now
+                    route = getattr(scope.get("route"), "path", None)
+                    if route:
+                        root.name = f"{method} {route}"
+                        root.set_attribute('http.route', route)
+                    root.set_attribute('http.status_code', status)
+                    if status >= 500:
+                        root.set_error(f"HTTP {status}")
+        finally:
+            metrics.REQUESTS_IN_FLIGHT.dec()
+            endpoint = getattr(scope.get("route"), "path", None) or "unmatched"
+            metrics.observe_request(method, endpoint, status, time.perf_counter() - start)
+
+
+def create_app(
+    subsystems: Iterable[str] = tuple(SUBSYSTEMS),
+    warmup: Optional[Iterable[str]] = None,
+    required: Optional[Iterable[str]] = None,
+    title: str = "SAT Practice API",
+    description: str = "REST API for SAT Practice with RAG, Internet Search, YouTube and Mock Tests",
+    version: str = "3.0.0",
+    cors_origins: Sequence[str] = ("*",)
+) -> FastAPI:
+    """
+    Build an API app.
+
+    Args:
+        subsystems: Routers to mount (keys of SUBSYSTEMS)
+        warmup: Services to build at startup (default SERVER_WARMUP; "all"
+            for every registered service); the rest are built on first use
+        required: Dependencies that must be up for /health/ready (default
+            HEALTH_REQUIRED)
+        title: App title
+        description: App description
+        version: App version
+        cors_origins: Allowed CORS origins
+
+    Returns:
+        FastAPI app
+    """
+    subsystems = list(subsystems)
+    warmup = list(SERVER_WARMUP if warmup is None else warmup)
+    required = list(HEALTH_REQUIRED if required is None else required)
+    if "all" in warmup:
+        warmup = registry.names()
+
+    app = FastAPI(title=title, description=description, version=version)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=list(cors_origins),
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Trace-Id"],
+    )
+
+    app.add_middleware(RequestContextMiddleware)
+
+    @app.on_event("startup")
+    async def startup_event():
+        """Start probing dependencies and build the warm-up services."""
+        health_monitor.start()
+        await services.warm_up(warmup)
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        """Close MCP sessions and pooled Gemini connections, export pending traces."""
+        await health_monitor.stop()
+        await services.shutdown()
+        tracing.flush()
+
+    @app.get("/")
+    async def root():
+        """Root endpoint."""
+        return {
+            "message": title,
+            "version": version,
+            "status": "running",
+            "subsystems": subsystems
+        }
+
+    @app.get("/api/health")
+    async def health_check():
+        """Health check endpoint (last background probe, never probes itself)."""
+        dependencies = health_monitor.snapshot()
+        ollama_status = dependencies['ollama']
+        status = {
+            "subsystems": subsystems,
+            "services": registry.initialized(),
+            "dependencies": dependencies,
+            "circuit_breakers": breaker_states()
+        }
+        if 'mock_tests' in subsystems or 'generation' in subsystems:
+            status.update(mock_test_status())
+        if ollama_status['status'] == UNKNOWN:
+            return {"status": "starting", "ollama_connected": False, **status}
+        if ollama_status['status'] == UP:
+            return {
+                "status": "healthy",
+                "ollama_connected": True,
+                "available_models": ollama_status.get('available_models', 0),
+                **status
+            }
+        return {
+            "status": "unhealthy",
+            "ollama_connected": False,
+            "error": ollama_status.get('error', ollama_status['status']),
+            **status
+        }
+
+    @app.get("/health/live")
+    async def liveness():
+        """Liveness probe: the worker's event loop is answering."""
+        return {"status": "alive"}
+
+    @app.get("/health/ready")
+    async def readiness():
+        """Readiness probe: every required dependency was up at the last check."""
+        ready, failing = health_monitor.readiness(required)
+        if not ready:
+            return JSONResponse(status_code=503, content={"status": "not_ready", "failing": failing})
+        return {"status": "ready"}
+
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        """Prometheus metrics."""
+        body, content_type = metrics.render()
+        return Response(content=body, media_type=content_type)
+
+    for name in subsystems:
+        app.include_router(SUBSYSTEMS[name])
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=API_SERVER_PORT)
@@ -0,0 +1,125 @@
+"""
+End-to-end check for the mock test crawler
+Serves listing pages from a local fixture server (ETag + Last-Modified,
+answers conditional GETs with 304) and crawls it cold, warm, and after a
+page changes, reporting bytes downloaded and the per-host request peak.
+
+Usage:
+    python bench_crawler.py [--pages 8] [--tests-per-page 20] [--latency 0.05]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from mock_test_crawler import MockTestCrawler, ResponseCache
+from sat_mock_test_mcp import SATMockTestMCP, MockTestCatalog
+
+
+def _listing_page(page: int, tests: int, version: int) -> str:
+    links = "\n".join(
+        f'<li><a href="/tests/{page}/{i}" title="Full-length digital SAT, {98 + version} questions">'
+        f'Practice Test {i + 1} (Math and Reading & Writing)</a></li>'
+        for i in range(tests)
+    )
+    filler = "<p>" + "Study tips and course information. " * 200 + "</p>"
+    return f"<html><body><nav><a href='/'>Home</a></nav>{filler}<ul>{links}</ul></body></html>"
+
+
+def start_fixture_server(pages: int, tests_per_page: int, latency: float) -> ThreadingHTTPServer:
+    """Start a fixture server; bump server.versions[page] to change a page."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with server.lock:
+                server.active += 1
+                server.peak = max(server.peak, server.active)
+            try:
+                time.sleep(latency)
+                page = int(self.path.strip("/").split("/")[-1])
+                version = server.versions.get(page, 0)
+                body = _listing_page(page, tests_per_page, version).encode()
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", formatdate(server.started, usegmt=True))
+                self.end_headers()
+                self.wfile.write(body)
+                server.bytes_sent += len(body)
+            finally:
+                with server.lock:
+                    server.active -= 1
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.lock = threading.Lock()
+    server.active = server.peak = server.bytes_sent = 0
+    server.versions = {}
+    server.started = time.time()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run(args):
+    server = start_fixture_server(args.pages, args.tests_per_page, args.latency)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    client = SATMockTestMCP()
+    client.sources = {
+        f"fixture_{i}": {'base_url': base_url, 'sat_path': f"/sat/{i}", 'name': f"Fixture {i}"}
+        for i in range(args.pages)
+    }
+    catalog_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+    catalog_file.write('{"tests": []}')
+    catalog_file.close()
+    catalog = MockTestCatalog(path=catalog_file.name)
+    crawler = MockTestCrawler(
+        client=client,
+        catalog=catalog,
+        cache=ResponseCache(tempfile.mkdtemp(prefix="crawl_cache_")),
+        per_host_limit=args.per_host,
+        min_delay=args.min_delay
+    )
+
+    for label in ("cold", "warm", "one page changed"):
+        if label == "one page changed":
+            server.versions[0] = 1
+        sent_before = server.bytes_sent
+        start = time.perf_counter()
+        summary = await crawler.crawl()
+        elapsed = time.perf_counter() - start
+        print(f"{label:17} fetched={summary['fetched']} not_modified={summary['not_modified']} "
+              f"failed={summary['failed']} bytes={server.bytes_sent - sent_before} "
+              f"catalog={len(catalog.all())} in {elapsed:.2f}s")
+
+    print(f"Per-host peak:    {server.peak} (limit {args.per_host})")
+    await crawler.close()
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl a local fixture server")
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--tests-per-page", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fixture seconds per request")
+    parser.add_argument("--per-host", type=int, default=2)
+    parser.add_argument("--min-delay", type=float, default=0.0, help="Seconds between requests to a host")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark for question generation backends
+Runs GeminiSATGenerator with the Ollama backend against a local stand-in
+server so batching, validation and top-up can be timed without a GPU.
+
+Usage:
+    python bench_generation.py [--tests 10] [--count 54] [--latency 0.5]
+    python bench_generation.py --host http://localhost:11434   # real Ollama
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from gemini_generator import GeminiSATGenerator
+from generation_backends import OllamaBackend
+
+WORDS = ("ratio slope line circle triangle angle median survey rate percent "
+         "function graph equation value table sample volume area mean data").split()
+
+
+def _fake_question(i: int, reading: bool) -> dict:
+    words = " ".join(random.choice(WORDS) for _ in range(12))
+    question = {
+        "id": i + 1,
+        "question": f"Which choice about {words} is correct?",
+        "options": [f"{letter}) {random.choice(WORDS)} {random.randint(1, 99)}" for letter in "ABCD"],
+        "correct": random.choice("ABCD"),
+        "topic": "Benchmark",
+        "difficulty": random.choice(["Easy", "Medium", "Hard"]),
+        "explanation": "Step 1: ..."
+    }
+    if reading:
+        question["passage"] = " ".join(random.choice(WORDS) for _ in range(60))
+    return question
+
+
+def start_stand_in_server(latency: float, bad_rate: float) -> ThreadingHTTPServer:
+    """Start a minimal Ollama /api/chat stand-in on a free port."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            prompt = body["messages"][-1]["content"]
+            count = int(re.search(r"Create (\d+)", prompt).group(1))
+            reading = "reading" in prompt.lower() or "english" in prompt.lower()
+            questions = [_fake_question(i, reading) for i in range(count)]
+            for q in questions:
+                if random.random() < bad_rate:
+                    q["options"] = q["options"][:3]
+            time.sleep(latency)
+            payload = json.dumps({
+                "model": body.get("model"),
+                "created_at": "2024-01-01T00:00:00Z",
+                "message": {"role": "assistant", "content": json.dumps({"questions": questions})},
+                "done": True
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run(args):
+    server = None
+    host = args.host
+    if not host:
+        server = start_stand_in_server(args.latency, args.bad_rate)
+        host = f"http://127.0.0.1:{server.server_address[1]}"
+
+    generator = GeminiSATGenerator(backend=OllamaBackend(host=host, max_concurrency=args.concurrency))
+    generator.cache_dir = tempfile.mkdtemp(prefix="bench_cache_")
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        generator.generate_questions(args.test_type, args.count) for _ in range(args.tests)
+    ))
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(r) for r in results)
+    print(f"Backend:        ollama @ {host}")
+    print(f"Tests:          {args.tests} x {args.count} ({args.test_type})")
+    print(f"Questions:      {total} in {elapsed:.2f}s ({total / elapsed:.1f} q/s)")
+    print(f"Short tests:    {sum(1 for r in results if len(r) < args.count)}")
+    print(f"Validator:      {generator.validator.get_stats()}")
+
+    if server:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark question generation")
+    parser.add_argument("--host", help="Ollama URL (default: start a local stand-in server)")
+    parser.add_argument("--test-type", default="sat-math")
+    parser.add_argument("--tests", type=int, default=10)
+    parser.add_argument("--count", type=int, default=44)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5, help="Stand-in seconds per batch")
+    parser.add_argument("--bad-rate", type=float, default=0.1, help="Stand-in malformed item rate")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
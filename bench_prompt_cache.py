@@ -0,0 +1,124 @@
+"""
+Benchmark for prompt prefix reuse in multi-turn chat
+Runs one chat session of follow-up questions, each with fresh retrieved
+context, through OllamaAgent (stable prefix: system, history, then context
+and question) and through a context-first layout (context in the system
+message, so the prefix changes every turn), and reports Ollama's
+prompt_eval_count and prompt_eval_duration per turn.
+
+Usage:
+    python bench_prompt_cache.py [--turns 8] [--model llama3.2]
+    python bench_prompt_cache.py --dry-run    # no Ollama: shared prefix per turn
+"""
+
+import argparse
+import json
+import statistics
+from typing import Any, Dict, List
+
+import ollama
+
+import ollama_agent
+import prompt_layout
+from config import AGENT_INSTRUCTIONS, OLLAMA_MODEL
+from conversation_memory import ConversationMemory
+from ollama_agent import OllamaAgent
+
+TOPICS = ("linear equations", "quadratic functions", "ratios", "percent change", "circle area",
+          "systems of equations", "exponential growth", "probability", "median and mean", "slope")
+
+
+def _context(turn: int) -> str:
+    topic = TOPICS[turn % len(TOPICS)]
+    passage = " ".join(f"Fact {i} about {topic}: worked example {turn}.{i} with its steps." for i in range(25))
+    return f"\n\nRelevant Information:\n\n[1] {passage}\n"
+
+
+def _question(turn: int) -> str:
+    return f"Follow-up {turn}: how does this apply to {TOPICS[turn % len(TOPICS)]}?"
+
+
+def _shared_prefix(a: str, b: str) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class _Recorder:
+    """Chat client stand-in (dry run) or pass-through (live) that keeps each request."""
+
+    def __init__(self, live: bool):
+        self.live = live
+        self.requests: List[Dict[str, Any]] = []
+        self.responses: List[Any] = []
+
+    def chat(self, **request):
+        self.requests.append(request)
+        if self.live:
+            response = ollama.chat(**request)
+        else:
+            response = {'message': {'content': "Answer: " + "step " * 40}, 'done': True}
+        self.responses.append(response)
+        return response
+
+
+def run_stable(turns: int, model: str, recorder: _Recorder):
+    agent = OllamaAgent(model=model, use_rag=False, memory=ConversationMemory(spill_path=None))
+    ollama_agent.client_for = lambda host: recorder
+    for turn in range(turns):
+        agent.chat(_question(turn), context=_context(turn), session_id="bench")
+
+
+def run_context_first(turns: int, model: str, recorder: _Recorder):
+    memory = ConversationMemory(spill_path=None)
+    agent = OllamaAgent(model=model, use_rag=False, memory=memory)
+    for turn in range(turns):
+        request = agent._chat_request(_question(turn), None, "bench")
+        request["messages"][0]["content"] = AGENT_INSTRUCTIONS + _context(turn)
+        response = recorder.chat(**request)
+        memory.add_turn("bench", _question(turn), response['message']['content'])
+
+
+def report(name: str, requests: List[Dict[str, Any]], responses: List[Any]):
+    print(f"\n{name}")
+    previous = ""
+    durations = []
+    for turn, request in enumerate(requests):
+        prompt = json.dumps(request["messages"])
+        shared = _shared_prefix(previous, prompt)
+        line = f"  turn {turn}: prompt {len(prompt):6d} chars, shared prefix {shared:6d} ({shared / len(prompt):4.0%})"
+        if responses:
+            response = responses[turn]
+            prefill_ms = (response.get('prompt_eval_duration') or 0) / 1e6
+            line += f", prompt_eval_count {response.get('prompt_eval_count')}, prompt_eval {prefill_ms:7.1f} ms"
+            if turn:
+                durations.append(prefill_ms)
+        print(line)
+        previous = prompt
+    if durations:
+        print(f"  follow-up turns: median prompt_eval {statistics.median(durations):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--model", default=OLLAMA_MODEL)
+    parser.add_argument("--dry-run", action="store_true", help="Do not call Ollama; report shared prefixes only")
+    args = parser.parse_args()
+
+    for name, run in (("context first (prefix changes every turn)", run_context_first),
+                      ("stable prefix (system, history, then context and question)", run_stable)):
+        recorder = _Recorder(live=not args.dry_run)
+        if recorder.live:
+            # Each layout gets its own cache: evaluate something unrelated first
+            ollama.chat(model=args.model, messages=[{"role": "user", "content": "Reset."}],
+                        options={"num_predict": 1}, **prompt_layout.request_options())
+        run(args.turns, args.model, recorder)
+        report(name, recorder.requests, recorder.responses if recorder.live else [])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Load test for the production server
+Starts serve.py with 1, 2, 4... workers and drives one endpoint with a
+fixed number of concurrent clients, reporting throughput and latency per
+worker count.
+
+Usage:
+    python bench_server.py [--app sat_api_server:app] [--path /api/mock-tests]
+                           [--workers 1 2 4] [--concurrency 64] [--duration 10]
+"""
+
+import argparse
+import asyncio
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(url: str, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.25)
+    raise TimeoutError(f"server at {url} did not start")
+
+
+async def drive(url: str, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    stop_at = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        async def user():
+            nonlocal errors
+            while time.monotonic() < stop_at:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    if response.status_code != 200:
+                        errors += 1
+                        continue
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0.0
+    }
+
+
+async def run(args):
+    print(f"{args.app} GET {args.path}, {args.concurrency} concurrent clients, {args.duration:.0f}s per run")
+    baseline = None
+    for workers in args.workers:
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "serve.py", args.app, "--workers", str(workers),
+             "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            stdout=subprocess.DEVNULL
+        )
+        try:
+            url = f"http://127.0.0.1:{port}{args.path}"
+            await wait_ready(url)
+            await drive(url, args.concurrency, 2.0)  # warm every worker
+            result = await drive(url, args.concurrency, args.duration)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        baseline = baseline or result['rps']
+        print(f"workers={workers:<3} {result['rps']:8.0f} req/s  x{result['rps'] / baseline:4.2f}  "
+              f"p50={result['p50_ms']:6.1f} ms  p99={result['p99_ms']:6.1f} ms  errors={result['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure throughput scaling with serve.py workers")
+    parser.add_argument("--app", default="sat_api_server:app")
+    parser.add_argument("--path", default="/api/mock-tests")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Startup benchmark for the MCP server
+Measures cold start to the first list_tools response in a fresh interpreter,
+the way an MCP host pays for it when it spawns the server per session.
+
+Usage:
+    python bench_startup.py [--runs 5]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import time
+start = time.perf_counter()
+import asyncio
+import mcp_server
+imported = time.perf_counter()
+from fastmcp import Client
+from service_registry import registry
+
+async def list_tools():
+    async with Client(mcp_server.mcp) as client:
+        return await client.list_tools()
+
+tools = asyncio.run(list_tools())
+done = time.perf_counter()
+print(__import__("json").dumps({
+    "import_s": imported - start,
+    "list_tools_s": done - start,
+    "tools": len(tools),
+    "services_built": registry.initialized()
+}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MCP server cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for _ in range(args.runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE],
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        results.append(json.loads(out))
+
+    print(f"Runs:                 {args.runs}")
+    print(f"Tools listed:         {results[0]['tools']}")
+    print(f"Import (median):      {statistics.median(r['import_s'] for r in results) * 1000:.0f} ms")
+    print(f"list_tools (median):  {statistics.median(r['list_tools_s'] for r in results) * 1000:.0f} ms")
+    print(f"Services built:       {results[0]['services_built'] or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,12 +14,35 @@ load_dotenv()
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
 OLLAMA_EMBEDDING_MODEL = os.getenv("OLLAMA_EMBEDDING_MODEL", "nomic-embed-text")
+# Chat backends (comma-separated hosts); each chat session is pinned to one so
+# follow-up turns hit the KV cache it holds. Empty: the default Ollama client
+OLLAMA_BACKENDS = [h.strip() for h in os.getenv("OLLAMA_BACKENDS", "").split(",") if h.strip()]
+# How long Ollama keeps a model (and its prompt cache) loaded after a chat call
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
 
 # RAG Configuration
 VECTOR_STORE_TYPE = os.getenv("VECTOR_STORE_TYPE", "chroma")
 CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "./chroma_db")
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+# Chunks embedded per Ollama call during ingestion
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# Gemini Configuration
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro")
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "64"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "120"))
+
+# Question Generation Configuration
+# "gemini", "ollama" or "auto" (Gemini when GEMINI_API_KEY is set, otherwise local Ollama)
+QUESTION_BACKEND = os.getenv("QUESTION_BACKEND", "auto")
+# Estimated Jaccard similarity above which two generated questions count as the same item
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.6"))
+# Cached question bank size per test type, and the unseen fraction that triggers growth
+QUESTION_BANK_MAX = int(os.getenv("QUESTION_BANK_MAX", "1000"))
+POOL_GROWTH_THRESHOLD = float(os.getenv("POOL_GROWTH_THRESHOLD", "0.2"))
+EXPOSURE_DB_PATH = os.getenv("EXPOSURE_DB_PATH", "./data/exposure.db")
 
 # Agent Configuration
 AGENT_NAME = os.getenv("AGENT_NAME", "StradsOllamaAgent")
@@ -30,6 +53,48 @@ Keep answers brief and to the point."""
 KNOWLEDGE_BASE_NAME = os.getenv("KNOWLEDGE_BASE_NAME", "StradsOllamaKB")
 DATA_DIR = os.getenv("DATA_DIR", "./data")
 
+# Mock Test Catalog (reloaded when the file changes)
+MOCK_TEST_CATALOG_PATH = os.getenv("MOCK_TEST_CATALOG_PATH", os.path.join(DATA_DIR, "mock_tests.json"))
+MOCK_TEST_CATALOG_RELOAD_INTERVAL = float(os.getenv("MOCK_TEST_CATALOG_RELOAD_INTERVAL", "2"))
+# Crawled listings, shared by every worker and reloaded like the catalog
+MOCK_TEST_CRAWLED_PATH = os.getenv("MOCK_TEST_CRAWLED_PATH", os.path.join(DATA_DIR, "mock_tests_crawled.json"))
+MOCK_TEST_CRAWL_CACHE_DIR = os.getenv("MOCK_TEST_CRAWL_CACHE_DIR", os.path.join(DATA_DIR, "crawl_cache"))
+MOCK_TEST_CRAWL_PER_HOST = int(os.getenv("MOCK_TEST_CRAWL_PER_HOST", "2"))         # concurrent requests per host
+MOCK_TEST_CRAWL_MIN_DELAY = float(os.getenv("MOCK_TEST_CRAWL_MIN_DELAY", "1.0"))   # seconds between requests to a host
+
+# Search Result Cache
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "21600"))              # fresh for 6 hours
+SEARCH_CACHE_STALE_TTL = float(os.getenv("SEARCH_CACHE_STALE_TTL", "604800"))  # then served stale for a week while refreshing
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2048"))
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", os.path.join(DATA_DIR, "search_cache.db"))
+SEARCH_TIMEOUT = int(os.getenv("SEARCH_TIMEOUT", "10"))                       # seconds per provider request
+
+# YouTube Lookup Worker
+YOUTUBE_WORKERS = int(os.getenv("YOUTUBE_WORKERS", "2"))                      # concurrent yt_dlp lookups
+YOUTUBE_QUERY_DEADLINE = float(os.getenv("YOUTUBE_QUERY_DEADLINE", "8"))      # seconds a request waits for one lookup
+YOUTUBE_SOCKET_TIMEOUT = float(os.getenv("YOUTUBE_SOCKET_TIMEOUT", "15"))     # seconds a worker waits on YouTube
+YOUTUBE_CACHE_TTL = float(os.getenv("YOUTUBE_CACHE_TTL", "86400"))
+YOUTUBE_CACHE_STALE_TTL = float(os.getenv("YOUTUBE_CACHE_STALE_TTL", "604800"))
+YOUTUBE_CACHE_MAX_ENTRIES = int(os.getenv("YOUTUBE_CACHE_MAX_ENTRIES", "2048"))
+YOUTUBE_CACHE_PATH = os.getenv("YOUTUBE_CACHE_PATH", os.path.join(DATA_DIR, "search_cache.db"))
+
+# Local Resource Index (curated links and videos, searched before live services)
+RESOURCE_INDEX_PATH = os.getenv("RESOURCE_INDEX_PATH", os.path.join(DATA_DIR, "resources.db"))
+# A local hit must cover this share of the query's (IDF-weighted) terms and score
+# at least this fraction of the best hit; weaker hits neither show nor skip live search
+RESOURCE_MIN_COVERAGE = float(os.getenv("RESOURCE_MIN_COVERAGE", "0.5"))
+RESOURCE_RELATIVE_SCORE = float(os.getenv("RESOURCE_RELATIVE_SCORE", "0.5"))
+
+# Resilience: a circuit breaker per provider opens after this many consecutive
+# failures and lets one probe through after the reset timeout; each API request
+# gets a deadline budget that caps every downstream call it makes
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "120"))
+# Seconds one question generation batch may take; kept within the request
+# deadline so a batch times out on its own limit, not the request's
+GENERATION_TIMEOUT = min(float(os.getenv("GENERATION_TIMEOUT", "90")), REQUEST_DEADLINE)
+
 # Model Parameters - Optimized for speed
 MAX_TOKENS = int(os.getenv("MAX_TOKENS", "512"))
 TEMPERATURE = float(os.getenv("TEMPERATURE", "0.3"))
@@ -38,9 +103,81 @@ TOP_P = float(os.getenv("TOP_P", "0.8"))
 # MCP Configuration
 MCP_SERVER_HOST = os.getenv("MCP_SERVER_HOST", "0.0.0.0")
 MCP_SERVER_PORT = int(os.getenv("MCP_SERVER_PORT", "8000"))
+MCP_TOOL_TIMEOUT = float(os.getenv("MCP_TOOL_TIMEOUT", "120"))
+# Number of mock_test_mcp_server.py subprocesses mock_test_api.py keeps open
+MOCK_TEST_MCP_POOL_SIZE = int(os.getenv("MOCK_TEST_MCP_POOL_SIZE", "4"))
 
 # API Server Configuration
 API_SERVER_PORT = int(os.getenv("API_SERVER_PORT", "8001"))
+# Production server (serve.py): worker processes, and modules imported once in
+# the master so workers share them copy-on-write
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1)))
+SERVER_PRELOAD_MODULES = [m for m in os.getenv(
+    "SERVER_PRELOAD_MODULES",
+    "fastapi,pydantic,uvicorn,httpx,ollama,chromadb,langchain_text_splitters,bs4"
+).split(",") if m]
+# Settings changed at runtime (model swaps, knowledge base updates), shared by all workers
+RUNTIME_SETTINGS_PATH = os.getenv("RUNTIME_SETTINGS_PATH", os.path.join(DATA_DIR, "runtime_settings.json"))
+RUNTIME_SETTINGS_RELOAD_INTERVAL = float(os.getenv("RUNTIME_SETTINGS_RELOAD_INTERVAL", "1"))
+# Services app_factory builds at startup instead of on first use ("all" for every one)
+SERVER_WARMUP = [s for s in os.getenv("SERVER_WARMUP", "").split(",") if s]
+
+# Metrics (Prometheus format at /metrics): serve.py workers write their samples
+# here so a scrape of any worker reports all of them
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", os.path.join(DATA_DIR, "metrics"))
+
+# Tracing: each request's spans are buffered and exported (OTLP JSON) only if
+# the request was slow, failed or was randomly sampled; TRACE_OTLP_ENDPOINT
+# sends them to a collector (OTLP/HTTP, e.g. http://localhost:4318) as well
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", os.path.join(DATA_DIR, "traces.jsonl"))
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "sat-practice")
+TRACE_SLOW_THRESHOLD = float(os.getenv("TRACE_SLOW_THRESHOLD", "2.0"))   # seconds
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))        # share of other traces kept
+
+# Health monitor: dependencies are probed in the background and /api/health,
+# /health/live and /health/ready answer from the last snapshot; readiness
+# needs every dependency in HEALTH_REQUIRED to be up
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "10"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "3"))
+HEALTH_REQUIRED = [d for d in os.getenv("HEALTH_REQUIRED", "ollama").split(",") if d]
+
+# Conversation memory: per-session ring buffer of recent turns, older turns
+# folded into a rolling summary. Every turn is written through to the SQLite
+# file at MEMORY_SPILL_PATH, shared by all workers (empty: this process only);
+# sessions idle for MEMORY_IDLE_TTL seconds or beyond MEMORY_MAX_SESSIONS
+# leave memory and are reloaded from it. Stored sessions without a new turn
+# for MEMORY_RETENTION seconds are deleted (0: kept forever)
+MEMORY_MAX_TURNS = int(os.getenv("MEMORY_MAX_TURNS", "20"))
+MEMORY_MAX_TURN_CHARS = int(os.getenv("MEMORY_MAX_TURN_CHARS", "4000"))
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "512"))       # history tokens per prompt
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "256"))
+MEMORY_IDLE_TTL = float(os.getenv("MEMORY_IDLE_TTL", "1800"))
+MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "5000"))
+MEMORY_RETENTION = float(os.getenv("MEMORY_RETENTION", "2592000"))     # 30 days
+MEMORY_SPILL_PATH = os.getenv("MEMORY_SPILL_PATH", os.path.join(DATA_DIR, "conversations.db")) or None
+
+# Retrieval gate: chit-chat and bare arithmetic skip retrieval; retrieved chunks
+# farther than RETRIEVAL_MAX_DISTANCE (cosine distance), or more than
+# RETRIEVAL_RELATIVE_MARGIN behind the best one, are left out of the prompt.
+# Set RETRIEVAL_GATE_LOG_PATH to append each decision there while tuning the
+# thresholds (default empty: not written; the file is not rotated)
+RETRIEVAL_GATE_ENABLED = os.getenv("RETRIEVAL_GATE_ENABLED", "true").lower() in ("1", "true", "yes")
+RETRIEVAL_MAX_DISTANCE = float(os.getenv("RETRIEVAL_MAX_DISTANCE", "0.6"))
+RETRIEVAL_RELATIVE_MARGIN = float(os.getenv("RETRIEVAL_RELATIVE_MARGIN", "0.15"))
+RETRIEVAL_GATE_LOG_PATH = os.getenv("RETRIEVAL_GATE_LOG_PATH", "") or None
+
+# Semantic answer cache: a knowledge base question whose embedding is at least
+# SEMANTIC_CACHE_THRESHOLD cosine-similar to an earlier one gets that answer;
+# a share of hits is audited against a fresh retrieval to count false hits
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2048"))   # per namespace
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+SEMANTIC_CACHE_REVALIDATE_AFTER = float(os.getenv("SEMANTIC_CACHE_REVALIDATE_AFTER", "0"))  # 0: off
+SEMANTIC_CACHE_AUDIT_RATE = float(os.getenv("SEMANTIC_CACHE_AUDIT_RATE", "0.1"))
+SEMANTIC_CACHE_AUDIT_MIN_OVERLAP = float(os.getenv("SEMANTIC_CACHE_AUDIT_MIN_OVERLAP", "0.5"))
 
 # Supported Ollama Models
 SUPPORTED_MODELS = [
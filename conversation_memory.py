@@ -0,0 +1,425 @@
+"""
+Conversation Memory
+Per-session chat history for the agents: a bounded ring buffer of recent
+turns per session, a rolling summary of older turns, token-budgeted history
+windows for prompts, idle eviction and an optional SQLite store shared by
+every worker process
+
+A session's history window only grows between turns, so consecutive prompts
+share their prefix and Ollama can reuse the KV cache it built for the last
+one. When the window outgrows its budget it is re-anchored once: older turns
+are folded into the window's summary and only about half the budget is kept,
+leaving room for several more append-only turns.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from config import (
+    MEMORY_MAX_TURNS,
+    MEMORY_MAX_TURN_CHARS,
+    MEMORY_TOKEN_BUDGET,
+    MEMORY_SUMMARY_TOKENS,
+    MEMORY_IDLE_TTL,
+    MEMORY_MAX_SESSIONS,
+    MEMORY_RETENTION,
+    MEMORY_SPILL_PATH
+)
+
+# Seconds between idle sweeps (sweeps run inside normal calls, no thread)
+SWEEP_INTERVAL = 30.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def _tokens(text: str) -> int:
+    return estimate_tokens(text) if text else 0
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def extractive_summary(summary: str, turns: List[Dict[str, Any]], max_tokens: int) -> str:
+    """
+    Fold turns into a summary without an LLM call.
+
+    Each turn becomes one line with the start of the question and answer;
+    the oldest lines are dropped to stay within max_tokens.
+    """
+    lines = summary.splitlines() if summary else []
+    for turn in turns:
+        lines.append(f"- Student: {_clip(turn['user'], 160)} | Tutor: {_clip(turn['agent'], 160)}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class Session:
+    """Recent turns and the summary of older ones for one session."""
+
+    __slots__ = ('session_id', 'turns', 'summary', 'last_active', 'next_n', 'window_start', 'window_summary',
+                 'version')
+
+    def __init__(self, session_id: str, max_turns: int):
+        self.session_id = session_id
+        self.turns: Deque[Dict[str, Any]] = deque(maxlen=max_turns)
+        self.summary = ""
+        self.last_active = time.time()
+        self.next_n = 0                 # sequence number of the next turn
+        # Prompt window: turns numbered window_start onwards, after window_summary
+        self.window_start = 0
+        self.window_summary = ""
+        self.version = 0                # bumped on every write to the store
+
+
+class ConversationMemory:
+    """
+    Thread-safe session store shared by every agent in the process.
+
+    Memory is bounded by max_sessions x max_turns x max_turn_chars: the
+    oldest turn of a full session is folded into its rolling summary, and
+    the least recently used sessions (and any idle longer than idle_ttl)
+    are dropped from memory.
+
+    With a store_path, the SQLite file is the source of truth shared by all
+    worker processes: add_turn() appends inside a write transaction on the
+    stored session, and every read first checks the stored version (one
+    primary-key lookup) and reloads the session if another worker changed
+    it. Requests for one student may therefore land on any worker. Store
+    I/O never runs under the in-memory lock.
+    """
+
+    def __init__(
+        self,
+        max_turns: int = MEMORY_MAX_TURNS,
+        max_turn_chars: int = MEMORY_MAX_TURN_CHARS,
+        token_budget: int = MEMORY_TOKEN_BUDGET,
+        summary_tokens: int = MEMORY_SUMMARY_TOKENS,
+        idle_ttl: float = MEMORY_IDLE_TTL,
+        max_sessions: int = MEMORY_MAX_SESSIONS,
+        spill_path: Optional[str] = MEMORY_SPILL_PATH,
+        retention: float = MEMORY_RETENTION,
+        summarizer: Optional[Callable[[str, List[Dict[str, Any]], int], str]] = None
+    ):
+        """
+        Initialize conversation memory.
+
+        Args:
+            max_turns: Recent turns kept verbatim per session
+            max_turn_chars: Characters kept of each message
+            token_budget: Default token budget of history_window()
+            summary_tokens: Token budget of a session's rolling summary
+            idle_ttl: Seconds without activity before a session leaves memory
+            max_sessions: Sessions kept in memory
+            spill_path: SQLite file shared by worker processes, or None to
+                keep sessions in this process only
+            retention: Seconds a stored session is kept after its last turn
+                (0 keeps it forever)
+            summarizer: summarizer(summary, old_turns, max_tokens) -> summary
+                (default: extractive_summary, no LLM call)
+        """
+        self.max_turns = max_turns
+        self.max_turn_chars = max_turn_chars
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.retention = retention
+        self.summarizer = summarizer or extractive_summary
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.stats = {'created': 0, 'reloaded': 0, 'evicted': 0, 'purged': 0, 'summarized_turns': 0, 'reanchored': 0}
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if spill_path:
+            os.makedirs(os.path.dirname(os.path.abspath(spill_path)), exist_ok=True)
+            # Autocommit mode; add_turn() opens its own IMMEDIATE transaction
+            self._db = sqlite3.connect(spill_path, check_same_thread=False, timeout=5.0, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # Workers start together; one transaction keeps them from migrating twice
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS sessions "
+                    "(session_id TEXT PRIMARY KEY, summary TEXT, turns TEXT, last_active REAL)"
+                )
+                columns = {row[1] for row in self._db.execute("PRAGMA table_info(sessions)")}
+                for column, kind in (('window_start', 'INTEGER DEFAULT 0'), ('window_summary', "TEXT DEFAULT ''"),
+                                     ('version', 'INTEGER DEFAULT 0')):
+                    if column not in columns:
+                        self._db.execute(f"ALTER TABLE sessions ADD COLUMN {column} {kind}")
+                self._db.execute("CREATE INDEX IF NOT EXISTS sessions_last_active ON sessions (last_active)")
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _session(self, session_id: str, stored: Optional[Session] = None) -> Session:
+        # Caller holds the lock; stored is the session as read from the store
+        session = self._sessions.get(session_id)
+        if stored is not None and (session is None or stored.version > session.version):
+            session = self._sessions[session_id] = stored
+            self.stats['reloaded'] += 1
+        elif session is None:
+            session = self._sessions[session_id] = Session(session_id, self.max_turns)
+            self.stats['created'] += 1
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.stats['evicted'] += 1
+        return session
+
+    def _stored_version(self, session_id: str) -> Optional[int]:
+        # Caller holds the store lock
+        row = self._db.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def _sync(self, session_id: str):
+        """Bring the in-memory copy up to date with the store."""
+        if self._db is None:
+            return
+        with self._db_lock:
+            version = self._stored_version(session_id)
+            with self._lock:
+                session = self._sessions.get(session_id)
+                if version is None:
+                    if session is not None and session.version > 0:
+                        # Cleared by another worker
+                        del self._sessions[session_id]
+                    return
+                if session is not None and session.version >= version:
+                    return
+            stored = self._load(session_id)
+        if stored is not None:
+            with self._lock:
+                self._session(session_id, stored)
+
+    def add_turn(self, session_id: str, user_message: str, agent_response: str):
+        """Record one exchange; a full buffer folds its oldest turn into the summary."""
+        turn = {
+            'user': _clip(user_message, self.max_turn_chars),
+            'agent': _clip(agent_response, self.max_turn_chars),
+            'at': time.time()
+        }
+        turn['tokens'] = estimate_tokens(turn['user']) + estimate_tokens(turn['agent'])
+        self._maybe_sweep()
+        if self._db is None:
+            with self._lock:
+                self._append(self._session(session_id), turn)
+            return
+
+        with self._db_lock:
+            # IMMEDIATE takes the write lock up front, so workers appending to
+            # the same session queue here instead of overwriting each other
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._stored_version(session_id)
+                with self._lock:
+                    session = self._sessions.get(session_id)
+                    stale = version is not None and (session is None or session.version < version)
+                stored = self._load(session_id) if stale else None
+                with self._lock:
+                    if version is None and session_id in self._sessions:
+                        # Cleared by another worker: start over
+                        del self._sessions[session_id]
+                    session = self._session(session_id, stored)
+                    self._append(session, turn)
+                    session.version = (version or 0) + 1
+                    row = self._row(session)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sessions "
+                    "(session_id, summary, turns, last_active, window_start, window_summary, version) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    row
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _append(self, session: Session, turn: Dict[str, Any]):
+        # Caller holds the lock
+        if len(session.turns) == session.turns.maxlen:
+            oldest = session.turns.popleft()
+            session.summary = self.summarizer(session.summary, [oldest], self.summary_tokens)
+            self.stats['summarized_turns'] += 1
+        turn['n'] = session.next_n
+        session.next_n += 1
+        session.turns.append(turn)
+        session.last_active = turn['at']
+
+    @staticmethod
+    def _row(session: Session) -> Tuple[Any, ...]:
+        return (session.session_id, session.summary, json.dumps(list(session.turns)), session.last_active,
+                session.window_start, session.window_summary, session.version)
+
+    def history_window(self, session_id: str, token_budget: Optional[int] = None) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        History to put in a prompt.
+
+        The window is append-only between re-anchors (see the module
+        docstring), so the same session gets the same prefix turn after turn.
+
+        Args:
+            session_id: Session ID
+            token_budget: Tokens for summary plus turns (default token_budget)
+
+        Returns:
+            (summary, turns): summary of everything before the window and the
+            turns in it, oldest first
+        """
+        budget = self.token_budget if token_budget is None else token_budget
+        self._maybe_sweep()
+        self._sync(session_id)
+        anchor = None
+        with self._lock:
+            session = self._session(session_id)
+            session.last_active = time.time()
+            turns = list(session.turns)
+            window = [turn for turn in turns if turn['n'] >= session.window_start]
+            used = sum(turn['tokens'] for turn in window) + _tokens(session.window_summary)
+            # Over budget, or the ring buffer dropped turns still in the window
+            if used > budget or (turns and turns[0]['n'] > session.window_start):
+                window = self._reanchor(session, turns, budget)
+                if session.version:
+                    anchor = (session.window_start, session.window_summary, session_id, session.version)
+            summary = session.window_summary
+        if anchor is not None:
+            self._store_anchor(session_id, anchor)
+        return summary, window
+
+    def _reanchor(self, session: Session, turns: List[Dict[str, Any]], budget: int) -> List[Dict[str, Any]]:
+        # Caller holds the lock
+        summary_budget = min(self.summary_tokens, budget // 2)
+        room = (budget - summary_budget) // 2
+        window: List[Dict[str, Any]] = []
+        for turn in reversed(turns):
+            if turn['tokens'] > room:
+                break
+            window.append(turn)
+            room -= turn['tokens']
+        window.reverse()
+
+        older = turns[:len(turns) - len(window)]
+        session.window_summary = self.summarizer(session.summary, older, summary_budget)
+        session.window_start = window[0]['n'] if window else session.next_n
+        self.stats['reanchored'] += 1
+        return window
+
+    def _store_anchor(self, session_id: str, anchor: Tuple[Any, ...]):
+        """Share a re-anchored window with the other workers, unless the session moved on."""
+        with self._db_lock:
+            updated = self._db.execute(
+                "UPDATE sessions SET window_start = ?, window_summary = ?, version = version + 1 "
+                "WHERE session_id = ? AND version = ?",
+                anchor
+            ).rowcount
+        if updated:
+            with self._lock:
+                session = self._sessions.get(session_id)
+                if session is not None and session.version == anchor[3]:
+                    session.version += 1
+
+    def history_messages(self, session_id: str, token_budget: Optional[int] = None) -> List[Dict[str, str]]:
+        """history_window() as Ollama chat messages, oldest first."""
+        summary, turns = self.history_window(session_id, token_budget)
+        messages = []
+        if summary:
+            messages.append({"role": "system", "content": f"Earlier in this conversation:\n{summary}"})
+        for turn in turns:
+            messages.append({"role": "user", "content": turn['user']})
+            messages.append({"role": "assistant", "content": turn['agent']})
+        return messages
+
+    def turns(self, session_id: str) -> List[Dict[str, Any]]:
+        """Recent turns kept verbatim for a session, oldest first."""
+        self._sync(session_id)
+        with self._lock:
+            return list(self._session(session_id).turns)
+
+    def clear(self, session_id: str):
+        """Forget a session, in memory and in the store."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        self.evict_idle()
+
+    def evict_idle(self) -> int:
+        """
+        Drop sessions idle longer than idle_ttl from memory, and delete stored
+        sessions without a turn for longer than retention; returns how many
+        left memory.
+        """
+        now = time.time()
+        cutoff = now - self.idle_ttl
+        with self._lock:
+            idle = [s for s in self._sessions.values() if s.last_active < cutoff]
+            for session in idle:
+                del self._sessions[session.session_id]
+            self.stats['evicted'] += len(idle)
+        if self._db is not None and self.retention:
+            with self._db_lock:
+                purged = self._db.execute(
+                    "DELETE FROM sessions WHERE last_active < ?", (now - self.retention,)
+                ).rowcount
+            with self._lock:
+                self.stats['purged'] += purged
+        return len(idle)
+
+    def spill_all(self):
+        """Record in the store when each in-memory session was last read (call on shutdown)."""
+        if self._db is None:
+            return
+        with self._lock:
+            active = [(s.last_active, s.session_id) for s in self._sessions.values() if s.version]
+        # Turns are already written through by add_turn()
+        with self._db_lock:
+            self._db.executemany(
+                "UPDATE sessions SET last_active = MAX(last_active, ?) WHERE session_id = ?", active
+            )
+
+    def _load(self, session_id: str) -> Optional[Session]:
+        # Caller holds the store lock
+        row = self._db.execute(
+            "SELECT summary, turns, last_active, window_start, window_summary, version "
+            "FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        session = Session(session_id, self.max_turns)
+        session.summary = row[0] or ""
+        session.turns.extend(json.loads(row[1] or "[]"))
+        for n, turn in enumerate(session.turns):
+            turn.setdefault('n', n)
+        session.next_n = session.turns[-1]['n'] + 1 if session.turns else 0
+        session.last_active = row[2]
+        session.window_start = row[3] or 0
+        session.window_summary = row[4] or ""
+        session.version = row[5] or 0
+        return session
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus sessions and turns held in memory."""
+        with self._lock:
+            sessions = len(self._sessions)
+            turns = sum(len(s.turns) for s in self._sessions.values())
+        return {**self.stats, 'sessions': sessions, 'turns': turns}
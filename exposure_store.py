@@ -0,0 +1,127 @@
+"""
+Per-Student Question Exposure Store
+Compact bitsets over question-bank positions, persisted to SQLite
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Set
+
+from config import EXPOSURE_DB_PATH
+
+
+class StudentExposure:
+    """
+    Bitset of question-bank positions a student has been served.
+
+    Remembers which positions were marked (and whether a new cycle was
+    started) since it was loaded, so ExposureStore.save() can merge them
+    into the stored row instead of overwriting marks made by other workers.
+    """
+
+    __slots__ = ("student_id", "test_type", "bits", "_marked", "_reset")
+
+    def __init__(self, student_id: str, test_type: str, bits: bytes = b""):
+        self.student_id = student_id
+        self.test_type = test_type
+        self.bits = bytearray(bits)
+        self._marked: Set[int] = set()
+        self._reset = False
+
+    def seen(self, index: int) -> bool:
+        """O(1) check whether bank position ``index`` was served."""
+        byte = index >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] & (1 << (index & 7)))
+
+    def mark(self, index: int):
+        """Mark bank position ``index`` as served."""
+        _set_bit(self.bits, index)
+        self._marked.add(index)
+
+    def seen_count(self) -> int:
+        """Number of distinct bank positions served."""
+        return int.from_bytes(self.bits, "little").bit_count()
+
+    def reset(self):
+        """Start a new cycle once the pool is exhausted."""
+        self.bits = bytearray()
+        self._marked.clear()
+        self._reset = True
+
+
+def _set_bit(bits: bytearray, index: int):
+    byte = index >> 3
+    if byte >= len(bits):
+        bits.extend(b"\x00" * (byte + 1 - len(bits)))
+    bits[byte] |= 1 << (index & 7)
+
+
+class ExposureStore:
+    """
+    Loads and persists StudentExposure bitsets.
+
+    SQLite is the only copy: every worker process reads the current row on
+    get() and save() merges its new marks into the row inside a write
+    transaction, so concurrent requests for one student never undo each
+    other's marks.
+    """
+
+    def __init__(self, db_path: str = EXPOSURE_DB_PATH):
+        """
+        Initialize exposure store.
+
+        Args:
+            db_path: SQLite file for persisted bitsets
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # Autocommit mode; save() opens its own IMMEDIATE transaction
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS exposure ("
+            "student_id TEXT, test_type TEXT, bits BLOB, "
+            "PRIMARY KEY (student_id, test_type))"
+        )
+
+    def _read(self, student_id: str, test_type: str) -> bytes:
+        row = self._conn.execute(
+            "SELECT bits FROM exposure WHERE student_id = ? AND test_type = ?", (student_id, test_type)
+        ).fetchone()
+        return row[0] if row else b""
+
+    def get(self, student_id: str, test_type: str) -> StudentExposure:
+        """Get a student's current exposure for one test type."""
+        with self._lock:
+            return StudentExposure(student_id, test_type, self._read(student_id, test_type))
+
+    def save(self, exposure: StudentExposure):
+        """
+        Merge a student's new marks into the stored bitset.
+
+        Positions marked since get() are OR-ed into the current row; after a
+        reset() the row is replaced by those marks alone. The exposure is
+        refreshed with the merged bits.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                bits = bytearray() if exposure._reset else bytearray(
+                    self._read(exposure.student_id, exposure.test_type)
+                )
+                for index in exposure._marked:
+                    _set_bit(bits, index)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO exposure (student_id, test_type, bits) VALUES (?, ?, ?)",
+                    (exposure.student_id, exposure.test_type, bytes(bits))
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        exposure.bits = bits
+        exposure._marked.clear()
+        exposure._reset = False
@@ -0,0 +1,108 @@
+"""
+Shared Async HTTP Client for the Gemini REST API
+One pooled HTTP/2 keep-alive client per event loop, used by every Gemini caller
+"""
+
+import asyncio
+import logging
+from typing import Optional, Dict, Any
+
+import httpx
+
+from config import (
+    GEMINI_API_BASE,
+    GEMINI_MODEL,
+    GEMINI_MAX_CONNECTIONS,
+    GEMINI_TIMEOUT
+)
+from resilience import budget
+
+logger = logging.getLogger("gemini_client")
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+    logger.warning("⚠️ h2 not installed; Gemini client falls back to HTTP/1.1 keep-alive")
+
+# httpx pools are bound to the loop they were first used on
+_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+
+class GeminiAPIError(Exception):
+    """Raised when the Gemini API returns an error or an empty candidate."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        # Drop clients whose loops have gone away (e.g. repeated asyncio.run)
+        for stale in [l for l in _clients if l.is_closed()]:
+            del _clients[stale]
+        client = httpx.AsyncClient(
+            base_url=GEMINI_API_BASE,
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(GEMINI_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=GEMINI_MAX_CONNECTIONS,
+                max_keepalive_connections=GEMINI_MAX_CONNECTIONS,
+                keepalive_expiry=60.0
+            ),
+            headers={"Content-Type": "application/json"}
+        )
+        _clients[loop] = client
+    return client
+
+
+async def generate_content(
+    prompt: str,
+    api_key: str,
+    model: str = GEMINI_MODEL,
+    generation_config: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Call Gemini's generateContent endpoint.
+
+    Args:
+        prompt: Prompt text
+        api_key: Gemini API key
+        model: Gemini model name
+        generation_config: Optional generationConfig block
+
+    Returns:
+        Text of the first candidate
+    """
+    body: Dict[str, Any] = {"contents": [{"parts": [{"text": prompt}]}]}
+    if generation_config:
+        body["generationConfig"] = generation_config
+
+    # Never wait longer than the calling request has left
+    timeout = budget(GEMINI_TIMEOUT)
+    response = await get_http_client().post(
+        f"/models/{model}:generateContent",
+        json=body,
+        headers={"x-goog-api-key": api_key},
+        timeout=httpx.Timeout(timeout, connect=min(10.0, timeout))
+    )
+    if response.status_code != 200:
+        raise GeminiAPIError(f"Gemini API error: {response.status_code}", response.status_code)
+
+    data = response.json()
+    try:
+        return "".join(part.get("text", "") for part in data["candidates"][0]["content"]["parts"])
+    except (KeyError, IndexError) as e:
+        raise GeminiAPIError(f"Gemini returned no candidates: {data.get('promptFeedback', e)}")
+
+
+async def aclose():
+    """Close the client for the running loop (call on app shutdown)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -1,60 +1,208 @@
 
 import os
 import json
+import fcntl
 import logging
 import asyncio
-import google.generativeai as genai
 import random
-from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+from question_validator import QuestionValidator
+from near_duplicate import NearDuplicateIndex, question_key, question_signature
+from exposure_store import ExposureStore, StudentExposure
+from generation_backends import GenerationBackend, create_backend
+from resilience import OPEN, get_breaker, wait_for
+from tracing import set_attributes, traced
+from config import QUESTION_BACKEND, QUESTION_BANK_MAX, POOL_GROWTH_THRESHOLD, GENERATION_TIMEOUT
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("gemini_generator")
 
 class GeminiSATGenerator:
-    """Generates SAT practice questions using Google's Gemini models."""
+    """Generates SAT practice questions using Gemini or a local Ollama backend."""
     
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize the generator with an optional API key."""
+    BATCH_SIZE = 10
+    MAX_TOPUP_ROUNDS = 2
+    # Students whose served-question index is kept in memory (least recently used are dropped)
+    MAX_STUDENT_HISTORIES = 1000
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        backend: Optional[GenerationBackend] = None
+    ):
+        """
+        Initialize the generator.
+        
+        Args:
+            api_key: Optional Gemini API key (default: GEMINI_API_KEY)
+            backend: Generation backend; defaults to QUESTION_BACKEND from config
+        """
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.cache_dir = os.path.join(os.path.dirname(__file__), "data")
+        self.validator = QuestionValidator()
+        # student_id -> index of questions already served to that student, used
+        # to skip rewordings. It lives in this process only, so with several
+        # workers it misses rewordings served by the others; exposure_store is
+        # the shared, durable record of which bank questions were served
+        self.student_history: "OrderedDict[str, NearDuplicateIndex]" = OrderedDict()
+        self.exposure_store = ExposureStore()
+        # test_type -> in-flight background bank growth task
+        self._growing: Dict[str, asyncio.Task] = {}
         
-        if not self.api_key or "AIza" not in self.api_key:
-            logger.warning("⚠️ No valid Gemini API Key found. Using mock fallback mode.")
-            self.model = None
+        self.backend = backend or create_backend(QUESTION_BACKEND, self.api_key)
+        self.breaker = get_breaker(f"generation:{self.backend.name}") if self.backend else None
+        if self.backend:
+            logger.info(f"✅ Question generation backend: {self.backend.name}")
         else:
-            try:
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel('gemini-pro')
-                logger.info("✅ Gemini model initialized successfully.")
-            except Exception as e:
-                logger.error(f"❌ Failed to initialize Gemini: {e}")
-                self.model = None
+            logger.warning("⚠️ No generation backend available. Using mock fallback mode.")
 
-    async def generate_questions(self, test_type: str, count: int = 5) -> List[Dict[str, Any]]:
+    @traced()
+    async def generate_questions(
+        self,
+        test_type: str,
+        count: int = 5,
+        student_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
         Generate a set of SAT questions based on the test type with caching.
+        
+        When ``student_id`` is given, the cached question bank is sampled
+        without repeats until that student has seen all of it, and
+        near-duplicates of questions this worker already served them are
+        skipped.
         """
-        cache_file = os.path.join(os.path.dirname(__file__), "data", f"cache_{test_type}.json")
+        set_attributes(**{'generation.test_type': test_type, 'generation.count': count})
+        history = self._student_history(student_id) if student_id else None
+        # Bank and exposure I/O takes file and SQLite locks shared with other
+        # workers, so it runs in a thread rather than on the event loop
+        exposure = await asyncio.to_thread(self.exposure_store.get, student_id, test_type) if student_id else None
+        cache_file = os.path.join(self.cache_dir, f"cache_{test_type}.json")
         
-        # 1. Check Cache (Skip for Full Tests to force fresh mixed generation)
-        cached_questions = []
+        # 1. Sample the cached bank (Skip for Full Tests to force fresh mixed generation)
+        bank = []
+        picked = []
         # Only use cache for small requests (Subject Mastery). Full tests need fresh mix.
         if count < 20: 
-            cached_questions = self._load_cache(cache_file)
+            try:
+                bank = await asyncio.to_thread(self._load_cache, cache_file)
+            except ValueError as e:
+                logger.error(f"❌ {e}; generating instead")
+            picked = self._sample_unseen(bank, count, exposure, history)
             
-        if len(cached_questions) >= count:
-            logger.info(f"🚀 Serving {count} questions from cache ({len(cached_questions)} available)")
-            return cached_questions[:count]
+        new_questions = []
+        new_positions = []
+        if len(picked) >= count:
+            logger.info(f"🚀 Serving {count} questions from cache ({len(bank)} in bank)")
+        elif self.backend:
+            # 2. If no cache or not enough, generate just the shortfall
+            need = count - len(picked)
+            logger.info(f"🌐 Cache miss. Generating {need} new questions via {self.backend.name}...")
+            new_questions = await self._run_plan(
+                self._plan_batches(test_type, need),
+                exclude=history,
+                selected=[bank[i] for i in picked]
+            )
             
-        # 2. If no cache or not enough, generate new ones
-        logger.info(f"🌐 Cache miss. Generating {count} new questions via Gemini...")
+            # 3. Save to Cache for NEXT time
+            if new_questions:
+                try:
+                    bank, new_positions = await asyncio.to_thread(self._save_cache, cache_file, new_questions)
+                except Exception as e:
+                    logger.error(f"Failed to save cache: {e}")
+        
+        short = count - len(picked) - len(new_questions)
+        if exposure is not None and bank and short > 0:
+            # Generation came up short: fill from the bank, never repeating a
+            # question already in this test
+            served = picked + [p for p in new_positions if p is not None]
+            for i in served:
+                exposure.mark(i)
+            more = self._sample_unseen(bank, short, exposure, history)
+            if len(more) < short:
+                # Pool exhausted for this student: start a new cycle rather than serve a short test
+                logger.info(f"🔄 Student {student_id} has seen the whole {test_type} bank; starting a new cycle")
+                exposure.reset()
+                for i in served + more:
+                    exposure.mark(i)
+                more += self._sample_unseen(bank, short - len(more), exposure, None)
+            picked += more
         
-        if not self.model:
+        if not picked and not new_questions:
             return self._get_fallback_questions(test_type, count)
-
-        # Configure Generation Strategy
-        tasks = []
         
+        self._record_served(history, exposure, bank, picked, new_questions, new_positions)
+        if exposure is not None:
+            await asyncio.to_thread(self.exposure_store.save, exposure)
+        self._maybe_grow_pool(test_type, len(bank), exposure)
+        
+        questions = [dict(bank[i]) for i in picked] + [dict(q) for q in new_questions]
+        # Shuffle to mix domains for Full Tests
+        random.shuffle(questions)
+        
+        # Fix IDs
+        for i, q in enumerate(questions):
+            q['id'] = i + 1
+        return questions
+
+    def _student_history(self, student_id: str) -> NearDuplicateIndex:
+        """A student's served-question index, bounded to MAX_STUDENT_HISTORIES students."""
+        history = self.student_history.get(student_id)
+        if history is None:
+            history = self.student_history[student_id] = NearDuplicateIndex()
+            while len(self.student_history) > self.MAX_STUDENT_HISTORIES:
+                self.student_history.popitem(last=False)
+        else:
+            self.student_history.move_to_end(student_id)
+        return history
+
+    def _sample_unseen(
+        self,
+        bank: List[Dict[str, Any]],
+        count: int,
+        exposure: Optional[StudentExposure],
+        history: Optional[NearDuplicateIndex]
+    ) -> List[int]:
+        """Pick up to ``count`` random bank positions the student has not seen."""
+        picked = []
+        for i in random.sample(range(len(bank)), len(bank)):
+            if exposure is not None and exposure.seen(i):
+                continue
+            if history is not None and history.contains(bank[i]):
+                continue
+            picked.append(i)
+            if len(picked) == count:
+                break
+        return picked
+
+    def _maybe_grow_pool(self, test_type: str, bank_size: int, exposure: Optional[StudentExposure]):
+        """Top up the bank in the background when a student has little left unseen."""
+        if exposure is None or not self.backend or not bank_size or bank_size >= QUESTION_BANK_MAX:
+            return
+        if test_type in self._growing:
+            return
+        unseen_fraction = 1 - exposure.seen_count() / bank_size
+        if unseen_fraction < POOL_GROWTH_THRESHOLD:
+            logger.info(f"🌱 Growing {test_type} bank ({unseen_fraction:.0%} unseen for {exposure.student_id})")
+            self._growing[test_type] = asyncio.create_task(self._grow_pool(test_type))
+
+    @traced()
+    async def _grow_pool(self, test_type: str):
+        """Generate a couple of batches into the bank."""
+        try:
+            new_questions = await self._run_plan(self._plan_batches(test_type, self.BATCH_SIZE * 2))
+            if new_questions:
+                await asyncio.to_thread(
+                    self._save_cache, os.path.join(self.cache_dir, f"cache_{test_type}.json"), new_questions
+                )
+        except Exception as e:
+            logger.error(f"❌ Pool growth failed for {test_type}: {e}")
+        finally:
+            self._growing.pop(test_type, None)
+
+    def _plan_batches(self, test_type: str, count: int) -> List[Tuple[str, int]]:
+        """Split a request into (sub test type, batch size) pairs."""
         # Strategy 1: Full SAT Math Test (Force Distribution)
         if test_type == 'sat-math' and count >= 20: 
             p1 = int(count * 0.35) # Algebra (~19 Qs)
@@ -63,106 +211,194 @@ class GeminiSATGenerator:
             p4 = count - p1 - p2 - p3 # Geom (~8 Qs)
             
             logger.info(f"🧩 Splitting Full Math Test: {p1} Alg, {p2} Adv, {p3} Data, {p4} Geom")
-            # Split large chunks into smaller batches (max 10) to avoid timeout
-            for t_type, c in [('sat-math-algebra', p1), ('sat-math-advanced', p2), 
-                              ('sat-math-data', p3), ('sat-math-geometry', p4)]:
-                rem = c
-                while rem > 0:
-                    batch = min(rem, 10)
-                    tasks.append(self._generate_batch(t_type, batch))
-                    rem -= batch
+            parts = [('sat-math-algebra', p1), ('sat-math-advanced', p2), 
+                     ('sat-math-data', p3), ('sat-math-geometry', p4)]
 
         # Strategy 2: Full SAT English Test (Force Distribution)
         elif test_type == 'sat-english' and count >= 20:
-             # Even distribution across 4 domains
-             p_size = count // 4
-             p_last = count - (p_size * 3)
-             
-             logger.info(f"🧩 Splitting Full English Test into 4 domains")
-             domains = ['sat-reading-craft', 'sat-reading-information', 
-                        'sat-english-conventions', 'sat-english-expression']
-             counts = [p_size, p_size, p_size, p_last]
-             
-             for t_type, c in zip(domains, counts):
-                 rem = c
-                 while rem > 0:
-                     batch = min(rem, 10)
-                     tasks.append(self._generate_batch(t_type, batch))
-                     rem -= batch
-                     
+            # Even distribution across 4 domains
+            p_size = count // 4
+            p_last = count - (p_size * 3)
+            
+            logger.info(f"🧩 Splitting Full English Test into 4 domains")
+            domains = ['sat-reading-craft', 'sat-reading-information', 
+                       'sat-english-conventions', 'sat-english-expression']
+            parts = list(zip(domains, [p_size, p_size, p_size, p_last]))
+
         # Strategy 3: Standard Single-Topic Generation
         else:
-            batch_size = 10
-            remaining = count
-            while remaining > 0:
-                current_batch = min(remaining, batch_size)
-                tasks.append(self._generate_batch(test_type, current_batch))
-                remaining -= current_batch
+            parts = [(test_type, count)]
 
-        # Run batches in parallel
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        new_questions = []
-        for res in results:
-            if isinstance(res, list):
-                new_questions.extend(res)
-        
-        # Shuffle to mix domains for Full Tests
-        random.shuffle(new_questions)
+        # Split large chunks into smaller batches (max 10) to avoid timeout
+        plan = []
+        for t_type, c in parts:
+            rem = c
+            while rem > 0:
+                batch = min(rem, self.BATCH_SIZE)
+                plan.append((t_type, batch))
+                rem -= batch
+        return plan
+
+    async def _run_plan(
+        self,
+        plan: List[Tuple[str, int]],
+        exclude: Optional[NearDuplicateIndex] = None,
+        selected: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run planned batches in parallel and top up any shortfall.
         
-        # Fix IDs
-        for i, q in enumerate(new_questions):
-            q['id'] = i + 1
+        Only validated, non-duplicate questions count toward each batch, so
+        a batch that comes back short, malformed or repetitive is
+        re-requested for just the missing number of items of that sub type.
+        """
+        questions = []
+        test_index = NearDuplicateIndex()
+        for q in selected or []:
+            test_index.add_if_new(question_key(q), q)
+        for attempt in range(self.MAX_TOPUP_ROUNDS + 1):
+            if not plan:
+                break
+            if self.breaker.state == OPEN:
+                logger.warning(f"⚡ {self.backend.name} circuit open; skipping generation")
+                break
+            if attempt:
+                logger.info(f"🔁 Top-up round {attempt}: {sum(c for _, c in plan)} questions short")
             
-        # 3. Save to Cache for NEXT time
-        if new_questions:
-            self._save_cache(cache_file, new_questions)
+            # Run batches in parallel
+            results = await asyncio.gather(
+                *(self._generate_batch(t_type, c) for t_type, c in plan),
+                return_exceptions=True
+            )
             
-        if len(new_questions) > 0:
-            return new_questions
-        else:
-            return self._get_fallback_questions(test_type, count)
+            shortfall = []
+            for (t_type, c), res in zip(plan, results):
+                valid = []
+                for q in res if isinstance(res, list) else []:
+                    if len(valid) == c:
+                        break
+                    if (exclude is not None and exclude.contains(q)) or not test_index.add_if_new(question_key(q), q):
+                        self.validator.rejects['near_duplicate'] += 1
+                        continue
+                    valid.append(q)
+                questions.extend(valid)
+                if len(valid) < c:
+                    shortfall.append((t_type, c - len(valid)))
+            plan = shortfall
+        
+        if plan:
+            logger.warning(f"⚠️ Still {sum(c for _, c in plan)} questions short after top-up. "
+                           f"Rejects: {self.validator.get_stats()['rejects_by_reason']}")
+        return questions
 
+    @traced()
     async def _generate_batch(self, test_type: str, count: int) -> List[Dict[str, Any]]:
         """Generate a small batch of questions."""
         prompt = self._create_prompt(test_type, count)
         try:
-            response = await asyncio.to_thread(self.model.generate_content, prompt)
-            if not response.text: return []
-            json_str = self._extract_json(response.text)
-            return json.loads(json_str)
+            # Capped by the request deadline; fails fast while the backend's breaker is open
+            text = await self.breaker.acall(lambda: wait_for(self.backend.generate(prompt), GENERATION_TIMEOUT))
+            if not text: return []
+            json_str = self._extract_json(text)
+            return self.validator.validate_batch(json.loads(json_str), test_type)
         except Exception as e:
             logger.error(f"❌ Batch generation failed: {e}")
             return []
 
+    def _record_served(
+        self,
+        history: Optional[NearDuplicateIndex],
+        exposure: Optional[StudentExposure],
+        bank: List[Dict[str, Any]],
+        picked: List[int],
+        new_questions: List[Dict[str, Any]],
+        new_positions: List[Optional[int]]
+    ):
+        """
+        Record served questions in the student's history and exposure bitset
+        (the caller saves the exposure).
+        
+        ``new_positions`` (from _save_cache) also covers generated questions
+        the bank dropped as near-duplicates: their existing twin is marked.
+        """
+        if history is not None:
+            for i in picked:
+                history.add_if_new(question_key(bank[i]), bank[i])
+            for q in new_questions:
+                history.add_if_new(question_key(q), q)
+        
+        if exposure is not None:
+            for i in picked:
+                exposure.mark(i)
+            for position in new_positions:
+                if position is not None:
+                    exposure.mark(position)
+
     def _load_cache(self, filepath: str) -> List[Dict[str, Any]]:
+        """
+        Load the question bank in file order (positions are stable IDs).
+        
+        Raises:
+            ValueError: If the bank exists but cannot be read. It must not be
+                overwritten then, or every stored exposure bitset would point
+                at the wrong questions.
+        """
+        if not os.path.exists(filepath):
+            return []
         try:
-            if os.path.exists(filepath):
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                    # Randomize? For now just return
-                    import random
-                    random.shuffle(data)
-                    return data
-        except Exception:
-            pass
-        return []
+            with open(filepath, 'r') as f:
+                bank = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Question bank {filepath} is unreadable: {e}") from e
+        if not isinstance(bank, list):
+            raise ValueError(f"Question bank {filepath} is not a list")
+        return bank
 
-    def _save_cache(self, filepath: str, new_questions: List[Dict[str, Any]]):
-        try:
-            # Load existing
-            existing = self._load_cache(filepath)
-            # Combine (avoid duplicates based on question text?)
-            # For simplicity, just append and keep last 100
-            combined = existing + new_questions
-            # Deduplicate by question text
-            unique = {q['question']: q for q in combined}.values()
+    def _save_cache(
+        self,
+        filepath: str,
+        new_questions: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[Optional[int]]]:
+        """
+        Append new distinct questions to the bank.
+        
+        The bank is append-only so that positions stay valid as exposure IDs.
+        Workers share it, so it is re-read under an exclusive lock and
+        replaced atomically: concurrent appends are not lost and no reader
+        sees a partial file.
+        
+        Returns:
+            (bank, positions): the saved bank and, per new question, its bank
+            position or that of the near-duplicate it matched (None when the
+            bank is full)
+        """
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            bank = self._load_cache(filepath)
+            index = NearDuplicateIndex()
+            for i, q in enumerate(bank):
+                index.add(i, question_signature(q))
             
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            with open(filepath, 'w') as f:
-                json.dump(list(unique)[:100], f, indent=2)
-        except Exception as e:
-            logger.error(f"Failed to save cache: {e}")
+            positions = []
+            appended = False
+            for q in new_questions:
+                # Deduplicate near-identical rewordings, not just exact question text
+                sig = question_signature(q)
+                position = index.find(sig)
+                if position is None and len(bank) < QUESTION_BANK_MAX:
+                    position = len(bank)
+                    bank.append(q)
+                    index.add(position, sig)
+                    appended = True
+                positions.append(position)
+            
+            if appended:
+                tmp_path = f"{filepath}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(bank, f, indent=2)
+                os.replace(tmp_path, filepath)
+        return bank, positions
 
     def _create_prompt(self, test_type: str, count: int) -> str:
         """Create a highly specific prompt for Digital SAT format."""
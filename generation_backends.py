@@ -0,0 +1,164 @@
+"""
+Question Generation Backends
+Pluggable LLM backends used by GeminiSATGenerator for batch generation
+"""
+
+import asyncio
+import logging
+from typing import Optional, Dict, Any
+
+import ollama
+
+import gemini_client
+from config import OLLAMA_BASE_URL, OLLAMA_MODEL, GEMINI_MODEL
+from metrics import ollama_call, record_llm_response, stage
+
+logger = logging.getLogger("generation_backends")
+
+# JSON schema passed to Ollama's structured output. The top level has to be
+# an object, so questions are wrapped in {"questions": [...]}.
+QUESTION_SET_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "question": {"type": "string"},
+                    "passage": {"type": "string"},
+                    "options": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "minItems": 4,
+                        "maxItems": 4
+                    },
+                    "correct": {"type": "string", "enum": ["A", "B", "C", "D"]},
+                    "topic": {"type": "string"},
+                    "difficulty": {"type": "string", "enum": ["Easy", "Medium", "Hard"]},
+                    "explanation": {"type": "string"}
+                },
+                "required": ["question", "options", "correct", "topic", "difficulty", "explanation"]
+            }
+        }
+    },
+    "required": ["questions"]
+}
+
+
+class GenerationBackend:
+    """Base class for question generation backends."""
+
+    name = "base"
+
+    async def generate(self, prompt: str) -> str:
+        """
+        Run one generation request.
+
+        Args:
+            prompt: Full generation prompt for one batch
+
+        Returns:
+            Raw model text (expected to contain a JSON array or object)
+        """
+        raise NotImplementedError
+
+
+class GeminiBackend(GenerationBackend):
+    """Google Gemini via the shared pooled REST client (no worker threads)."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str = GEMINI_MODEL):
+        """
+        Initialize Gemini backend.
+
+        Args:
+            api_key: Gemini API key
+            model: Gemini model name
+        """
+        self.api_key = api_key
+        self.model = model
+
+    async def generate(self, prompt: str) -> str:
+        with stage("generation"):
+            return await gemini_client.generate_content(prompt, self.api_key, model=self.model)
+
+
+class OllamaBackend(GenerationBackend):
+    """Local Ollama model with schema-constrained JSON output."""
+
+    name = "ollama"
+
+    def __init__(
+        self,
+        model: str = OLLAMA_MODEL,
+        host: str = OLLAMA_BASE_URL,
+        max_concurrency: int = 4,
+        options: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Initialize Ollama backend.
+
+        Args:
+            model: Ollama model name
+            host: Ollama server URL (point at a stand-in server to benchmark)
+            max_concurrency: Batches in flight at once; match OLLAMA_NUM_PARALLEL
+            options: Extra Ollama generation options
+        """
+        self.model = model
+        self.host = host
+        self.client = ollama.AsyncClient(host=host)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.options = {
+            "temperature": 0.7,
+            "num_ctx": 8192,
+            "num_predict": 6144,
+            **(options or {})
+        }
+
+    async def generate(self, prompt: str) -> str:
+        async with self.semaphore:
+            with ollama_call(self.model, "generate"):
+                response = await self.client.chat(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    format=QUESTION_SET_SCHEMA,
+                    options=self.options
+                )
+                record_llm_response(self.model, response)
+        return response['message']['content']
+
+
+def has_gemini_key(api_key: Optional[str]) -> bool:
+    """Whether api_key looks like a Gemini API key."""
+    return bool(api_key) and "AIza" in api_key
+
+
+def create_backend(name: str, api_key: Optional[str] = None) -> Optional[GenerationBackend]:
+    """
+    Build a backend by name.
+
+    Args:
+        name: "gemini", "ollama" or "auto" (Gemini when a key is set, else Ollama)
+        api_key: Gemini API key
+
+    Returns:
+        Backend instance, or None if the requested backend is unavailable
+    """
+    if name == "auto":
+        name = "gemini" if has_gemini_key(api_key) else "ollama"
+
+    try:
+        if name == "gemini":
+            if not has_gemini_key(api_key):
+                logger.warning("⚠️ No valid Gemini API Key found.")
+                return None
+            return GeminiBackend(api_key)
+        if name == "ollama":
+            return OllamaBackend()
+        logger.error(f"❌ Unknown generation backend: {name}")
+    except Exception as e:
+        logger.error(f"❌ Failed to initialize {name} backend: {e}")
+    return None
@@ -0,0 +1,210 @@
+"""
+Health Monitor
+Background probes of the server's dependencies (Ollama, Chroma, Gemini
+configuration, search providers, mock test MCP pool) with a cached snapshot,
+so health, liveness and readiness endpoints answer from memory
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import (
+    CHROMA_PERSIST_DIR,
+    OLLAMA_BASE_URL,
+    QUESTION_BACKEND,
+    HEALTH_CHECK_INTERVAL,
+    HEALTH_PROBE_TIMEOUT
+)
+from metrics import DEPENDENCY_UP
+from resilience import OPEN, breaker_states
+from service_registry import registry
+
+logger = logging.getLogger("health")
+
+UP = "up"
+DEGRADED = "degraded"
+DOWN = "down"
+IDLE = "idle"                   # not built yet; will be on first use
+UNCONFIGURED = "unconfigured"
+UNKNOWN = "unknown"             # not probed yet
+
+# Statuses a required dependency may have while the server is ready
+READY_STATUSES = (UP, DEGRADED, IDLE)
+
+_ollama_client = None
+
+
+def probe_ollama() -> Dict[str, Any]:
+    global _ollama_client
+    if _ollama_client is None:
+        import ollama
+        _ollama_client = ollama.Client(host=OLLAMA_BASE_URL, timeout=HEALTH_PROBE_TIMEOUT)
+    models = _ollama_client.list()
+    return {'status': UP, 'available_models': len(models.get('models', []))}
+
+
+def probe_chroma() -> Dict[str, Any]:
+    # Probing must not load the index in a worker that has not needed it yet
+    if not registry.is_initialized('rag_engine'):
+        return {'status': IDLE, 'persist_dir_exists': os.path.isdir(CHROMA_PERSIST_DIR)}
+    return {'status': UP, 'chunks': registry.get('rag_engine').vector_store.count()}
+
+
+def probe_gemini() -> Dict[str, Any]:
+    from generation_backends import has_gemini_key
+    breaker = breaker_states().get("generation:gemini")
+    if not has_gemini_key(os.getenv("GEMINI_API_KEY")):
+        status = UNCONFIGURED
+    elif breaker is not None and breaker['state'] == OPEN:
+        status = DOWN
+    else:
+        status = UP
+    return {
+        'status': status,
+        'question_backend': QUESTION_BACKEND,
+        'breaker': breaker['state'] if breaker else None
+    }
+
+
+def probe_search() -> Dict[str, Any]:
+    # Passive: live probes would spend the providers' rate limits, so the
+    # breakers fed by real traffic are the signal
+    providers = {
+        name: snapshot['state']
+        for name, snapshot in breaker_states().items()
+        if name.startswith(("search:", "youtube:"))
+    }
+    failing = [name for name, state in providers.items() if state == OPEN]
+    if not providers:
+        status = IDLE
+    elif len(failing) == len(providers):
+        status = DOWN
+    else:
+        status = DEGRADED if failing else UP
+    return {'status': status, 'providers': providers}
+
+
+def probe_mock_test_mcp() -> Dict[str, Any]:
+    if not registry.is_initialized('mock_test_client'):
+        return {'status': IDLE}
+    pool = registry.get('mock_test_client').pool
+    ready = pool.ready_count()
+    if not ready:
+        status = DOWN
+    else:
+        status = UP if ready == pool.size else DEGRADED
+    return {'status': status, 'ready_sessions': ready, 'pool_size': pool.size}
+
+
+class HealthMonitor:
+    """
+    Probes every registered dependency each interval on a background task.
+
+    Probes are plain functions run in a worker thread under a timeout; one
+    returns a dict with at least 'status' and raises (or times out) when
+    the dependency is down. Readers only ever see the last completed round.
+    """
+
+    def __init__(self, interval: float = HEALTH_CHECK_INTERVAL, timeout: float = HEALTH_PROBE_TIMEOUT):
+        """
+        Initialize health monitor.
+
+        Args:
+            interval: Seconds between probe rounds
+            timeout: Seconds one probe may take before it counts as down
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self.probes: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.last_round_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, probe: Callable[[], Dict[str, Any]]):
+        self.probes[name] = probe
+
+    async def _probe(self, name: str, probe: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        checked_at = time.time()
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(asyncio.to_thread(probe), self.timeout)
+        except asyncio.TimeoutError:
+            result = {'status': DOWN, 'error': f"probe timed out after {self.timeout:g}s"}
+        except Exception as e:
+            result = {'status': DOWN, 'error': str(e)}
+        result['checked_at'] = checked_at
+        result['latency_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        DEPENDENCY_UP.labels(name).set(1 if result['status'] in READY_STATUSES else 0)
+        return result
+
+    async def check_now(self):
+        """Run one round of probes and publish the results."""
+        names = list(self.probes)
+        results = await asyncio.gather(*(self._probe(name, self.probes[name]) for name in names))
+        for name, result in zip(names, results):
+            previous = self.results.get(name, {}).get('status')
+            if previous is not None and previous != result['status']:
+                logger.warning(f"Dependency {name}: {previous} -> {result['status']}")
+        self.results = dict(zip(names, results))
+        self.last_round_at = time.time()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check_now()
+            except Exception as e:
+                logger.error(f"Health check round failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start probing on the running loop (idempotent)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def status(self, name: str) -> str:
+        return self.results.get(name, {}).get('status', UNKNOWN)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Last result per dependency, with when it was checked and how long ago."""
+        now = time.time()
+        snapshot = {}
+        for name in self.probes:
+            result = dict(self.results.get(name) or {'status': UNKNOWN})
+            checked_at = result.pop('checked_at', None)
+            if checked_at is not None:
+                result['last_checked'] = datetime.fromtimestamp(checked_at, timezone.utc).isoformat()
+                result['age_seconds'] = round(now - checked_at, 1)
+            snapshot[name] = result
+        return snapshot
+
+    def readiness(self, required: Iterable[str]) -> Tuple[bool, List[str]]:
+        """
+        Whether the server should receive traffic.
+
+        Returns:
+            (ready, reasons it is not)
+        """
+        if self.last_round_at is None:
+            return False, ["first health check pending"]
+        if time.time() - self.last_round_at > 3 * self.interval + self.timeout:
+            return False, ["health monitor stalled"]
+        failing = [f"{name}: {self.status(name)}" for name in required if self.status(name) not in READY_STATUSES]
+        return not failing, failing
+
+
+health_monitor = HealthMonitor()
+health_monitor.register('ollama', probe_ollama)
+health_monitor.register('chroma', probe_chroma)
+health_monitor.register('gemini', probe_gemini)
+health_monitor.register('search', probe_search)
+health_monitor.register('mock_test_mcp', probe_mock_test_mcp)
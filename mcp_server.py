@@ -4,17 +4,25 @@ Provides Model Context Protocol interface for local Ollama agent
 """
 
 import os
+import time
+import asyncio
 from typing import Optional, List, Dict, Any
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
 from dotenv import load_dotenv
-from ollama_agent import OllamaAgent
-from sat_agent import SATAgent
-from rag_engine import RAGEngine
-from search_service import SearchService, YouTubeService
+from starlette.requests import Request
+from starlette.responses import Response
+import metrics
+import tracing
+from service_registry import registry
+from services import get_service  # also registers the shared service factories
+from resilience import deadline_scope
+from runtime_settings import runtime_settings
 from config import (
     OLLAMA_MODEL,
+    SEMANTIC_CACHE_ENABLED,
     KNOWLEDGE_BASE_NAME,
-    DATA_DIR
+    DATA_DIR,
+    MCP_TOOL_TIMEOUT
 )
 
 # Load environment variables
@@ -23,16 +31,86 @@ load_dotenv()
 # Initialize MCP server
 mcp = FastMCP("Ollama Agent MCP Server")
 
-# Initialize agents and services
-agent = OllamaAgent(model=OLLAMA_MODEL, use_rag=True)
-sat_agent = SATAgent(model=OLLAMA_MODEL, use_rag=True, use_search=True, use_youtube=True)
-rag_engine = RAGEngine()
-search_service = SearchService()
-youtube_service = YouTubeService()
+# Model used by the agents; change_model swaps it and resets the agents
+current_model = OLLAMA_MODEL
+
+
+# Services are built on first use so that starting the server (and answering
+# list_tools) does not pay for Chroma, langchain, DDGS or yt-dlp imports.
+# services registers the shared factories (rag_engine, search_service,
+# youtube_service, ...); the agents here use the MCP server's own model and
+# every enrichment source.
+def _create_agent():
+    from ollama_agent import OllamaAgent
+    return OllamaAgent(
+        model=current_model,
+        use_rag=True,
+        rag_engine=registry.get('rag_engine'),
+        memory=registry.get('conversation_memory'),
+        answer_cache=registry.get('semantic_cache') if SEMANTIC_CACHE_ENABLED else None
+    )
+
+
+def _create_sat_agent():
+    from sat_agent import SATAgent
+    return SATAgent(
+        model=current_model,
+        use_rag=True,
+        use_search=True,
+        use_youtube=True,
+        rag_engine=registry.get('rag_engine'),
+        search_service=registry.get('search_service'),
+        youtube_service=registry.get('youtube_service'),
+        memory=registry.get('conversation_memory')
+    )
+
+
+registry.register('agent', _create_agent)
+registry.register('sat_agent', _create_sat_agent)
+
+# Per-tool timeouts in seconds (MCP_TOOL_TIMEOUT for anything not listed)
+TOOL_TIMEOUTS = {
+    'list_available_models': 10,
+    'get_knowledge_base_info': 30,
+    'search_internet': 30,
+    'search_youtube': 30,
+    'add_documents_to_kb': 600,
+}
+
+
+async def _with_timeout(tool: str, awaitable):
+    """
+    Await a tool's work under its timeout.
+    
+    On timeout the inner task is cancelled; for async Ollama calls that
+    closes the HTTP request, which stops generation on the server.
+    """
+    timeout = TOOL_TIMEOUTS.get(tool, MCP_TOOL_TIMEOUT)
+    start = time.perf_counter()
+    status = "error"
+    try:
+        # The timeout is also the deadline budget for downstream calls; the
+        # span is the root of the tool call's trace
+        with deadline_scope(timeout), tracing.span(f"tool {tool}", tracing.SPAN_KIND_SERVER, **{'mcp.tool': tool}):
+            result = await asyncio.wait_for(awaitable, timeout=timeout)
+        status = "ok"
+        return result
+    except asyncio.TimeoutError:
+        status = "timeout"
+        raise TimeoutError(f"{tool} timed out after {timeout:.0f}s")
+    finally:
+        metrics.observe_tool(tool, status, time.perf_counter() - start)
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def get_metrics(request: Request) -> Response:
+    """Prometheus metrics for the MCP server's tools and pipeline stages."""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
 
 
 @mcp.tool()
-def list_available_models() -> Dict[str, Any]:
+async def list_available_models() -> Dict[str, Any]:
     """
     List all available Ollama models on the local system.
     
@@ -40,11 +118,12 @@ def list_available_models() -> Dict[str, Any]:
         Dictionary containing list of available models
     """
     try:
-        models = agent.get_available_models()
+        agent = await get_service('agent')
+        models = await _with_timeout('list_available_models', asyncio.to_thread(agent.get_available_models))
         return {
             'success': True,
             'models': models,
-            'current_model': OLLAMA_MODEL,
+            'current_model': current_model,
             'count': len(models)
         }
     except Exception as e:
@@ -55,23 +134,26 @@ def list_available_models() -> Dict[str, Any]:
 
 
 @mcp.tool()
-def chat_with_agent(message: str) -> Dict[str, Any]:
+async def chat_with_agent(message: str, session_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Chat with the Ollama agent.
     
     Args:
         message: User message/question
+        session_id: Optional conversation ID; turns with the same ID share history
     
     Returns:
         Dictionary containing agent response
     """
     try:
-        response = agent.chat(message)
+        agent = await get_service('agent')
+        response = await _with_timeout('chat_with_agent', agent.achat(message, session_id=session_id))
         return {
             'success': True,
             'message': message,
+            'session_id': session_id,
             'response': response,
-            'model': OLLAMA_MODEL
+            'model': current_model
         }
     except Exception as e:
         return {
@@ -82,7 +164,7 @@ def chat_with_agent(message: str) -> Dict[str, Any]:
 
 
 @mcp.tool()
-def query_knowledge_base(
+async def query_knowledge_base(
     query: str,
     n_results: int = 5
 ) -> Dict[str, Any]:
@@ -97,7 +179,8 @@ def query_knowledge_base(
         Dictionary containing response and retrieved documents
     """
     try:
-        result = agent.query_with_rag(query, n_results=n_results)
+        agent = await get_service('agent')
+        result = await _with_timeout('query_knowledge_base', agent.aquery_with_rag(query, n_results=n_results))
         
         return {
             'success': True,
@@ -111,7 +194,9 @@ def query_knowledge_base(
                 }
                 for doc in result['retrieved_docs']
             ],
-            'doc_count': len(result['retrieved_docs'])
+            'doc_count': len(result['retrieved_docs']),
+            'cache': result.get('cache'),
+            'retrieval': result.get('retrieval')
         }
     except Exception as e:
         return {
@@ -122,7 +207,7 @@ def query_knowledge_base(
 
 
 @mcp.tool()
-def get_knowledge_base_info() -> Dict[str, Any]:
+async def get_knowledge_base_info() -> Dict[str, Any]:
     """
     Get information about the knowledge base.
     
@@ -130,7 +215,8 @@ def get_knowledge_base_info() -> Dict[str, Any]:
         Dictionary containing knowledge base statistics
     """
     try:
-        info = rag_engine.get_kb_info()
+        rag_engine = await get_service('rag_engine')
+        info = await _with_timeout('get_knowledge_base_info', asyncio.to_thread(rag_engine.get_kb_info))
         return {
             'success': True,
             'knowledge_base': {
@@ -148,10 +234,12 @@ def get_knowledge_base_info() -> Dict[str, Any]:
 
 
 @mcp.tool()
-def add_documents_to_kb(file_paths: List[str]) -> Dict[str, Any]:
+async def add_documents_to_kb(file_paths: List[str], ctx: Context) -> Dict[str, Any]:
     """
     Add documents to the knowledge base.
     
+    Reports progress per loaded file and per batch of embedded chunks.
+    
     Args:
         file_paths: List of file paths to add
     
@@ -174,8 +262,19 @@ def add_documents_to_kb(file_paths: List[str]) -> Dict[str, Any]:
                 'error': 'No valid files found'
             }
         
-        # Add to knowledge base
-        rag_engine.add_documents_to_kb(valid_files)
+        # Add to knowledge base, forwarding progress from the worker thread
+        loop = asyncio.get_running_loop()
+        
+        def report(done: float, total: float, message: str):
+            asyncio.run_coroutine_threadsafe(ctx.report_progress(done, total, message), loop)
+        
+        rag_engine = await get_service('rag_engine')
+        await _with_timeout(
+            'add_documents_to_kb',
+            asyncio.to_thread(rag_engine.add_documents_to_kb, valid_files, None, report)
+        )
+        # API server workers reopen the index on their next request
+        runtime_settings.update(kb_version=time.time())
         
         return {
             'success': True,
@@ -190,7 +289,7 @@ def add_documents_to_kb(file_paths: List[str]) -> Dict[str, Any]:
 
 
 @mcp.tool()
-def change_model(model_name: str) -> Dict[str, Any]:
+async def change_model(model_name: str) -> Dict[str, Any]:
     """
     Change the Ollama model being used.
     
@@ -201,9 +300,10 @@ def change_model(model_name: str) -> Dict[str, Any]:
         Dictionary with operation result
     """
     try:
-        global agent, sat_agent
-        agent = OllamaAgent(model=model_name, use_rag=True)
-        sat_agent = SATAgent(model=model_name, use_rag=True, use_search=True, use_youtube=True)
+        global current_model
+        current_model = model_name
+        # Agents are rebuilt lazily with the new model; RAG/search services are kept
+        registry.reset('agent', 'sat_agent')
         return {
             'success': True,
             'model': model_name,
@@ -218,10 +318,12 @@ def change_model(model_name: str) -> Dict[str, Any]:
 
 
 @mcp.tool()
-def practice_sat_question(question: str, use_rag: bool = True, use_search: bool = True, use_youtube: bool = True) -> Dict[str, Any]:
+async def practice_sat_question(question: str, ctx: Context, use_rag: bool = True, use_search: bool = True, use_youtube: bool = True) -> Dict[str, Any]:
     """
     Answer a SAT practice question with comprehensive support.
     
+    Reports progress while the tutor loads and the answer is generated.
+    
     Args:
         question: The SAT practice question
         use_rag: Whether to use RAG from knowledge base
@@ -232,7 +334,14 @@ def practice_sat_question(question: str, use_rag: bool = True, use_search: bool
         Dictionary with answer, explanation, and resources
     """
     try:
-        result = sat_agent.practice_question(question, use_rag=use_rag, use_search=use_search, use_youtube=use_youtube)
+        await ctx.report_progress(0, 3, "Loading SAT tutor")
+        sat_agent = await get_service('sat_agent')
+        await ctx.report_progress(1, 3, "Generating answer")
+        result = await _with_timeout(
+            'practice_sat_question',
+            sat_agent.apractice_question(question, use_rag=use_rag, use_search=use_search, use_youtube=use_youtube)
+        )
+        await ctx.report_progress(3, 3, "Done")
         return {
             'success': True,
             **result
@@ -246,7 +355,7 @@ def practice_sat_question(question: str, use_rag: bool = True, use_search: bool
 
 
 @mcp.tool()
-def explain_sat_concept(concept: str, use_rag: bool = True, use_search: bool = True, use_youtube: bool = True) -> Dict[str, Any]:
+async def explain_sat_concept(concept: str, use_rag: bool = True, use_search: bool = True, use_youtube: bool = True) -> Dict[str, Any]:
     """
     Explain a SAT concept with resources.
     
@@ -260,7 +369,11 @@ def explain_sat_concept(concept: str, use_rag: bool = True, use_search: bool = T
         Dictionary with explanation and resources
     """
     try:
-        result = sat_agent.explain_concept(concept, use_rag=use_rag, use_search=use_search, use_youtube=use_youtube)
+        sat_agent = await get_service('sat_agent')
+        result = await _with_timeout(
+            'explain_sat_concept',
+            sat_agent.aexplain_concept(concept, use_rag=use_rag, use_search=use_search, use_youtube=use_youtube)
+        )
         return {
             'success': True,
             **result
@@ -274,10 +387,14 @@ def explain_sat_concept(concept: str, use_rag: bool = True, use_search: bool = T
 
 
 @mcp.tool()
-def search_internet(query: str, max_results: int = 5) -> Dict[str, Any]:
+async def search_internet(query: str, max_results: int = 5) -> Dict[str, Any]:
     """
     Search the internet for information.
     
+    The search runs in a worker thread and is not cancellable: a timeout
+    returns at once, while the thread finishes its provider request
+    (bounded by SEARCH_TIMEOUT).
+    
     Args:
         query: Search query
         max_results: Maximum number of results
@@ -286,7 +403,8 @@ def search_internet(query: str, max_results: int = 5) -> Dict[str, Any]:
         Dictionary with search results
     """
     try:
-        results = search_service.search(query, max_results=max_results)
+        search_service = await get_service('search_service')
+        results = await _with_timeout('search_internet', asyncio.to_thread(search_service.search, query, max_results=max_results))
         return {
             'success': True,
             'query': query,
@@ -302,10 +420,14 @@ def search_internet(query: str, max_results: int = 5) -> Dict[str, Any]:
 
 
 @mcp.tool()
-def search_youtube(query: str, max_results: int = 5) -> Dict[str, Any]:
+async def search_youtube(query: str, max_results: int = 5) -> Dict[str, Any]:
     """
     Search YouTube for videos.
     
+    The lookup runs on the YouTube worker pool (YOUTUBE_WORKERS threads) and
+    is not cancellable: the tool returns after YOUTUBE_QUERY_DEADLINE, while
+    the worker finishes its request (bounded by YOUTUBE_SOCKET_TIMEOUT).
+    
     Args:
         query: Search query
         max_results: Maximum number of results
@@ -314,7 +436,8 @@ def search_youtube(query: str, max_results: int = 5) -> Dict[str, Any]:
         Dictionary with video results
     """
     try:
-        videos = youtube_service.search_videos(query, max_results=max_results)
+        youtube_service = await get_service('youtube_service')
+        videos = await _with_timeout('search_youtube', asyncio.to_thread(youtube_service.search_videos, query, max_results=max_results))
         return {
             'success': True,
             'query': query,
@@ -0,0 +1,284 @@
+"""
+Metrics
+Prometheus counters and histograms per endpoint and per pipeline stage
+(embedding, vector query, prompt build, LLM prefill/decode, search, YouTube,
+question generation), plus cache, queue, breaker and Ollama backend state
+
+Each stage is also a tracing span (see tracing). Hot-path instrumentation
+is one histogram observation per stage; cache hit
+counts, queue depths and breaker states are read from the live objects only
+when /metrics is scraped. Under serve.py every worker writes its counters and
+histograms to METRICS_MULTIPROC_DIR and a scrape merges them; the scrape-time
+state comes from the worker that answers it.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from resilience import CLOSED, HALF_OPEN, OPEN, breaker_states
+from result_cache import cache_stats, refresh_queue_depth
+from tracing import SPAN_KIND_CLIENT, set_attributes, span
+
+# Request latency spans cached lookups (ms) to full RAG answers (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+REQUEST_LATENCY = Histogram(
+    "sat_http_request_duration_seconds",
+    "API request latency by route template",
+    ["method", "endpoint", "status"],
+    buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "sat_http_requests_in_flight",
+    "API requests being handled",
+    multiprocess_mode="livesum"
+)
+MCP_TOOL_LATENCY = Histogram(
+    "sat_mcp_tool_duration_seconds",
+    "MCP tool call latency",
+    ["tool", "status"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_LATENCY = Histogram(
+    "sat_stage_duration_seconds",
+    "Time spent in one pipeline stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+OLLAMA_REQUESTS = Counter(
+    "sat_ollama_requests",
+    "Ollama calls by model, kind (chat, embed, generate) and outcome",
+    ["model", "kind", "outcome"]
+)
+OLLAMA_IN_FLIGHT = Gauge(
+    "sat_ollama_requests_in_flight",
+    "Ollama calls waiting for a response",
+    multiprocess_mode="livesum"
+)
+OLLAMA_UP = Gauge(
+    "sat_ollama_up",
+    "1 if the most recent Ollama call succeeded, 0 if it failed",
+    multiprocess_mode="mostrecent"
+)
+DEPENDENCY_UP = Gauge(
+    "sat_dependency_up",
+    "1 if the health monitor's last probe found the dependency usable",
+    ["dependency"],
+    multiprocess_mode="mostrecent"
+)
+RETRIEVAL_DECISIONS = Counter(
+    "sat_retrieval_gate_decisions",
+    "Retrieval gate decisions (retrieved, no_match, skipped_chitchat, skipped_compute)",
+    ["decision"]
+)
+RETRIEVAL_CHUNKS = Counter(
+    "sat_retrieval_gate_chunks",
+    "Retrieved chunks kept in or dropped from the prompt by the retrieval gate",
+    ["outcome"]
+)
+LLM_TOKENS = Counter(
+    "sat_llm_tokens",
+    "Tokens processed by Ollama, by model and phase (prompt, completion)",
+    ["model", "phase"]
+)
+
+BREAKER_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+# Stage recorded for the wall time of each kind of Ollama call
+OLLAMA_STAGES = {'chat': "llm", 'embed': "embedding", 'generate': "generation"}
+CACHE_LOOKUP_RESULTS = ('hits', 'stale_hits', 'disk_hits', 'misses', 'coalesced', 'errors')
+
+# Bound children by label, so a hot-path observation skips the labels() lock
+_stage_children: Dict[str, Any] = {}
+_request_children: Dict[Tuple[str, str, str], Any] = {}
+
+# Queue depth readers registered by the services (name -> callable)
+_queue_depths: Dict[str, Callable[[], int]] = {'cache_refresh': refresh_queue_depth}
+# Stats readers of other caches, each returning {cache name: get_stats()}
+_cache_stats: List[Callable[[], Dict[str, Dict[str, Any]]]] = [cache_stats]
+
+
+def observe_stage(name: str, seconds: float):
+    """Record one stage duration."""
+    child = _stage_children.get(name)
+    if child is None:
+        child = _stage_children[name] = STAGE_LATENCY.labels(name)
+    child.observe(seconds)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time and trace a block as one pipeline stage (works around sync and async code)."""
+    start = time.perf_counter()
+    try:
+        with span(name):
+            yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+def observe_request(method: str, endpoint: str, status: int, seconds: float):
+    """Record one API request."""
+    key = (method, endpoint, str(status))
+    child = _request_children.get(key)
+    if child is None:
+        child = _request_children[key] = REQUEST_LATENCY.labels(*key)
+    child.observe(seconds)
+
+
+def observe_tool(tool: str, status: str, seconds: float):
+    """Record one MCP tool call."""
+    MCP_TOOL_LATENCY.labels(tool, status).observe(seconds)
+
+
+@contextmanager
+def ollama_call(model: str, kind: str = "chat") -> Iterator[None]:
+    """
+    Track one Ollama call: in-flight count, outcome and backend state.
+
+    The block's wall time is recorded as the stage for kind (see
+    OLLAMA_STAGES). Cancellation says nothing about the backend. Call
+    record_llm_response inside the block so the span gets the token counts.
+    """
+    OLLAMA_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    try:
+        with span(f"ollama.{kind}", SPAN_KIND_CLIENT, **{'llm.model': model}):
+            yield
+    except Exception:
+        OLLAMA_REQUESTS.labels(model, kind, "error").inc()
+        OLLAMA_UP.set(0)
+        raise
+    except BaseException:
+        OLLAMA_REQUESTS.labels(model, kind, "cancelled").inc()
+        raise
+    else:
+        OLLAMA_REQUESTS.labels(model, kind, "ok").inc()
+        OLLAMA_UP.set(1)
+    finally:
+        OLLAMA_IN_FLIGHT.dec()
+        observe_stage(OLLAMA_STAGES.get(kind, kind), time.perf_counter() - start)
+
+
+def record_llm_response(model: str, response: Any):
+    """
+    Record prefill/decode time and token counts from an Ollama response.
+
+    Ollama reports durations in nanoseconds; fields missing from the
+    response (e.g. a mocked client) are skipped. The same figures are added
+    to the current span.
+    """
+    prefill = response.get('prompt_eval_duration')
+    decode = response.get('eval_duration')
+    prompt_tokens = response.get('prompt_eval_count')
+    completion_tokens = response.get('eval_count')
+    if prefill:
+        observe_stage("llm_prefill", prefill / 1e9)
+    if decode:
+        observe_stage("llm_decode", decode / 1e9)
+    if prompt_tokens:
+        LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+    set_attributes(**{
+        'llm.prefill_ms': round((prefill or 0) / 1e6, 1),
+        'llm.decode_ms': round((decode or 0) / 1e6, 1),
+        'llm.prompt_tokens': prompt_tokens or 0,
+        'llm.completion_tokens': completion_tokens or 0
+    })
+
+
+def register_queue(name: str, depth: Callable[[], int]):
+    """Report depth() as sat_queue_depth{queue=name} on every scrape."""
+    _queue_depths[name] = depth
+
+
+def register_cache_stats(stats: Callable[[], Dict[str, Dict[str, Any]]]):
+    """Report the caches in stats() ({name: get_stats()}) with the result caches."""
+    _cache_stats.append(stats)
+
+
+class RuntimeCollector:
+    """Scrape-time gauges and counters read from live caches, queues and breakers."""
+
+    def collect(self):
+        lookups = CounterMetricFamily(
+            "sat_cache_lookups", "Result cache lookups by outcome", labels=["cache", "result"]
+        )
+        hit_ratio = GaugeMetricFamily(
+            "sat_cache_hit_ratio", "Share of lookups served from cache (fresh or stale)", labels=["cache"]
+        )
+        entries = GaugeMetricFamily("sat_cache_entries", "Entries held in memory", labels=["cache"])
+        audits = CounterMetricFamily(
+            "sat_cache_audits", "Audited cache hits by outcome (ok, false_hit)", labels=["cache", "result"]
+        )
+        for read_stats in _cache_stats:
+            for name, stats in read_stats().items():
+                for result in CACHE_LOOKUP_RESULTS:
+                    if result in stats:
+                        lookups.add_metric([name, result], stats[result])
+                hit_ratio.add_metric([name], stats['hit_ratio'])
+                entries.add_metric([name], stats['entries'])
+                if 'audits' in stats:
+                    audits.add_metric([name, "ok"], stats['audits'] - stats['false_hits'])
+                    audits.add_metric([name, "false_hit"], stats['false_hits'])
+        yield lookups
+        yield hit_ratio
+        yield entries
+        yield audits
+
+        depths = GaugeMetricFamily("sat_queue_depth", "Work waiting in a queue or in flight", labels=["queue"])
+        for name, depth in sorted(_queue_depths.items()):
+            try:
+                depths.add_metric([name], depth())
+            except Exception:
+                continue
+        yield depths
+
+        state = GaugeMetricFamily(
+            "sat_circuit_breaker_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)", labels=["breaker"]
+        )
+        rejected = CounterMetricFamily(
+            "sat_circuit_breaker_rejected", "Calls failed fast by an open breaker", labels=["breaker"]
+        )
+        for name, snapshot in breaker_states().items():
+            state.add_metric([name], BREAKER_STATE_VALUES[snapshot['state']])
+            rejected.add_metric([name], snapshot['rejected'])
+        yield state
+        yield rejected
+
+
+_runtime_collector = RuntimeCollector()
+REGISTRY.register(_runtime_collector)
+
+
+def multiprocess_enabled() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def render() -> Tuple[bytes, str]:
+    """
+    Current metrics in Prometheus text format.
+
+    Returns:
+        (body, content type)
+    """
+    if multiprocess_enabled():
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_runtime_collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
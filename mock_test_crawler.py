@@ -0,0 +1,221 @@
+"""
+SAT Mock Test Crawler
+Refreshes the mock test catalog from the source sites with conditional GETs,
+an on-disk response cache and per-host politeness limits
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import asdict
+from typing import List, Dict, Mapping, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from config import (
+    MOCK_TEST_CRAWL_CACHE_DIR,
+    MOCK_TEST_CRAWL_PER_HOST,
+    MOCK_TEST_CRAWL_MIN_DELAY
+)
+from sat_mock_test_mcp import SATMockTestMCP, MockTest, MockTestCatalog, mock_test_catalog
+
+# Link text that marks a test listing
+TEST_LINK_PATTERN = re.compile(r"practice test|mock test|full[- ]length|sample test|practice exam", re.I)
+QUESTION_COUNT_PATTERN = re.compile(r"(\d+)\s+questions", re.I)
+SECTION_PATTERNS = [
+    ("Math", re.compile(r"\bmath", re.I)),
+    ("Reading & Writing", re.compile(r"\breading\b.*\bwriting\b|\bwriting\b.*\breading\b", re.I)),
+    ("Reading", re.compile(r"\breading\b", re.I)),
+    ("Writing", re.compile(r"\bwriting\b", re.I))
+]
+# Only anchors are parsed; the rest of the page is skipped by the parser
+LINK_STRAINER = SoupStrainer("a")
+
+
+def extract_tests(html: str, page_url: str, source: str, difficulty: str = "All Levels") -> List[MockTest]:
+    """
+    Extract mock test listings from a page.
+
+    Args:
+        html: Page HTML
+        page_url: URL the page was fetched from (for resolving links)
+        source: Source name recorded on each test
+        difficulty: Difficulty recorded on each test
+
+    Returns:
+        Tests found on the page, one per distinct link
+    """
+    soup = BeautifulSoup(html, "html.parser", parse_only=LINK_STRAINER)
+    tests = []
+    seen = set()
+    for link in soup.find_all("a", href=True):
+        title = " ".join(link.get_text(" ", strip=True).split())
+        description = link.get("title", "")
+        if not TEST_LINK_PATTERN.search(title):
+            continue
+        url = urljoin(page_url, link["href"])
+        if url in seen:
+            continue
+        seen.add(url)
+
+        text = f"{title} {description}"
+        sections = []
+        for name, pattern in SECTION_PATTERNS:
+            if pattern.search(text) and not any(name in s or s in name for s in sections):
+                sections.append(name)
+        count = QUESTION_COUNT_PATTERN.search(text)
+        tests.append(MockTest(
+            title=title,
+            source=source,
+            url=url,
+            sections=sections or ["Reading & Writing", "Math"],
+            questions_count=int(count.group(1)) if count else 0,
+            difficulty=difficulty,
+            description=description or f"{title} from {source}"
+        ))
+    return tests
+
+
+class ResponseCache:
+    """On-disk cache of crawled pages: validators, body and extracted tests."""
+
+    def __init__(self, cache_dir: str = MOCK_TEST_CRAWL_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode()).hexdigest() + ".json")
+
+    def get(self, url: str) -> Optional[Dict]:
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, entry: Dict):
+        # Write then rename so a crash never leaves a half-written entry
+        path = self._path(url)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+class MockTestCrawler:
+    """
+    Crawls the listing pages in SATMockTestMCP.sources into the catalog.
+
+    Requests to one host are limited to per_host_limit at a time and spaced
+    at least min_delay seconds apart. Pages are fetched with If-None-Match /
+    If-Modified-Since from the on-disk cache, so an unchanged page costs a
+    304 and is not re-parsed.
+    """
+
+    def __init__(
+        self,
+        client: Optional[SATMockTestMCP] = None,
+        catalog: Optional[MockTestCatalog] = None,
+        cache: Optional[ResponseCache] = None,
+        per_host_limit: int = MOCK_TEST_CRAWL_PER_HOST,
+        min_delay: float = MOCK_TEST_CRAWL_MIN_DELAY
+    ):
+        self.client = client or SATMockTestMCP()
+        self.catalog = catalog or mock_test_catalog
+        self.cache = cache or ResponseCache()
+        self.per_host_limit = per_host_limit
+        self.min_delay = min_delay
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_next: Dict[str, float] = {}
+
+    def pages(self) -> List[Tuple[str, str]]:
+        """(source name, listing URL) for every configured source."""
+        return [
+            (source['name'], source['base_url'] + source['sat_path'])
+            for source in self.client.sources.values()
+        ]
+
+    async def _polite_fetch(self, url: str, headers: Dict[str, str]) -> Tuple[int, Optional[str], Mapping[str, str]]:
+        """Fetch within the host's concurrency limit and request spacing."""
+        host = urlparse(url).netloc
+        slots = self._host_slots.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+        async with slots:
+            now = time.monotonic()
+            start = max(now, self._host_next.get(host, 0.0))
+            self._host_next[host] = start + self.min_delay
+            if start > now:
+                await asyncio.sleep(start - now)
+            return await self.client.fetch(url, headers=headers)
+
+    async def crawl_page(self, source: str, url: str) -> Dict:
+        """
+        Refresh one listing page.
+
+        Returns:
+            Page result: status ('fetched', 'not_modified' or 'failed'),
+            bytes downloaded and number of tests
+        """
+        entry = self.cache.get(url)
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        status, body, response_headers = await self._polite_fetch(url, headers)
+
+        if status == 200 and body is not None:
+            difficulty = "Official" if "College Board" in source else "All Levels"
+            tests = extract_tests(body, url, source, difficulty)
+            self.cache.put(url, {
+                'url': url,
+                'etag': response_headers.get('ETag'),
+                'last_modified': response_headers.get('Last-Modified'),
+                'fetched_at': time.time(),
+                'body': body,
+                'tests': [asdict(test) for test in tests]
+            })
+            result = {'status': 'fetched', 'bytes': len(body.encode('utf-8'))}
+        elif entry:
+            # 304, or an error with a previous copy: keep the cached extraction
+            tests = [MockTest(**test) for test in entry.get('tests', [])]
+            result = {'status': 'not_modified' if status == 304 else 'failed', 'bytes': 0}
+        else:
+            return {'url': url, 'status': 'failed', 'bytes': 0, 'tests': 0}
+
+        self.catalog.set_crawled(url, tests)
+        return {'url': url, **result, 'tests': len(tests)}
+
+    async def crawl(self) -> Dict:
+        """Refresh every source page concurrently (politeness is per host)."""
+        results = await asyncio.gather(*(self.crawl_page(source, url) for source, url in self.pages()))
+        return {
+            'pages': results,
+            'fetched': sum(1 for r in results if r['status'] == 'fetched'),
+            'not_modified': sum(1 for r in results if r['status'] == 'not_modified'),
+            'failed': sum(1 for r in results if r['status'] == 'failed'),
+            'bytes': sum(r['bytes'] for r in results),
+            'tests': sum(r['tests'] for r in results)
+        }
+
+    async def close(self):
+        await self.client.__aexit__(None, None, None)
+
+
+async def refresh_catalog() -> Dict:
+    """Crawl all sources once into the shared catalog."""
+    crawler = MockTestCrawler()
+    try:
+        return await crawler.crawl()
+    finally:
+        await crawler.close()
+
+
+if __name__ == "__main__":
+    summary = asyncio.run(refresh_catalog())
+    print(json.dumps({k: v for k, v in summary.items() if k != 'pages'}, indent=2))
@@ -1,48 +1,257 @@
 import asyncio
 import json
 import logging
+import os
+import sys
 from typing import Optional, List, Dict, Any
-import httpx
+import anyio
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from config import MOCK_TEST_MCP_POOL_SIZE
+from resilience import DeadlineExceeded, get_breaker, wait_for
+from metrics import stage
 
 logger = logging.getLogger(__name__)
 
-class MockTestMCPClient:
-    def __init__(self):
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_test_mcp_server.py")
+
+# Error codes the MCP client uses when the session, not the tool, failed:
+# connection closed, request timeout (mcp 1.x+) and HTTP 408 (mcp 1.0)
+_SESSION_ERROR_CODES = {-32000, -32001, 408}
+
+
+def _is_session_failure(e: Exception) -> bool:
+    """True for transport and session failures; False for errors the tool returned."""
+    if isinstance(e, (OSError, EOFError, anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)):
+        return True  # includes ConnectionError and (asyncio.)TimeoutError
+    error = getattr(e, "error", None)
+    return getattr(error, "code", None) in _SESSION_ERROR_CODES
+
+
+class _ToolError:
+    """A tool-level error carried through the breaker as a result (the session is healthy)."""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class _PooledSession:
+    """One supervised mock_test_mcp_server.py subprocess and its session."""
+
+    def __init__(self, index: int):
+        self.index = index
         self.session: Optional[ClientSession] = None
+        self.in_flight = 0
+        self.restarts = 0
+        self.ready = asyncio.Event()
+        self.restart = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class MCPSessionPool:
+    """
+    Pool of MCP stdio sessions with health checks, respawn and
+    least-busy dispatch.
+    
+    Each session is opened and closed inside its own supervisor task, so
+    the stdio_client/ClientSession context managers are always exited by
+    the task that entered them.
+    """
+
+    def __init__(
+        self,
+        server_params: StdioServerParameters,
+        size: int = MOCK_TEST_MCP_POOL_SIZE,
+        health_interval: float = 15.0,
+        connect_timeout: float = 30.0,
+        call_timeout: float = 180.0
+    ):
+        self.server_params = server_params
+        self.size = size
+        self.health_interval = health_interval
+        self.connect_timeout = connect_timeout
+        self.call_timeout = call_timeout
+        self.breaker = get_breaker("mock_test_mcp")
+        self.workers: List[_PooledSession] = []
+        self._health_task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def started(self) -> bool:
+        return bool(self.workers)
+
+    async def start(self) -> bool:
+        """Spawn the server processes and wait until at least one is ready."""
+        if self.started:
+            return self.ready_count() > 0
+        self._stopping = False
+        self.workers = [_PooledSession(i) for i in range(self.size)]
+        for worker in self.workers:
+            worker.task = asyncio.create_task(self._supervise(worker))
+        self._health_task = asyncio.create_task(self._health_loop())
+        return await self._wait_for_ready() is not None
+
+    async def stop(self):
+        """Close every session and terminate the server processes."""
+        self._stopping = True
+        if self._health_task:
+            self._health_task.cancel()
+        for worker in self.workers:
+            worker.restart.set()
+        await asyncio.gather(*(w.task for w in self.workers if w.task), return_exceptions=True)
+        self.workers = []
+
+    async def _supervise(self, worker: _PooledSession):
+        """Keep one session alive, respawning the subprocess when it fails."""
+        backoff = 0.5
+        while not self._stopping:
+            try:
+                async with stdio_client(self.server_params) as (read_stream, write_stream):
+                    async with ClientSession(read_stream, write_stream) as session:
+                        await session.initialize()
+                        worker.session = session
+                        worker.ready.set()
+                        backoff = 0.5
+                        logger.info(f"MCP session {worker.index} ready")
+                        await worker.restart.wait()
+            except Exception as e:
+                logger.error(f"MCP session {worker.index} failed: {e}")
+            finally:
+                worker.session = None
+                worker.ready.clear()
+                worker.restart.clear()
+            
+            if self._stopping:
+                break
+            worker.restarts += 1
+            logger.info(f"Respawning MCP session {worker.index} in {backoff:.1f}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    async def _health_loop(self):
+        """Ping every ready session; restart the ones that do not answer."""
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for worker in self.workers:
+                if worker.session is None:
+                    continue
+                try:
+                    await asyncio.wait_for(worker.session.send_ping(), timeout=5.0)
+                except Exception as e:
+                    logger.warning(f"MCP session {worker.index} failed health check: {e}")
+                    worker.restart.set()
+
+    async def _wait_for_ready(self) -> Optional[_PooledSession]:
+        """Return the least busy ready worker, waiting for one if needed."""
+        # A session marked for restart may not have been torn down yet
+        ready = [w for w in self.workers if w.session is not None and not w.restart.is_set()]
+        if not ready:
+            waiters = [asyncio.create_task(w.ready.wait()) for w in self.workers]
+            await asyncio.wait(waiters, timeout=self.connect_timeout, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in waiters:
+                waiter.cancel()
+            ready = [w for w in self.workers if w.session is not None and not w.restart.is_set()]
+        return min(ready, key=lambda w: w.in_flight) if ready else None
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]):
+        """
+        Call a tool on the least busy session.
+        
+        A transport error or timeout restarts that session and the call is
+        retried once on another one. Each attempt is capped by the request
+        deadline, and while the pool's breaker is open calls fail at once
+        so callers go straight to their fallbacks. An error the tool itself
+        raised is passed through as is: it neither restarts the session
+        (which other calls may be sharing) nor counts against the breaker.
+        """
+        with stage("mock_test_mcp"):
+            result = await self.breaker.acall(lambda: self._call_with_retry(name, arguments))
+        if isinstance(result, _ToolError):
+            raise result.error
+        return result
+
+    async def _call_with_retry(self, name: str, arguments: Dict[str, Any]):
+        if not self.started:
+            await self.start()
+        
+        last_error: Optional[Exception] = None
+        for _ in range(2):
+            worker = await self._wait_for_ready()
+            if worker is None:
+                raise ConnectionError("No MCP session available")
+            worker.in_flight += 1
+            try:
+                return await wait_for(worker.session.call_tool(name, arguments), self.call_timeout)
+            except DeadlineExceeded:
+                # The request ran out of time, not the session
+                raise
+            except Exception as e:
+                if not _is_session_failure(e):
+                    logger.warning(f"MCP tool {name} returned an error: {e}")
+                    return _ToolError(e)
+                logger.error(f"MCP session {worker.index} call {name} failed: {e}")
+                last_error = e
+                worker.restart.set()
+            finally:
+                worker.in_flight -= 1
+        raise last_error
+
+    def ready_count(self) -> int:
+        return sum(1 for w in self.workers if w.session is not None)
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Per-session readiness, load and restart counts."""
+        return [
+            {
+                "index": w.index,
+                "ready": w.session is not None,
+                "in_flight": w.in_flight,
+                "restarts": w.restarts
+            }
+            for w in self.workers
+        ]
+
+
+class MockTestMCPClient:
+    def __init__(self, pool_size: int = MOCK_TEST_MCP_POOL_SIZE):
         self.server_params = StdioServerParameters(
-            command="python",
-            args=["mock_test_mcp_server.py"]
+            command=sys.executable,
+            args=[SERVER_SCRIPT]
         )
+        self.pool = MCPSessionPool(self.server_params, size=pool_size)
 
     async def connect(self):
-        """Connect to the MCP server"""
+        """Start the pool of MCP server sessions"""
         try:
-            self.session = await stdio_client(self.server_params)
-            await self.session.initialize()
-            logger.info("Connected to Mock Test MCP Server")
-            return True
+            connected = await self.pool.start()
+            if connected:
+                logger.info(f"Connected to Mock Test MCP Server ({self.pool.ready_count()}/{self.pool.size} sessions)")
+            return connected
         except Exception as e:
             logger.error(f"Failed to connect to MCP server: {e}")
             return False
 
     async def disconnect(self):
-        """Disconnect from the MCP server"""
-        if self.session:
-            await self.session.close()
-            self.session = None
+        """Close all MCP server sessions"""
+        await self.pool.stop()
+
+    def is_connected(self) -> bool:
+        return self.pool.ready_count() > 0
+
+    async def _call_tool_json(self, name: str, arguments: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Call a tool and parse its JSON text result"""
+        result = await self.pool.call_tool(name, arguments)
+        if result.content and len(result.content) > 0:
+            return json.loads(result.content[0].text)
+        return []
 
     async def generate_sat_math_questions(self, count: int = 10, difficulty: str = "Mixed", topics: List[str] = None) -> List[Dict[str, Any]]:
         """Generate SAT Math questions using MCP server"""
-        if not self.session:
-            await self.connect()
-        
         if not topics:
             topics = ["Algebra", "Geometry", "Statistics"]
         
         try:
-            result = await self.session.call_tool(
+            return await self._call_tool_json(
                 "generate_sat_math_questions",
                 {
                     "count": count,
@@ -50,103 +259,91 @@ class MockTestMCPClient:
                     "topics": topics
                 }
             )
-            
-            if result.content and len(result.content) > 0:
-                questions_json = result.content[0].text
-                return json.loads(questions_json)
-            return []
         except Exception as e:
             logger.error(f"Error generating SAT Math questions: {e}")
             return self._get_fallback_sat_math_questions(count)
 
     async def generate_sat_english_questions(self, count: int = 10, difficulty: str = "Mixed") -> List[Dict[str, Any]]:
         """Generate SAT English questions using MCP server"""
-        if not self.session:
-            await self.connect()
-        
         try:
-            result = await self.session.call_tool(
+            return await self._call_tool_json(
                 "generate_sat_english_questions",
                 {
                     "count": count,
                     "difficulty": difficulty
                 }
             )
-            
-            if result.content and len(result.content) > 0:
-                questions_json = result.content[0].text
-                return json.loads(questions_json)
-            return []
         except Exception as e:
             logger.error(f"Error generating SAT English questions: {e}")
             return self._get_fallback_sat_english_questions(count)
 
     async def generate_act_questions(self, section: str = "Math", count: int = 10) -> List[Dict[str, Any]]:
         """Generate ACT questions using MCP server"""
-        if not self.session:
-            await self.connect()
-        
         try:
-            result = await self.session.call_tool(
+            return await self._call_tool_json(
                 "generate_act_questions",
                 {
                     "section": section,
                     "count": count
                 }
             )
-            
-            if result.content and len(result.content) > 0:
-                questions_json = result.content[0].text
-                return json.loads(questions_json)
-            return []
         except Exception as e:
             logger.error(f"Error generating ACT questions: {e}")
             return self._get_fallback_act_questions(section, count)
 
     async def fetch_khan_academy_questions(self, subject: str, count: int = 5) -> List[Dict[str, Any]]:
         """Fetch Khan Academy questions using MCP server"""
-        if not self.session:
-            await self.connect()
-        
         try:
-            result = await self.session.call_tool(
+            return await self._call_tool_json(
                 "fetch_khan_academy_questions",
                 {
                     "subject": subject,
                     "count": count
                 }
             )
-            
-            if result.content and len(result.content) > 0:
-                questions_json = result.content[0].text
-                return json.loads(questions_json)
-            return []
         except Exception as e:
             logger.error(f"Error fetching Khan Academy questions: {e}")
             return []
 
     async def fetch_college_board_questions(self, test_type: str, practice_test: int = 1) -> List[Dict[str, Any]]:
         """Fetch College Board questions using MCP server"""
-        if not self.session:
-            await self.connect()
-        
         try:
-            result = await self.session.call_tool(
+            return await self._call_tool_json(
                 "fetch_college_board_questions",
                 {
                     "test_type": test_type,
                     "practice_test": practice_test
                 }
             )
-            
-            if result.content and len(result.content) > 0:
-                questions_json = result.content[0].text
-                return json.loads(questions_json)
-            return []
         except Exception as e:
             logger.error(f"Error fetching College Board questions: {e}")
             return []
 
+    async def generate_question_set(self, sections: List[Dict[str, Any]], seed: Optional[str] = None) -> Dict[str, Any]:
+        """Generate a multi-section question set in a single MCP call"""
+        arguments: Dict[str, Any] = {"sections": sections}
+        if seed:
+            arguments["seed"] = seed
+        try:
+            return await self._call_tool_json("generate_question_set", arguments)
+        except Exception as e:
+            logger.error(f"Error generating question set: {e}")
+            result_sections = []
+            for spec in sections:
+                section = spec.get("section", "")
+                count = spec.get("count", 10)
+                if section == "sat-math":
+                    questions = self._get_fallback_sat_math_questions(count)
+                elif section == "sat-reading-writing":
+                    questions = self._get_fallback_sat_english_questions(count)
+                else:
+                    questions = self._get_fallback_act_questions(section.split("-", 1)[-1].title(), count)
+                result_sections.append({"section": section, "source": "fallback", "questions": questions})
+            return {
+                "sections": result_sections,
+                "total_count": sum(len(s["questions"]) for s in result_sections)
+            }
+
     def _get_fallback_sat_math_questions(self, count: int) -> List[Dict[str, Any]]:
         """Fallback SAT Math questions when MCP fails"""
         base_questions = [
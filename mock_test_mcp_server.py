@@ -7,8 +7,13 @@ Connects to Google Gemini and educational websites to fetch real practice questi
 import asyncio
 import json
 import logging
-from typing import Any, Sequence
-import httpx
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+import gemini_client
+from config import MCP_TOOL_TIMEOUT
+from resilience import deadline_scope, get_breaker
 from mcp.server.models import InitializationOptions
 from mcp.server import NotificationOptions, Server
 from mcp.server.stdio import stdio_server
@@ -28,158 +33,220 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("mock-test-mcp")
 
 # Configuration
-GEMINI_API_KEY = "YOUR_GEMINI_API_KEY"  # Replace with actual key
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent"
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "YOUR_GEMINI_API_KEY")  # Replace with actual key
+
+# generate_question_set fan-out
+QUESTION_SET_SECTIONS = ["sat-math", "sat-reading-writing", "act-math", "act-english", "act-reading", "act-science"]
+QUESTION_SET_CHUNK_SIZE = 10        # questions per Gemini request
+QUESTION_SET_MAX_CONCURRENCY = 4    # Gemini requests in flight per server process
+# Generated chunks are shared by every request with the same section spec and
+# seed for this long; requests without a seed (e.g. a student ID) all get the
+# same questions until it expires
+QUESTION_SET_CACHE_TTL = 600        # seconds a generated chunk is reused
+QUESTION_SET_CACHE_SIZE = 256       # cached chunks kept
 
 class MockTestMCPServer:
     def __init__(self):
         self.server = Server("mock-test-server")
+        self.generation_semaphore = asyncio.Semaphore(QUESTION_SET_MAX_CONCURRENCY)
+        # (section, size, difficulty, topics, part, seed) -> (expires_at, questions)
+        self.chunk_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # Chunks being generated; concurrent identical requests await the same one
+        self.chunk_inflight: Dict[tuple, asyncio.Future] = {}
         self.setup_tools()
 
     def setup_tools(self):
         @self.server.list_tools()
-        async def handle_list_tools() -> ListToolsResult:
-            return ListToolsResult(
-                tools=[
-                    Tool(
-                        name="generate_sat_math_questions",
-                        description="Generate SAT Math practice questions using Google Gemini",
-                        inputSchema={
-                            "type": "object",
-                            "properties": {
-                                "count": {
-                                    "type": "integer",
-                                    "description": "Number of questions to generate",
-                                    "default": 10
-                                },
-                                "difficulty": {
-                                    "type": "string",
-                                    "enum": ["Easy", "Medium", "Hard", "Mixed"],
-                                    "description": "Difficulty level",
-                                    "default": "Mixed"
-                                },
-                                "topics": {
-                                    "type": "array",
-                                    "items": {"type": "string"},
-                                    "description": "Specific topics to focus on",
-                                    "default": ["Algebra", "Geometry", "Statistics"]
-                                }
+        async def handle_list_tools() -> list[Tool]:
+            return [
+                Tool(
+                    name="generate_sat_math_questions",
+                    description="Generate SAT Math practice questions using Google Gemini",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "count": {
+                                "type": "integer",
+                                "description": "Number of questions to generate",
+                                "default": 10
                             },
-                            "required": []
-                        }
-                    ),
-                    Tool(
-                        name="generate_sat_english_questions",
-                        description="Generate SAT Reading & Writing questions using Google Gemini",
-                        inputSchema={
-                            "type": "object",
-                            "properties": {
-                                "count": {
-                                    "type": "integer",
-                                    "description": "Number of questions to generate",
-                                    "default": 10
-                                },
-                                "difficulty": {
-                                    "type": "string",
-                                    "enum": ["Easy", "Medium", "Hard", "Mixed"],
-                                    "description": "Difficulty level",
-                                    "default": "Mixed"
-                                }
+                            "difficulty": {
+                                "type": "string",
+                                "enum": ["Easy", "Medium", "Hard", "Mixed"],
+                                "description": "Difficulty level",
+                                "default": "Mixed"
                             },
-                            "required": []
-                        }
-                    ),
-                    Tool(
-                        name="generate_act_questions",
-                        description="Generate ACT practice questions using Google Gemini",
-                        inputSchema={
-                            "type": "object",
-                            "properties": {
-                                "section": {
-                                    "type": "string",
-                                    "enum": ["Math", "English", "Reading", "Science"],
-                                    "description": "ACT section",
-                                    "default": "Math"
-                                },
-                                "count": {
-                                    "type": "integer",
-                                    "description": "Number of questions to generate",
-                                    "default": 10
-                                }
+                            "topics": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Specific topics to focus on",
+                                "default": ["Algebra", "Geometry", "Statistics"]
+                            }
+                        },
+                        "required": []
+                    }
+                ),
+                Tool(
+                    name="generate_sat_english_questions",
+                    description="Generate SAT Reading & Writing questions using Google Gemini",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "count": {
+                                "type": "integer",
+                                "description": "Number of questions to generate",
+                                "default": 10
                             },
-                            "required": []
-                        }
-                    ),
-                    Tool(
-                        name="fetch_khan_academy_questions",
-                        description="Fetch practice questions from Khan Academy",
-                        inputSchema={
-                            "type": "object",
-                            "properties": {
-                                "subject": {
-                                    "type": "string",
-                                    "enum": ["sat-math", "sat-reading", "act-math"],
-                                    "description": "Subject area"
-                                },
-                                "count": {
-                                    "type": "integer",
-                                    "description": "Number of questions",
-                                    "default": 5
-                                }
+                            "difficulty": {
+                                "type": "string",
+                                "enum": ["Easy", "Medium", "Hard", "Mixed"],
+                                "description": "Difficulty level",
+                                "default": "Mixed"
+                            }
+                        },
+                        "required": []
+                    }
+                ),
+                Tool(
+                    name="generate_act_questions",
+                    description="Generate ACT practice questions using Google Gemini",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "section": {
+                                "type": "string",
+                                "enum": ["Math", "English", "Reading", "Science"],
+                                "description": "ACT section",
+                                "default": "Math"
                             },
-                            "required": ["subject"]
-                        }
-                    ),
-                    Tool(
-                        name="fetch_college_board_questions",
-                        description="Fetch official SAT questions from College Board resources",
-                        inputSchema={
-                            "type": "object",
-                            "properties": {
-                                "test_type": {
-                                    "type": "string",
-                                    "enum": ["sat-math", "sat-reading-writing"],
-                                    "description": "Test type"
-                                },
-                                "practice_test": {
-                                    "type": "integer",
-                                    "description": "Practice test number (1-10)",
-                                    "default": 1
+                            "count": {
+                                "type": "integer",
+                                "description": "Number of questions to generate",
+                                "default": 10
+                            }
+                        },
+                        "required": []
+                    }
+                ),
+                Tool(
+                    name="fetch_khan_academy_questions",
+                    description="Fetch practice questions from Khan Academy",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "subject": {
+                                "type": "string",
+                                "enum": ["sat-math", "sat-reading", "act-math"],
+                                "description": "Subject area"
+                            },
+                            "count": {
+                                "type": "integer",
+                                "description": "Number of questions",
+                                "default": 5
+                            }
+                        },
+                        "required": ["subject"]
+                    }
+                ),
+                Tool(
+                    name="fetch_college_board_questions",
+                    description="Fetch official SAT questions from College Board resources",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "test_type": {
+                                "type": "string",
+                                "enum": ["sat-math", "sat-reading-writing"],
+                                "description": "Test type"
+                            },
+                            "practice_test": {
+                                "type": "integer",
+                                "description": "Practice test number (1-10)",
+                                "default": 1
+                            }
+                        },
+                        "required": ["test_type"]
+                    }
+                ),
+                Tool(
+                    name="generate_question_set",
+                    description="Generate a multi-section question set in one call (e.g. 27 SAT Math, 27 SAT Reading & Writing, 40 ACT Science)",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "sections": {
+                                "type": "array",
+                                "description": "Sections to generate",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "section": {
+                                            "type": "string",
+                                            "enum": QUESTION_SET_SECTIONS,
+                                            "description": "Section to generate"
+                                        },
+                                        "count": {
+                                            "type": "integer",
+                                            "description": "Number of questions",
+                                            "default": 10
+                                        },
+                                        "difficulty": {
+                                            "type": "string",
+                                            "enum": ["Easy", "Medium", "Hard", "Mixed"],
+                                            "default": "Mixed"
+                                        },
+                                        "topics": {
+                                            "type": "array",
+                                            "items": {"type": "string"},
+                                            "description": "Topics to focus on (SAT Math)"
+                                        }
+                                    },
+                                    "required": ["section"]
                                 }
                             },
-                            "required": ["test_type"]
-                        }
-                    )
-                ]
-            )
+                            "seed": {
+                                "type": "string",
+                                "description": "Optional seed such as a student ID; generated chunks are only shared between requests with the same seed"
+                            }
+                        },
+                        "required": ["sections"]
+                    }
+                )
+            ]
 
         @self.server.call_tool()
-        async def handle_call_tool(request: CallToolRequest) -> CallToolResult:
+        async def handle_call_tool(name: str, arguments: dict) -> Sequence[TextContent]:
             try:
-                if request.name == "generate_sat_math_questions":
-                    return await self.generate_sat_math_questions(request.arguments or {})
-                elif request.name == "generate_sat_english_questions":
-                    return await self.generate_sat_english_questions(request.arguments or {})
-                elif request.name == "generate_act_questions":
-                    return await self.generate_act_questions(request.arguments or {})
-                elif request.name == "fetch_khan_academy_questions":
-                    return await self.fetch_khan_academy_questions(request.arguments or {})
-                elif request.name == "fetch_college_board_questions":
-                    return await self.fetch_college_board_questions(request.arguments or {})
-                else:
-                    raise ValueError(f"Unknown tool: {request.name}")
+                # Every Gemini call made for this tool shares one deadline budget
+                with deadline_scope(MCP_TOOL_TIMEOUT):
+                    if name == "generate_sat_math_questions":
+                        result = await self.generate_sat_math_questions(arguments or {})
+                    elif name == "generate_sat_english_questions":
+                        result = await self.generate_sat_english_questions(arguments or {})
+                    elif name == "generate_act_questions":
+                        result = await self.generate_act_questions(arguments or {})
+                    elif name == "fetch_khan_academy_questions":
+                        result = await self.fetch_khan_academy_questions(arguments or {})
+                    elif name == "fetch_college_board_questions":
+                        result = await self.fetch_college_board_questions(arguments or {})
+                    elif name == "generate_question_set":
+                        result = await self.generate_question_set(arguments or {})
+                    else:
+                        raise ValueError(f"Unknown tool: {name}")
+                return result.content
             except Exception as e:
-                logger.error(f"Error in {request.name}: {e}")
-                return CallToolResult(
-                    content=[TextContent(type="text", text=f"Error: {str(e)}")]
-                )
+                logger.error(f"Error in {name}: {e}")
+                return [TextContent(type="text", text=f"Error: {str(e)}")]
 
-    async def generate_sat_math_questions(self, args: dict) -> CallToolResult:
-        count = args.get("count", 10)
-        difficulty = args.get("difficulty", "Mixed")
-        topics = args.get("topics", ["Algebra", "Geometry", "Statistics"])
-        
-        prompt = f"""Generate {count} SAT Math practice questions in JSON format.
+    @staticmethod
+    def json_result(data: Any) -> CallToolResult:
+        """Wrap data as compact JSON text (no pretty-printing)"""
+        return CallToolResult(
+            content=[TextContent(type="text", text=json.dumps(data, separators=(",", ":")))]
+        )
+
+    def build_sat_math_prompt(self, count: int, difficulty: str, topics: List[str]) -> str:
+        return f"""Generate {count} SAT Math practice questions in JSON format.
         Difficulty: {difficulty}
         Topics: {', '.join(topics)}
         
@@ -193,24 +260,21 @@ class MockTestMCPServer:
         - explanation: string (step-by-step solution)
         
         Make questions realistic SAT difficulty. Return ONLY valid JSON array."""
+
+    async def generate_sat_math_questions(self, args: dict) -> CallToolResult:
+        count = args.get("count", 10)
+        difficulty = args.get("difficulty", "Mixed")
+        topics = args.get("topics", ["Algebra", "Geometry", "Statistics"])
         
         try:
-            questions = await self.call_gemini_api(prompt)
-            return CallToolResult(
-                content=[TextContent(type="text", text=json.dumps(questions, indent=2))]
-            )
+            questions = await self.call_gemini_api(self.build_sat_math_prompt(count, difficulty, topics))
+            return self.json_result(questions)
         except Exception as e:
             # Fallback to static questions
-            static_questions = self.get_static_sat_math_questions(count)
-            return CallToolResult(
-                content=[TextContent(type="text", text=json.dumps(static_questions, indent=2))]
-            )
+            return self.json_result(self.get_static_sat_math_questions(count))
 
-    async def generate_sat_english_questions(self, args: dict) -> CallToolResult:
-        count = args.get("count", 10)
-        difficulty = args.get("difficulty", "Mixed")
-        
-        prompt = f"""Generate {count} SAT Reading & Writing questions in JSON format.
+    def build_sat_english_prompt(self, count: int, difficulty: str) -> str:
+        return f"""Generate {count} SAT Reading & Writing questions in JSON format.
         Difficulty: {difficulty}
         
         Each question must have:
@@ -225,23 +289,19 @@ class MockTestMCPServer:
         
         Include variety: grammar, reading comprehension, vocabulary in context.
         Return ONLY valid JSON array."""
+
+    async def generate_sat_english_questions(self, args: dict) -> CallToolResult:
+        count = args.get("count", 10)
+        difficulty = args.get("difficulty", "Mixed")
         
         try:
-            questions = await self.call_gemini_api(prompt)
-            return CallToolResult(
-                content=[TextContent(type="text", text=json.dumps(questions, indent=2))]
-            )
+            questions = await self.call_gemini_api(self.build_sat_english_prompt(count, difficulty))
+            return self.json_result(questions)
         except Exception as e:
-            static_questions = self.get_static_sat_english_questions(count)
-            return CallToolResult(
-                content=[TextContent(type="text", text=json.dumps(static_questions, indent=2))]
-            )
+            return self.json_result(self.get_static_sat_english_questions(count))
 
-    async def generate_act_questions(self, args: dict) -> CallToolResult:
-        section = args.get("section", "Math")
-        count = args.get("count", 10)
-        
-        prompt = f"""Generate {count} ACT {section} practice questions in JSON format.
+    def build_act_prompt(self, section: str, count: int) -> str:
+        return f"""Generate {count} ACT {section} practice questions in JSON format.
         
         Each question must have:
         - id: number
@@ -254,17 +314,138 @@ class MockTestMCPServer:
         
         Make questions realistic ACT {section} difficulty.
         Return ONLY valid JSON array."""
+
+    async def generate_act_questions(self, args: dict) -> CallToolResult:
+        section = args.get("section", "Math")
+        count = args.get("count", 10)
         
         try:
-            questions = await self.call_gemini_api(prompt)
-            return CallToolResult(
-                content=[TextContent(type="text", text=json.dumps(questions, indent=2))]
-            )
+            questions = await self.call_gemini_api(self.build_act_prompt(section, count))
+            return self.json_result(questions)
+        except Exception as e:
+            return self.json_result(self.get_static_act_questions(section, count))
+
+    def build_section_prompt(self, section: str, count: int, difficulty: str, topics: List[str]) -> str:
+        if section == "sat-math":
+            return self.build_sat_math_prompt(count, difficulty, topics or ["Algebra", "Geometry", "Statistics"])
+        if section == "sat-reading-writing":
+            return self.build_sat_english_prompt(count, difficulty)
+        return self.build_act_prompt(section.split("-", 1)[1].title(), count)
+
+    def get_static_section_questions(self, section: str, count: int) -> list:
+        if section == "sat-math":
+            return self.get_static_sat_math_questions(count)
+        if section == "sat-reading-writing":
+            return self.get_static_sat_english_questions(count)
+        return self.get_static_act_questions(section.split("-", 1)[1].title(), count)
+
+    async def generate_chunk(
+        self,
+        section: str,
+        size: int,
+        difficulty: str,
+        topics: List[str],
+        part: int,
+        seed: str = ""
+    ) -> Optional[list]:
+        """
+        Generate one chunk of a section, reusing cached or in-flight results.
+        
+        Returns None if generation failed so the caller can fall back.
+        """
+        key = (section, size, difficulty, tuple(topics), part, seed)
+        cached = self.chunk_cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            self.chunk_cache.move_to_end(key)
+            return cached[1]
+        
+        inflight = self.chunk_inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.get_running_loop().create_future()
+        self.chunk_inflight[key] = future
+        questions = None
+        try:
+            async with self.generation_semaphore:
+                result = await self.call_gemini_api(self.build_section_prompt(section, size, difficulty, topics))
+            if not isinstance(result, list):
+                raise ValueError("Gemini did not return a JSON array")
+            questions = [q for q in result if isinstance(q, dict)][:size]
+            self.chunk_cache[key] = (time.monotonic() + QUESTION_SET_CACHE_TTL, questions)
+            while len(self.chunk_cache) > QUESTION_SET_CACHE_SIZE:
+                self.chunk_cache.popitem(last=False)
         except Exception as e:
-            static_questions = self.get_static_act_questions(section, count)
-            return CallToolResult(
-                content=[TextContent(type="text", text=json.dumps(static_questions, indent=2))]
+            logger.warning(f"Chunk {part} of {section} failed: {e}")
+        finally:
+            future.set_result(questions)
+            del self.chunk_inflight[key]
+        return questions
+
+    async def generate_question_set(self, args: dict) -> CallToolResult:
+        sections = args.get("sections") or []
+        if not sections:
+            raise ValueError("sections is required")
+        seed = str(args.get("seed") or "")
+        
+        # Split every section into chunks that are generated concurrently
+        jobs = []
+        for index, spec in enumerate(sections):
+            if spec.get("section") not in QUESTION_SET_SECTIONS:
+                raise ValueError(f"Unknown section: {spec.get('section')}")
+            count = max(0, int(spec.get("count", 10)))
+            for part, start in enumerate(range(0, count, QUESTION_SET_CHUNK_SIZE)):
+                jobs.append((index, part, min(QUESTION_SET_CHUNK_SIZE, count - start)))
+        total = sum(size for _, _, size in jobs)
+        
+        ctx = self.server.request_context
+        progress_token = ctx.meta.progressToken if ctx.meta else None
+        
+        async def run(job):
+            index, part, size = job
+            spec = sections[index]
+            questions = await self.generate_chunk(
+                spec["section"], size, spec.get("difficulty", "Mixed"), spec.get("topics") or [], part, seed
             )
+            return job, questions
+        
+        chunks = {}
+        done = 0
+        for next_chunk in asyncio.as_completed([run(job) for job in jobs]):
+            (index, part, size), questions = await next_chunk
+            chunks[(index, part)] = questions
+            done += size
+            if progress_token is not None:
+                await ctx.session.send_progress_notification(progress_token, done, total)
+        
+        result_sections = []
+        for index, spec in enumerate(sections):
+            parts = [(chunks[(i, part)], size) for i, part, size in jobs if i == index]
+            failed = sum(1 for questions, _ in parts if questions is None)
+            short = 0
+            questions = []
+            for part_questions, size in parts:
+                part_questions = list(part_questions or [])
+                if 0 < len(part_questions) < size:
+                    short += 1
+                if len(part_questions) < size:
+                    # Failed or short chunk: fill it from the static bank
+                    part_questions += self.get_static_section_questions(spec["section"], size - len(part_questions))
+                questions.extend(part_questions)
+            questions = [dict(q, id=i + 1) for i, q in enumerate(questions)]
+            
+            if failed == 0 and short == 0:
+                source = "gemini"
+            elif failed == len(parts):
+                source = "static"
+            else:
+                source = "mixed"
+            result_sections.append({"section": spec["section"], "source": source, "questions": questions})
+        
+        return self.json_result({
+            "sections": result_sections,
+            "total_count": sum(len(section["questions"]) for section in result_sections)
+        })
 
     async def fetch_khan_academy_questions(self, args: dict) -> CallToolResult:
         subject = args.get("subject")
@@ -285,9 +466,7 @@ class MockTestMCPServer:
             for i in range(count)
         ]
         
-        return CallToolResult(
-            content=[TextContent(type="text", text=json.dumps(khan_questions, indent=2))]
-        )
+        return self.json_result(khan_questions)
 
     async def fetch_college_board_questions(self, args: dict) -> CallToolResult:
         test_type = args.get("test_type")
@@ -308,34 +487,21 @@ class MockTestMCPServer:
             for i in range(5)
         ]
         
-        return CallToolResult(
-            content=[TextContent(type="text", text=json.dumps(cb_questions, indent=2))]
-        )
+        return self.json_result(cb_questions)
 
     async def call_gemini_api(self, prompt: str) -> list:
         if GEMINI_API_KEY == "YOUR_GEMINI_API_KEY":
             raise Exception("Gemini API key not configured")
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{GEMINI_API_URL}?key={GEMINI_API_KEY}",
-                json={
-                    "contents": [{
-                        "parts": [{"text": prompt}]
-                    }]
-                },
-                headers={"Content-Type": "application/json"}
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"Gemini API error: {response.status_code}")
-            
-            data = response.json()
-            generated_text = data["candidates"][0]["content"]["parts"][0]["text"]
-            
-            # Clean and parse JSON
-            clean_text = generated_text.replace("```json", "").replace("```", "").strip()
-            return json.loads(clean_text)
+        # Shared pooled client: keep-alive connections are reused across tool calls.
+        # While the breaker is open this raises at once and callers use static questions.
+        generated_text = await get_breaker("gemini").acall(
+            lambda: gemini_client.generate_content(prompt, GEMINI_API_KEY)
+        )
+        
+        # Clean and parse JSON
+        clean_text = generated_text.replace("```json", "").replace("```", "").strip()
+        return json.loads(clean_text)
 
     def get_static_sat_math_questions(self, count: int) -> list:
         base_questions = [
@@ -392,19 +558,22 @@ class MockTestMCPServer:
 async def main():
     server_instance = MockTestMCPServer()
     
-    async with stdio_server() as (read_stream, write_stream):
-        await server_instance.server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="mock-test-server",
-                server_version="1.0.0",
-                capabilities=server_instance.server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server_instance.server.run(
+                read_stream,
+                write_stream,
+                InitializationOptions(
+                    server_name="mock-test-server",
+                    server_version="1.0.0",
+                    capabilities=server_instance.server.get_capabilities(
+                        notification_options=NotificationOptions(),
+                        experimental_capabilities={},
+                    ),
                 ),
-            ),
-        )
+            )
+    finally:
+        await gemini_client.aclose()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
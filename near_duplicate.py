@@ -0,0 +1,152 @@
+"""
+Near-Duplicate Detection for Generated Questions
+MinHash signatures over normalized question text with an LSH band index
+"""
+
+import hashlib
+import json
+import re
+import zlib
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple, Hashable
+
+from config import NEAR_DUP_THRESHOLD
+
+NUM_PERM = 32
+NUM_BANDS = 8
+SHINGLE_SIZE = 2
+
+_BIN_SHIFT = 32 - (NUM_PERM.bit_length() - 1)
+_VALUE_MASK = (1 << _BIN_SHIFT) - 1
+_EMPTY = 1 << _BIN_SHIFT
+
+_OPTION_PREFIX_RE = re.compile(r"^\s*[\(\[]?[A-Da-d][\)\]\.:]\s*")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+_NON_WORD_RE = re.compile(r"[^a-z0#\s]+")
+
+
+def normalize_question(question: Dict[str, Any]) -> List[str]:
+    """
+    Reduce a question to comparable tokens.
+
+    Numbers collapse to one token so "3x + 5 = 17" and "3x + 7 = 19"
+    shingle identically; option letters and punctuation are dropped.
+    """
+    parts = [question.get("passage") or "", question.get("question") or ""]
+    for option in question.get("options") or []:
+        parts.append(_OPTION_PREFIX_RE.sub("", str(option)))
+    text = _NUMBER_RE.sub(" # ", " ".join(parts).lower())
+    return _NON_WORD_RE.sub(" ", text).split()
+
+
+def question_key(question: Dict[str, Any]) -> str:
+    """
+    Identity of a question for index keys.
+
+    Hashes the stem together with the passage and choices, since common SAT
+    stems ("Which choice completes the text...") repeat across questions.
+    """
+    raw = json.dumps(
+        [question.get("passage") or "", question.get("question") or "", [str(o) for o in question.get("options") or []]],
+        ensure_ascii=False
+    )
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def question_signature(question: Dict[str, Any]) -> Tuple[int, ...]:
+    """
+    Compute the MinHash signature of a question.
+
+    Uses one-permutation hashing: each shingle hash is routed to one of
+    ``NUM_PERM`` bins by its top bits and each bin keeps its minimum, so
+    the cost is one crc32 per shingle instead of one per permutation.
+    Empty bins borrow from the next filled bin (rotation densification).
+    crc32 keeps signatures stable across processes so they can be persisted.
+    """
+    tokens = normalize_question(question)
+    if len(tokens) < SHINGLE_SIZE:
+        tokens = tokens + [""] * (SHINGLE_SIZE - len(tokens))
+
+    sig = [_EMPTY] * NUM_PERM
+    for i in range(len(tokens) - SHINGLE_SIZE + 1):
+        h = zlib.crc32(" ".join(tokens[i:i + SHINGLE_SIZE]).encode())
+        b = h >> _BIN_SHIFT
+        v = h & _VALUE_MASK
+        if v < sig[b]:
+            sig[b] = v
+
+    for b in range(NUM_PERM):
+        if sig[b] == _EMPTY:
+            for step in range(1, NUM_PERM):
+                donor = sig[(b + step) % NUM_PERM]
+                if donor < _EMPTY:
+                    sig[b] = donor + step * _EMPTY
+                    break
+    return tuple(sig)
+
+
+def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    """Estimate Jaccard similarity from two signatures."""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+class NearDuplicateIndex:
+    """LSH index of question signatures for fast near-duplicate lookup."""
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD):
+        """
+        Initialize an empty index.
+
+        Args:
+            threshold: Estimated Jaccard similarity at or above which two
+                questions are treated as duplicates
+        """
+        self.threshold = threshold
+        self.rows = NUM_PERM // NUM_BANDS
+        self.buckets: List[Dict[Tuple[int, ...], List[Hashable]]] = [
+            defaultdict(list) for _ in range(NUM_BANDS)
+        ]
+        self.signatures: Dict[Hashable, Tuple[int, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def _bands(self, sig: Tuple[int, ...]):
+        for band in range(NUM_BANDS):
+            yield band, sig[band * self.rows:(band + 1) * self.rows]
+
+    def add(self, key: Hashable, sig: Tuple[int, ...]):
+        """Add a signature under ``key``."""
+        self.signatures[key] = sig
+        for band, chunk in self._bands(sig):
+            self.buckets[band][chunk].append(key)
+
+    def find(self, sig: Tuple[int, ...]) -> Optional[Hashable]:
+        """Return the key of a stored near-duplicate, or None."""
+        seen = set()
+        for band, chunk in self._bands(sig):
+            for key in self.buckets[band].get(chunk, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                if similarity(sig, self.signatures[key]) >= self.threshold:
+                    return key
+        return None
+
+    def add_if_new(self, key: Hashable, question: Dict[str, Any]) -> bool:
+        """
+        Insert a question unless a near-duplicate is already indexed.
+
+        Returns:
+            True if the question was added, False if it is a near-duplicate
+        """
+        sig = question_signature(question)
+        if self.find(sig) is not None:
+            return False
+        self.add(key, sig)
+        return True
+
+    def contains(self, question: Dict[str, Any]) -> bool:
+        """Check whether a near-duplicate of ``question`` is indexed."""
+        return self.find(question_signature(question)) is not None
+
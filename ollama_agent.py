@@ -3,9 +3,16 @@ Ollama Agent with RAG Support
 Main agent implementation using local Ollama models
 """
 
+import asyncio
 import ollama
 from typing import Optional, List, Dict, Any
 from rag_engine import RAGEngine
+from conversation_memory import ConversationMemory
+from prompt_layout import backend_for, build_messages, client_for, request_options
+from semantic_cache import SemanticCache
+from retrieval_gate import RetrievalGate, retrieval_gate
+from metrics import ollama_call, record_llm_response, stage
+from tracing import set_attributes, traced
 from config import (
     OLLAMA_BASE_URL,
     OLLAMA_MODEL,
@@ -23,7 +30,11 @@ class OllamaAgent:
         self,
         model: str = OLLAMA_MODEL,
         use_rag: bool = True,
-        knowledge_base_name: str = None
+        knowledge_base_name: str = None,
+        rag_engine: Optional[RAGEngine] = None,
+        memory: Optional[ConversationMemory] = None,
+        answer_cache: Optional[SemanticCache] = None,
+        gate: Optional[RetrievalGate] = None
     ):
         """
         Initialize Ollama Agent.
@@ -32,17 +43,25 @@ class OllamaAgent:
             model: Ollama model name
             use_rag: Whether to use RAG for knowledge base queries
             knowledge_base_name: Name of the knowledge base collection
+            rag_engine: Optional shared RAG engine to use instead of building one
+            memory: Optional shared session store (default: in-memory, this agent only)
+            answer_cache: Optional semantic cache of RAG answers
+            gate: Retrieval gate (default: the shared one configured in config)
         """
         self.model = model
         self.use_rag = use_rag
-        self.rag_engine = RAGEngine(knowledge_base_name) if use_rag else None
-        self.conversation_history: List[Dict] = []
+        self.rag_engine = (rag_engine or RAGEngine(knowledge_base_name)) if use_rag else None
+        self.memory = memory or ConversationMemory(spill_path=None)
+        self.answer_cache = answer_cache
+        self.gate = gate or retrieval_gate
+        self._async_clients: Dict[Optional[str], ollama.AsyncClient] = {}
     
     def chat(
         self,
         message: str,
         context: Optional[str] = None,
-        stream: bool = False
+        stream: bool = False,
+        session_id: Optional[str] = None
     ) -> str:
         """
         Chat with the agent.
@@ -51,59 +70,121 @@ class OllamaAgent:
             message: User message
             context: Optional context to include
             stream: Whether to stream the response
+            session_id: Optional session whose history is sent and extended
             
         Returns:
             Agent response
         """
-        # Build prompt
-        prompt = self._build_prompt(message, context)
-        
-        # Get response from Ollama with optimized settings
-        response = ollama.chat(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": AGENT_INSTRUCTIONS},
-                {"role": "user", "content": prompt}
-            ],
-            options={
+        request = self._chat_request(message, context, session_id)
+        with ollama_call(self.model):
+            # Get response from Ollama with optimized settings; a session
+            # goes to the backend holding its cached prefix
+            response = client_for(backend_for(session_id)).chat(**request, stream=stream)
+            
+            if stream:
+                # Handle streaming response
+                full_response = ""
+                for chunk in response:
+                    if 'message' in chunk and 'content' in chunk['message']:
+                        content = chunk['message']['content']
+                        full_response += content
+                        print(content, end='', flush=True)
+                    if chunk.get('done'):
+                        record_llm_response(self.model, chunk)
+                print()  # New line after streaming
+                answer = full_response
+            else:
+                record_llm_response(self.model, response)
+                answer = response['message']['content']
+        
+        if session_id:
+            self.memory.add_turn(session_id, message, answer)
+        return answer
+    
+    async def achat(
+        self,
+        message: str,
+        context: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> str:
+        """
+        Async chat; cancelling the awaiting task closes the Ollama request.
+        
+        Args:
+            message: User message
+            context: Optional context to include
+            session_id: Optional session whose history is sent and extended
+            
+        Returns:
+            Agent response
+        """
+        request = self._chat_request(message, context, session_id)
+        with ollama_call(self.model):
+            response = await self.async_client_for(backend_for(session_id)).chat(**request)
+            record_llm_response(self.model, response)
+        answer = response['message']['content']
+        
+        if session_id:
+            self.memory.add_turn(session_id, message, answer)
+        return answer
+    
+    @property
+    def async_client(self) -> ollama.AsyncClient:
+        """Default Ollama async client, created on first use inside the running loop."""
+        return self.async_client_for(None)
+    
+    def async_client_for(self, host: Optional[str]) -> ollama.AsyncClient:
+        """Async client for an Ollama host (None: the default host)."""
+        client = self._async_clients.get(host)
+        if client is None:
+            client = self._async_clients[host] = ollama.AsyncClient(host=host)
+        return client
+    
+    def _chat_request(
+        self,
+        message: str,
+        context: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Build the ollama chat arguments shared by chat and achat."""
+        with stage("prompt_build"):
+            # Build prompt
+            prompt = self._build_prompt(message, context)
+            history = self.memory.history_messages(session_id) if session_id else None
+            messages = build_messages(AGENT_INSTRUCTIONS, history, prompt)
+        
+        return {
+            "model": self.model,
+            "messages": messages,
+            **request_options(),
+            "options": {
                 "temperature": 0.3,
                 "top_p": 0.8,
                 "num_predict": 512,
                 "num_ctx": 2048,
                 "repeat_penalty": 1.1
-            },
-            stream=stream
-        )
-        
-        if stream:
-            # Handle streaming response
-            full_response = ""
-            for chunk in response:
-                if 'message' in chunk and 'content' in chunk['message']:
-                    content = chunk['message']['content']
-                    full_response += content
-                    print(content, end='', flush=True)
-            print()  # New line after streaming
-            return full_response
-        else:
-            return response['message']['content']
+            }
+        }
     
+    @traced()
     def query_with_rag(
         self,
         query: str,
         n_results: int = 5,
-        include_context: bool = True
+        include_context: bool = True,
+        session_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Query with RAG (Retrieval Augmented Generation).
         
         Args:
             query: Query text
-            n_results: Number of retrieved documents
+            n_results: Most documents to retrieve (the gate may keep fewer)
             include_context: Whether to include context in response
+            session_id: Optional session whose history is sent and extended
             
         Returns:
-            Dictionary with response and retrieved documents
+            Dictionary with response, retrieved documents and the gate's decision
         """
         if not self.use_rag or not self.rag_engine:
             return {
@@ -111,29 +192,160 @@ class OllamaAgent:
                 "retrieved_docs": []
             }
         
-        # Retrieve relevant documents
-        retrieved_docs = self.rag_engine.retrieve(query, n_results=n_results)
+        # Chit-chat and bare arithmetic go straight to the model
+        decision = self.gate.decide(query)
+        if not decision['retrieve']:
+            response = self.chat(query, session_id=session_id)
+            return {"response": response, "retrieved_docs": [], "query": query, "retrieval": decision}
         
-        # Build context from retrieved documents
-        context = ""
-        if retrieved_docs and include_context:
-            context = "\n\nRelevant Information:\n"
-            for i, doc in enumerate(retrieved_docs, 1):
-                context += f"\n[{i}] {doc['content']}\n"
-                if doc.get('metadata', {}).get('source'):
-                    context += f"Source: {doc['metadata']['source']}\n"
+        # Answers within a session depend on its history and are not cached
+        query_embedding = None
+        if self.answer_cache is not None and not session_id:
+            query_embedding = self.rag_engine.embed_query(query)
+            hit = self._cache_lookup(query, query_embedding, n_results, include_context, decision)
+            if hit is not None:
+                return hit
+        
+        # Retrieve relevant documents; the gate drops weak matches
+        retrieved_docs = self._retrieve(query, n_results, query_embedding, decision)
         
         # Generate response with context
-        response = self.chat(query, context=context)
+        response = self.chat(query, context=self._format_context(retrieved_docs, include_context), session_id=session_id)
+        
+        return self._rag_result(query, query_embedding, n_results, include_context, response, retrieved_docs, decision)
+    
+    @traced()
+    async def aquery_with_rag(
+        self,
+        query: str,
+        n_results: int = 5,
+        include_context: bool = True,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Async query_with_rag: retrieval runs in a worker thread, generation
+        uses the async Ollama client so it can be cancelled.
+        """
+        if not self.use_rag or not self.rag_engine:
+            return {
+                "response": "RAG is not enabled",
+                "retrieved_docs": []
+            }
+        
+        decision = self.gate.decide(query)
+        if not decision['retrieve']:
+            response = await self.achat(query, session_id=session_id)
+            return {"response": response, "retrieved_docs": [], "query": query, "retrieval": decision}
+        
+        query_embedding = None
+        if self.answer_cache is not None and not session_id:
+            query_embedding = await asyncio.to_thread(self.rag_engine.embed_query, query)
+            hit = self._cache_lookup(query, query_embedding, n_results, include_context, decision)
+            if hit is not None:
+                return hit
+        
+        retrieved_docs = await asyncio.to_thread(self._retrieve, query, n_results, query_embedding, decision)
+        response = await self.achat(query, context=self._format_context(retrieved_docs, include_context), session_id=session_id)
+        
+        return self._rag_result(query, query_embedding, n_results, include_context, response, retrieved_docs, decision)
+    
+    def _retrieve(
+        self,
+        query: str,
+        n_results: int,
+        query_embedding: Optional[List[float]],
+        decision: Dict[str, Any],
+        record: bool = True
+    ) -> List[Dict]:
+        """Retrieve up to n_results chunks and keep those the gate lets through."""
+        docs = self.rag_engine.retrieve(query, n_results=n_results, query_embedding=query_embedding)
+        return self.gate.select(query, docs, decision, record=record)
+    
+    def _cache_namespace(self, n_results: int, include_context: bool) -> str:
+        return f"{self.model}|{self.rag_engine.embedding_model}|n={n_results}|context={include_context}"
+    
+    def _cache_lookup(
+        self,
+        query: str,
+        query_embedding: List[float],
+        n_results: int,
+        include_context: bool,
+        decision: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Cached answer to a paraphrase of query, or None."""
+        def audit() -> List[str]:
+            docs = self._retrieve(query, n_results, query_embedding, {'query_class': 'question'}, record=False)
+            return [doc['id'] for doc in docs]
+        
+        def refresh():
+            fresh = {'retrieve': True, 'query_class': decision['query_class']}
+            docs = self._retrieve(query, n_results, query_embedding, fresh, record=False)
+            if not docs:
+                # Keep the old answer rather than cache one without context
+                raise LookupError("no documents match any more")
+            response = self.chat(query, context=self._format_context(docs, include_context))
+            return {"response": response, "retrieved_docs": docs, "retrieval": fresh}, [doc['id'] for doc in docs]
         
+        hit = self.answer_cache.lookup(
+            self._cache_namespace(n_results, include_context),
+            query_embedding,
+            query,
+            audit=audit,
+            refresh=refresh
+        )
+        if hit is None:
+            return None
+        set_attributes(**{'cache.semantic_hit': True, 'cache.similarity': hit['similarity']})
+        return {
+            "retrieval": decision,
+            **hit['value'],
+            "query": query,
+            "cache": {"hit": True, "matched_query": hit['query'], "similarity": hit['similarity'], "age": hit['age']}
+        }
+    
+    def _rag_result(
+        self,
+        query: str,
+        query_embedding: Optional[List[float]],
+        n_results: int,
+        include_context: bool,
+        response: str,
+        retrieved_docs: List[Dict],
+        decision: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Shape a RAG answer into the result dict, caching it when the lookup
+        missed and retrieval found context (a no_match answer is not cached,
+        so a paraphrase retries retrieval once documents are added).
+        """
+        if query_embedding is not None and retrieved_docs:
+            self.answer_cache.store(
+                self._cache_namespace(n_results, include_context),
+                query_embedding,
+                query,
+                {"response": response, "retrieved_docs": retrieved_docs, "retrieval": decision},
+                [doc['id'] for doc in retrieved_docs]
+            )
         return {
             "response": response,
             "retrieved_docs": retrieved_docs,
-            "query": query
+            "query": query,
+            "retrieval": decision
         }
     
+    def _format_context(self, retrieved_docs: List[Dict], include_context: bool = True) -> str:
+        """Build context from retrieved documents."""
+        context = ""
+        if retrieved_docs and include_context:
+            context = "\n\nRelevant Information:\n"
+            for i, doc in enumerate(retrieved_docs, 1):
+                context += f"\n[{i}] {doc['content']}\n"
+                if doc.get('metadata', {}).get('source'):
+                    context += f"Source: {doc['metadata']['source']}\n"
+        return context
+    
     def _build_prompt(self, message: str, context: Optional[str] = None) -> str:
-        """Build the prompt with optional context."""
+        """Build this turn's user message; the context goes after the session history, never before it."""
         prompt = message
         
         if context:
@@ -141,16 +353,13 @@ class OllamaAgent:
         
         return prompt
     
-    def add_to_history(self, user_message: str, agent_response: str):
-        """Add conversation to history."""
-        self.conversation_history.append({
-            "user": user_message,
-            "agent": agent_response
-        })
+    def add_to_history(self, user_message: str, agent_response: str, session_id: str = "default"):
+        """Add conversation to a session's history."""
+        self.memory.add_turn(session_id, user_message, agent_response)
     
-    def clear_history(self):
-        """Clear conversation history."""
-        self.conversation_history = []
+    def clear_history(self, session_id: str = "default"):
+        """Clear a session's conversation history."""
+        self.memory.clear(session_id)
     
     def get_available_models(self) -> List[str]:
         """Get list of available Ollama models."""
@@ -0,0 +1,82 @@
+"""
+Prompt Layout
+Chat message assembly that keeps a session's prompt prefix identical across
+turns, and pinning of each session to the Ollama backend holding its KV cache
+
+Ollama reuses the KV cache of the longest prefix a new prompt shares with
+the last one it evaluated. Messages are therefore laid out from most to
+least stable: system instructions, the session's history window (append-only
+between re-anchors, see conversation_memory), then the turn's retrieved
+context and question last. The model, options and keep_alive are the same
+on every call, since a change would reload the model and drop the cache.
+"""
+
+import hashlib
+import random
+import threading
+from typing import Any, Dict, List, Optional
+
+import ollama
+
+from config import OLLAMA_BACKENDS, OLLAMA_KEEP_ALIVE
+
+_clients: Dict[str, ollama.Client] = {}
+_clients_lock = threading.Lock()
+
+
+def build_messages(
+    system: str,
+    history: Optional[List[Dict[str, str]]] = None,
+    prompt: str = ""
+) -> List[Dict[str, str]]:
+    """
+    Messages for one chat turn, stable prefix first.
+
+    Args:
+        system: System instructions (never varies per turn)
+        history: Session history messages (ConversationMemory.history_messages)
+        prompt: This turn's user message, with any retrieved context
+
+    Returns:
+        Ollama chat messages
+    """
+    messages = [{"role": "system", "content": system}]
+    if history:
+        messages.extend(history)
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+def backend_for(session_id: Optional[str]) -> Optional[str]:
+    """
+    Ollama host that serves a session, or None for the default client.
+
+    Rendezvous hashing gives every worker process the same answer without
+    shared state, and moves only the sessions of a backend that is removed
+    from OLLAMA_BACKENDS. Requests without a session have no cache to reuse
+    and are spread at random.
+    """
+    if len(OLLAMA_BACKENDS) < 2:
+        return OLLAMA_BACKENDS[0] if OLLAMA_BACKENDS else None
+    if not session_id:
+        return random.choice(OLLAMA_BACKENDS)
+    return max(
+        OLLAMA_BACKENDS,
+        key=lambda host: hashlib.blake2b(f"{host}|{session_id}".encode("utf-8"), digest_size=8).digest()
+    )
+
+
+def client_for(host: Optional[str]) -> Any:
+    """Sync Ollama client for a host (the ollama module's default client for None)."""
+    if host is None:
+        return ollama
+    with _clients_lock:
+        client = _clients.get(host)
+        if client is None:
+            client = _clients[host] = ollama.Client(host=host)
+        return client
+
+
+def request_options() -> Dict[str, Any]:
+    """Keyword arguments every chat call passes so the loaded model is kept."""
+    return {"keep_alive": OLLAMA_KEEP_ALIVE} if OLLAMA_KEEP_ALIVE else {}
@@ -0,0 +1,187 @@
+"""
+Question Validation for Generated SAT/ACT Items
+Schema-checks, repairs and normalizes LLM output before it is cached
+"""
+
+import re
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
+
+OPTION_LETTERS = ("A", "B", "C", "D")
+
+# Precompiled once at import; validate_batch runs these over every item.
+_OPTION_PREFIX_RE = re.compile(r"^\s*[\(\[]?\s*([A-Da-d])\s*[\)\]\.:]\s*")
+_CORRECT_RE = re.compile(r"^\s*(?:option|answer|choice)?\s*[\(\[]?\s*([A-Da-d])\s*[\)\]\.:]?\s*$", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+_DIFFICULTIES = {"easy": "Easy", "medium": "Medium", "hard": "Hard"}
+
+# field -> (accepted types, required)
+QUESTION_SCHEMA = {
+    "question": ((str,), True),
+    "options": ((list, dict), True),
+    "correct": ((str, int), True),
+    "passage": ((str,), False),
+    "topic": ((str,), False),
+    "difficulty": ((str,), False),
+    "explanation": ((str,), False),
+}
+
+
+def _compile_schema(schema: Dict[str, Tuple[tuple, bool]]):
+    """Turn the schema table into a single type-check function."""
+    required = tuple(name for name, (_, req) in schema.items() if req)
+    types = tuple((name, accepted) for name, (accepted, _) in schema.items())
+
+    def check(item: Dict[str, Any]) -> Optional[str]:
+        for name in required:
+            if item.get(name) in (None, "", [], {}):
+                return f"missing_{name}"
+        for name, accepted in types:
+            value = item.get(name)
+            if value is not None and not isinstance(value, accepted):
+                return f"bad_type_{name}"
+        return None
+
+    return check
+
+
+_check_schema = _compile_schema(QUESTION_SCHEMA)
+
+
+def requires_passage(test_type: str) -> bool:
+    """Reading & Writing items must carry a passage; math items need not."""
+    test_type = test_type.lower()
+    return "math" not in test_type and ("reading" in test_type or "english" in test_type)
+
+
+class QuestionValidator:
+    """Validates, repairs and normalizes generated questions."""
+
+    def __init__(self):
+        """Initialize validator with empty reject statistics."""
+        self.rejects: Counter = Counter()
+        self.accepted = 0
+
+    def validate_batch(
+        self,
+        items: Any,
+        test_type: str = ""
+    ) -> List[Dict[str, Any]]:
+        """
+        Validate a whole parsed result set.
+
+        Args:
+            items: Parsed JSON (normally a list of question dicts)
+            test_type: Test type the batch was generated for
+
+        Returns:
+            List of repaired, normalized questions; rejects are counted
+            in ``self.rejects`` by reason
+        """
+        if isinstance(items, dict):
+            items = items.get("questions", [items])
+        if not isinstance(items, list):
+            self.rejects["not_a_list"] += 1
+            return []
+
+        need_passage = requires_passage(test_type)
+        valid = []
+        for item in items:
+            question, reason = self.validate(item, need_passage)
+            if reason:
+                self.rejects[reason] += 1
+            else:
+                valid.append(question)
+
+        self.accepted += len(valid)
+        return valid
+
+    def validate(
+        self,
+        item: Any,
+        need_passage: bool = False
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Validate a single question.
+
+        Args:
+            item: Parsed question object
+            need_passage: Whether a non-empty passage is mandatory
+
+        Returns:
+            Tuple of (normalized question, None) or (None, reject reason)
+        """
+        if not isinstance(item, dict):
+            return None, "not_an_object"
+
+        reason = _check_schema(item)
+        if reason:
+            return None, reason
+
+        options = self._normalize_options(item["options"])
+        if options is None:
+            return None, "wrong_option_count"
+
+        correct = self._normalize_correct(item["correct"], options)
+        if correct is None:
+            return None, "correct_not_in_options"
+
+        passage = _WHITESPACE_RE.sub(" ", item.get("passage") or "").strip()
+        if need_passage and not passage:
+            return None, "missing_passage"
+
+        question = {
+            "id": item.get("id"),
+            "question": item["question"].strip(),
+            "options": options,
+            "correct": correct,
+            "topic": (item.get("topic") or "General").strip(),
+            "difficulty": _DIFFICULTIES.get((item.get("difficulty") or "").strip().lower(), "Medium"),
+            "explanation": (item.get("explanation") or "").strip(),
+        }
+        if passage:
+            question["passage"] = passage
+        return question, None
+
+    def _normalize_options(self, options: Any) -> Optional[List[str]]:
+        """Return exactly four options as ``"A) ..."`` strings, or None."""
+        if isinstance(options, dict):
+            options = [options[k] for k in sorted(options, key=lambda k: str(k).upper())]
+        if len(options) != len(OPTION_LETTERS):
+            return None
+
+        normalized = []
+        for letter, option in zip(OPTION_LETTERS, options):
+            text = str(option).strip()
+            # Only strip a prefix that names this slot, so "C. elegans" in slot A survives
+            match = _OPTION_PREFIX_RE.match(text)
+            if match and match.group(1).upper() == letter:
+                text = text[match.end():].strip()
+            if not text:
+                return None
+            normalized.append(f"{letter}) {text}")
+        return normalized
+
+    def _normalize_correct(self, correct: Any, options: List[str]) -> Optional[str]:
+        """Map the answer key to a single letter present in options."""
+        if isinstance(correct, int):
+            return OPTION_LETTERS[correct] if 0 <= correct < len(options) else None
+
+        match = _CORRECT_RE.match(correct)
+        if match:
+            return match.group(1).upper()
+
+        # Some models answer with the option text instead of the letter
+        text = _OPTION_PREFIX_RE.sub("", correct, count=1).strip().lower()
+        for option in options:
+            if option[3:].lower() == text:
+                return option[0]
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get accepted count and rejects by reason."""
+        return {
+            "accepted": self.accepted,
+            "rejected": sum(self.rejects.values()),
+            "rejects_by_reason": dict(self.rejects)
+        }
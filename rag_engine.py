@@ -4,19 +4,16 @@ Handles document processing, chunking, and retrieval
 """
 
 import os
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Callable
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    TextLoader,
-    Docx2txtLoader,
-    UnstructuredMarkdownLoader
-)
 from vector_store import VectorStore
+from metrics import ollama_call, stage
+from tracing import set_attributes, traced
 from config import (
     CHUNK_SIZE,
     CHUNK_OVERLAP,
     DATA_DIR,
+    EMBED_BATCH_SIZE,
     OLLAMA_EMBEDDING_MODEL,
     OLLAMA_BASE_URL
 )
@@ -54,6 +51,14 @@ class RAGEngine:
         file_ext = os.path.splitext(file_path)[1].lower()
         
         try:
+            # langchain_community is slow to import; only ingestion needs it
+            from langchain_community.document_loaders import (
+                PyPDFLoader,
+                TextLoader,
+                Docx2txtLoader,
+                UnstructuredMarkdownLoader
+            )
+            
             if file_ext == '.pdf':
                 loader = PyPDFLoader(file_path)
             elif file_ext == '.txt':
@@ -82,20 +87,33 @@ class RAGEngine:
         """
         Get embeddings for texts using Ollama.
         
+        All texts go in one embed call; if it fails, each text is retried
+        on its own so one bad chunk only costs its own vector.
+        
         Args:
             texts: List of texts to embed
             
         Returns:
             List of embedding vectors
         """
-        embeddings = []
+        if not texts:
+            return []
+        try:
+            with ollama_call(self.embedding_model, "embed"):
+                response = ollama.embed(model=self.embedding_model, input=texts)
+            if len(response['embeddings']) == len(texts):
+                return [list(vector) for vector in response['embeddings']]
+        except Exception as e:
+            print(f"Error getting batch embeddings: {e}")
         
+        embeddings = []
         for text in texts:
             try:
-                response = ollama.embeddings(
-                    model=self.embedding_model,
-                    prompt=text
-                )
+                with ollama_call(self.embedding_model, "embed"):
+                    response = ollama.embeddings(
+                        model=self.embedding_model,
+                        prompt=text
+                    )
                 embeddings.append(response['embedding'])
             except Exception as e:
                 print(f"Error getting embedding: {e}")
@@ -104,10 +122,12 @@ class RAGEngine:
         
         return embeddings
     
+    @traced()
     def add_documents_to_kb(
         self,
         file_paths: List[str],
-        metadatas: Optional[List[Dict]] = None
+        metadatas: Optional[List[Dict]] = None,
+        progress_callback: Optional[Callable[[float, float, str], None]] = None
     ):
         """
         Add documents to knowledge base.
@@ -115,7 +135,12 @@ class RAGEngine:
         Args:
             file_paths: List of file paths to add
             metadatas: Optional metadata for each document
+            progress_callback: Optional callback(done, total, message). total
+                is twice the number of files: one step per loaded file, then
+                the embedding of all chunks counts for the other half,
+                reported after each batch of EMBED_BATCH_SIZE chunks
         """
+        total = 2 * len(file_paths)
         all_chunks = []
         all_metadatas = []
         all_ids = []
@@ -126,6 +151,8 @@ class RAGEngine:
                 continue
             
             chunks = self.load_document(file_path)
+            if progress_callback:
+                progress_callback(i + 1, total, f"Loaded {os.path.basename(file_path)}")
             
             for j, chunk in enumerate(chunks):
                 chunk_id = f"{os.path.basename(file_path)}_{j}"
@@ -143,7 +170,12 @@ class RAGEngine:
         
         # Get embeddings
         print(f"Generating embeddings for {len(all_chunks)} chunks...")
-        embeddings = self.get_embeddings(all_chunks)
+        embeddings = []
+        for start in range(0, len(all_chunks), EMBED_BATCH_SIZE):
+            embeddings.extend(self.get_embeddings(all_chunks[start:start + EMBED_BATCH_SIZE]))
+            if progress_callback:
+                done = len(file_paths) + len(file_paths) * len(embeddings) / len(all_chunks)
+                progress_callback(done, total, f"Embedded {len(embeddings)}/{len(all_chunks)} chunks")
         
         # Add to vector store
         self.vector_store.collection.add(
@@ -155,11 +187,17 @@ class RAGEngine:
         
         print(f"Added {len(all_chunks)} chunks to knowledge base")
     
+    def embed_query(self, query: str) -> List[float]:
+        """Embedding of a query (a zero vector if embedding failed)."""
+        return self.get_embeddings([query])[0]
+    
+    @traced()
     def retrieve(
         self,
         query: str,
         n_results: int = 5,
-        filter_metadata: Optional[Dict] = None
+        filter_metadata: Optional[Dict] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict]:
         """
         Retrieve relevant documents for a query.
@@ -168,30 +206,35 @@ class RAGEngine:
             query: Query text
             n_results: Number of results to return
             filter_metadata: Optional metadata filter
+            query_embedding: Embedding of query, if the caller already has it
             
         Returns:
             List of relevant document chunks with metadata
         """
         # Get query embedding
-        query_embedding = self.get_embeddings([query])[0]
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
         
         # Query vector store
-        results = self.vector_store.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results,
-            where=filter_metadata
-        )
+        with stage("vector_query"):
+            results = self.vector_store.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                where=filter_metadata
+            )
         
         # Format results
         retrieved_docs = []
         if results['documents'] and len(results['documents'][0]) > 0:
             for i in range(len(results['documents'][0])):
                 retrieved_docs.append({
+                    'id': results['ids'][0][i],
                     'content': results['documents'][0][i],
                     'metadata': results['metadatas'][0][i] if results.get('metadatas') else {},
                     'distance': results['distances'][0][i] if results.get('distances') else None
                 })
         
+        set_attributes(**{'rag.n_results': n_results, 'rag.returned': len(retrieved_docs)})
         return retrieved_docs
     
     def get_kb_info(self) -> Dict:
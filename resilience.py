@@ -0,0 +1,264 @@
+"""
+Resilience
+Per-provider circuit breakers and request-level deadline budgets, shared by
+every service that calls a slow or flaky dependency (search, YouTube, Gemini,
+Ollama, the mock test MCP servers)
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+from config import BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Absolute time.monotonic() deadline of the current request, if any. Context
+# variables follow asyncio tasks and asyncio.to_thread, so the budget reaches
+# every downstream call made on behalf of the request.
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"circuit '{name}' is open (retry in {retry_in:.1f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the request's deadline budget is used up."""
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Run a block under a deadline.
+
+    Nested scopes can only shorten the budget, never extend it. A None
+    duration leaves the enclosing deadline (if any) in place.
+    """
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, or None without a deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def budget(timeout: Optional[float] = None) -> Optional[float]:
+    """
+    Timeout for one downstream call.
+
+    Args:
+        timeout: The call's own timeout (None for no limit)
+
+    Returns:
+        timeout capped by the remaining request budget
+
+    Raises:
+        DeadlineExceeded: the request has no time left
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("request deadline exceeded")
+    return left if timeout is None else min(timeout, left)
+
+
+async def wait_for(aw: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """
+    asyncio.wait_for capped by the request budget.
+
+    Raises:
+        DeadlineExceeded: the request budget, not timeout, ran out (breakers
+            do not count this against the provider)
+        TimeoutError: the call took longer than its own timeout
+    """
+    limit = budget(timeout)
+    try:
+        return await asyncio.wait_for(aw, limit)
+    except asyncio.TimeoutError:
+        if limit is not None and (timeout is None or limit < timeout):
+            raise DeadlineExceeded("request deadline exceeded") from None
+        raise
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker for one provider.
+
+    - closed: calls go through; failure_threshold consecutive failures open it
+    - open: calls fail fast with CircuitOpenError for reset_timeout seconds
+    - half_open: one probe call is let through; success closes the breaker,
+      failure opens it again
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT
+    ):
+        """
+        Initialize circuit breaker.
+
+        Args:
+            name: Provider name (shown in health endpoints)
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds open before a half-open probe
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+
+    def _current_state(self) -> str:
+        # Caller holds the lock
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def before_call(self):
+        """
+        Admit one call or raise CircuitOpenError.
+
+        Every admitted call must end in record_success, record_failure or
+        release.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED or (state == HALF_OPEN and not self._probing):
+                self._probing = state == HALF_OPEN
+                self.stats['calls'] += 1
+                return
+            self.stats['rejected'] += 1
+            retry_in = max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+        raise CircuitOpenError(self.name, retry_in)
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.stats['failures'] += 1
+            self._failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self.stats['opened'] += 1
+
+    def release(self):
+        """End an admitted call whose outcome says nothing about the provider (e.g. cancelled)."""
+        with self._lock:
+            self._probing = False
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call fn through the breaker; any exception counts as a failure except
+        DeadlineExceeded, which says the request ran out of time, not the provider.
+        """
+        self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except DeadlineExceeded:
+            self.release()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() through the breaker.
+
+        fn is only called once the breaker admits the call, so no coroutine
+        is created (and left unawaited) when it is open. Neither cancellation
+        nor DeadlineExceeded is counted as a failure.
+        """
+        self.before_call()
+        try:
+            result = await fn()
+        except DeadlineExceeded:
+            self.release()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """State, consecutive failures and counters for health endpoints."""
+        with self._lock:
+            state = self._current_state()
+            retry_in = self._opened_at + self.reset_timeout - time.monotonic() if state == OPEN else 0.0
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'retry_in': round(max(0.0, retry_in), 1),
+                **self.stats
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """Get the process-wide breaker for a provider, creating it on first use."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **kwargs)
+        return breaker
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every breaker in this process, by name."""
+    with _breakers_lock:
+        breakers = sorted(_breakers.items())
+    return {name: breaker.snapshot() for name, breaker in breakers}
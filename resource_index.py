@@ -0,0 +1,255 @@
+"""
+Local Resource Index
+Curated SAT explanation links and videos with BM25 search, used as the
+first-tier provider ahead of live web and YouTube search
+
+Bulk import:
+    python resource_index.py import resources.json   # JSON list or JSON lines
+
+Each resource: {"kind": "link" | "video", "title": ..., "url": ...,
+                "snippet": ..., "video_id": ..., "tags": [...]}
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import RESOURCE_INDEX_PATH, RESOURCE_MIN_COVERAGE, RESOURCE_RELATIVE_SCORE
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# English stopwords plus the words every SAT enrichment query is wrapped in
+STOPWORDS = frozenset("""
+a an and are as at be by for from how in is it of on or that the this to what
+when which with why sat practice explanation explanations tutorial tutorials
+question questions help
+""".split())
+TAG_WEIGHT = 2  # tag terms count twice toward term frequency
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _resource_terms(resource: Dict) -> Counter:
+    terms = Counter(tokenize(f"{resource.get('title', '')} {resource.get('snippet', '')}"))
+    for tag in resource.get('tags', []):
+        for token in tokenize(tag):
+            terms[token] += TAG_WEIGHT
+    return terms
+
+
+def _normalize_resource(resource: Dict) -> Dict:
+    """Fill defaults; videos get their URL from the video ID."""
+    kind = resource.get('kind', 'video' if resource.get('video_id') else 'link')
+    normalized = {
+        'kind': kind,
+        'title': resource.get('title', ''),
+        'url': resource.get('url', ''),
+        'snippet': resource.get('snippet') or resource.get('description', ''),
+        'tags': list(resource.get('tags', [])),
+    }
+    if kind == 'video':
+        normalized['video_id'] = resource['video_id']
+        normalized['url'] = normalized['url'] or f"https://www.youtube.com/watch?v={resource['video_id']}"
+    if not normalized['url']:
+        raise ValueError(f"Resource has no url: {resource.get('title', '')!r}")
+    return normalized
+
+
+class _IndexSnapshot:
+    """In-memory postings for one version of the on-disk index."""
+
+    def __init__(self, docs: List[Dict], lengths: List[int], postings: Dict[str, List[Tuple[int, int]]]):
+        self.docs = docs
+        self.lengths = lengths
+        self.postings = postings
+        self.avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+        self.kinds = [doc['kind'] for doc in docs]
+        # BM25 length normalization per document, so queries only multiply
+        self.norms = [
+            BM25_K1 * (1 - BM25_B + BM25_B * length / self.avg_length) if self.avg_length else BM25_K1
+            for length in lengths
+        ]
+        count = len(docs)
+        self.idf = {
+            term: math.log(1 + (count - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in postings.items()
+        }
+        # IDF of a term no resource has (it still counts toward query coverage)
+        self.unseen_idf = math.log(1 + (count + 0.5) / 0.5)
+
+
+class ResourceIndex:
+    """
+    BM25 index over curated resources.
+
+    Resources and their postings (term, doc, tf) live in SQLite; the
+    postings are loaded into memory once, and again after each import, so
+    lookups never touch the disk.
+    """
+
+    def __init__(self, db_path: str = RESOURCE_INDEX_PATH):
+        """
+        Initialize resource index.
+
+        Args:
+            db_path: SQLite file holding resources and postings
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS resources ("
+            "id INTEGER PRIMARY KEY, url TEXT UNIQUE, kind TEXT, data TEXT, length INTEGER);"
+            "CREATE TABLE IF NOT EXISTS postings (term TEXT, doc_id INTEGER, tf INTEGER);"
+            "CREATE INDEX IF NOT EXISTS postings_term ON postings (term);"
+            "CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._snapshot = self._load()
+
+    def _load(self) -> _IndexSnapshot:
+        docs, lengths, positions = [], [], {}
+        for doc_id, data, length in self._conn.execute("SELECT id, data, length FROM resources ORDER BY id"):
+            positions[doc_id] = len(docs)
+            docs.append(json.loads(data))
+            lengths.append(length)
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for term, doc_id, tf in self._conn.execute("SELECT term, doc_id, tf FROM postings"):
+            postings.setdefault(term, []).append((positions[doc_id], tf))
+        return _IndexSnapshot(docs, lengths, postings)
+
+    def add_resources(self, resources: Iterable[Dict]) -> int:
+        """
+        Bulk import resources (replacing any with the same URL).
+
+        Returns:
+            Number of resources imported
+        """
+        count = 0
+        with self._lock:
+            with self._conn:
+                for resource in resources:
+                    resource = _normalize_resource(resource)
+                    terms = _resource_terms(resource)
+                    row = self._conn.execute("SELECT id FROM resources WHERE url = ?", (resource['url'],)).fetchone()
+                    if row:
+                        self._conn.execute("DELETE FROM postings WHERE doc_id = ?", row)
+                        self._conn.execute("DELETE FROM resources WHERE id = ?", row)
+                    cursor = self._conn.execute(
+                        "INSERT INTO resources (url, kind, data, length) VALUES (?, ?, ?, ?)",
+                        (resource['url'], resource['kind'], json.dumps(resource), sum(terms.values()))
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                        [(term, cursor.lastrowid, tf) for term, tf in terms.items()]
+                    )
+                    count += 1
+            self._snapshot = self._load()
+        return count
+
+    def import_file(self, path: str) -> int:
+        """Import a JSON list or JSON-lines file of resources."""
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        if text.lstrip().startswith('['):
+            resources = json.loads(text)
+        else:
+            resources = [json.loads(line) for line in text.splitlines() if line.strip()]
+        return self.add_resources(resources)
+
+    def search(
+        self,
+        query: str,
+        kind: Optional[str] = None,
+        limit: int = 5,
+        min_coverage: float = RESOURCE_MIN_COVERAGE,
+        relative_score: float = RESOURCE_RELATIVE_SCORE
+    ) -> List[Dict]:
+        """
+        Rank resources against a query with BM25.
+
+        A resource sharing one rare token with a long query is not a match:
+        results must contain at least min_coverage of the query's terms,
+        weighted by IDF, and score at least relative_score of the best one.
+
+        Args:
+            query: Free-text query
+            kind: 'link' or 'video' to restrict results
+            limit: Maximum number of results
+            min_coverage: Smallest IDF-weighted share of query terms matched
+            relative_score: Smallest score as a fraction of the best score
+
+        Returns:
+            Resource dicts with a 'score' and 'coverage', best first
+        """
+        snapshot = self._snapshot
+        terms = set(tokenize(query))
+        if not snapshot.docs or not terms:
+            return []
+        kinds, norms = snapshot.kinds, snapshot.norms
+        scores: Dict[int, float] = {}
+        covered: Dict[int, float] = {}
+        query_weight = 0.0
+        for term in terms:
+            idf = snapshot.idf.get(term, snapshot.unseen_idf)
+            query_weight += idf
+            plist = snapshot.postings.get(term)
+            if not plist:
+                continue
+            weight = idf * (BM25_K1 + 1)
+            for doc, tf in plist:
+                if kind and kinds[doc] != kind:
+                    continue
+                scores[doc] = scores.get(doc, 0.0) + weight * tf / (tf + norms[doc])
+                covered[doc] = covered.get(doc, 0.0) + idf
+        if not scores:
+            return []
+
+        floor = max(scores.values()) * relative_score
+        best = heapq.nlargest(
+            limit,
+            ((doc, score) for doc, score in scores.items()
+             if score >= floor and covered[doc] / query_weight >= min_coverage),
+            key=lambda item: item[1]
+        )
+        return [
+            {**snapshot.docs[doc], 'score': round(score, 4), 'coverage': round(covered[doc] / query_weight, 3)}
+            for doc, score in best
+        ]
+
+    def __len__(self) -> int:
+        return len(self._snapshot.docs)
+
+
+_default_index: Optional[ResourceIndex] = None
+_default_lock = threading.Lock()
+
+
+def get_resource_index() -> ResourceIndex:
+    """Shared index at RESOURCE_INDEX_PATH, opened on first use."""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = ResourceIndex()
+        return _default_index
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "import":
+        index = get_resource_index()
+        imported = index.import_file(sys.argv[2])
+        print(f"Imported {imported} resources ({len(index)} in {index.db_path})")
+    else:
+        print(__doc__)
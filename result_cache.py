@@ -0,0 +1,231 @@
+"""
+Result Cache
+TTL cache with stale-while-revalidate, single-flight coalescing and an
+optional SQLite disk tier, for slow lookups such as web and video search
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Background revalidation for every cache in the process
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# Every live cache, for cache_stats()
+_caches: "weakref.WeakSet[ResultCache]" = weakref.WeakSet()
+
+
+def _get_refresh_executor() -> ThreadPoolExecutor:
+    global _refresh_executor
+    with _executor_lock:
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+        return _refresh_executor
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive cache key for a search query."""
+    return " ".join(query.lower().split())
+
+
+class ResultCache:
+    """
+    Thread-safe cache for results of a slow fetch function.
+
+    - fresh entries (younger than ttl) are returned directly
+    - stale entries (up to ttl + stale_ttl) are returned immediately while
+      one background refresh runs
+    - concurrent misses for one key share a single fetch
+    - with db_path set, entries also live in SQLite, survive restarts and
+      are shared by every process using the same file
+
+    Values must be JSON-serializable when the disk tier is used. Fetch
+    errors are not cached; a failed refresh keeps serving the stale value.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        stale_ttl: float = 0.0,
+        max_entries: int = 1024,
+        db_path: Optional[str] = None
+    ):
+        """
+        Initialize result cache.
+
+        Args:
+            name: Cache name (also the SQLite table name)
+            ttl: Seconds an entry is fresh
+            stale_ttl: Extra seconds a stale entry may be served while refreshing
+            max_entries: Entries kept in memory (least recently used are dropped)
+            db_path: SQLite file for the disk tier, or None for memory only
+        """
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'stale_hits': 0, 'disk_hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0}
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5.0)
+            # Server workers share the file; WAL lets them read while one writes
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} (key TEXT PRIMARY KEY, value TEXT, fetched_at REAL)"
+            )
+            self._db.commit()
+        _caches.add(self)
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any]) -> Any:
+        """
+        Get a cached value, calling fetch() on a miss.
+
+        Args:
+            key: Cache key
+            fetch: Zero-argument callable producing the value
+
+        Returns:
+            Cached or freshly fetched value
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None:
+            entry = self._disk_get(key)
+            if entry is not None:
+                self.stats['disk_hits'] += 1
+                self._remember(key, *entry)
+
+        if entry is not None:
+            value, fetched_at = entry
+            age = now - fetched_at
+            if age < self.ttl:
+                self.stats['hits'] += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stats['stale_hits'] += 1
+                self._refresh_in_background(key, fetch)
+                return value
+
+        self.stats['misses'] += 1
+        return self._fetch_once(key, fetch).result()
+
+    def _fetch_once(self, key: str, fetch: Callable[[], Any]) -> Future:
+        """Run fetch for key unless one is already running; return its future."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return future
+            future = Future()
+            self._inflight[key] = future
+
+        try:
+            value = fetch()
+        except Exception as e:
+            self.stats['errors'] += 1
+            future.set_exception(e)
+        else:
+            self.put(key, value)
+            future.set_result(value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return future
+
+    def _refresh_in_background(self, key: str, fetch: Callable[[], Any]):
+        with self._lock:
+            if key in self._inflight:
+                return
+
+        def refresh():
+            # Errors stay on the future; the stale value keeps being served
+            self._fetch_once(key, fetch)
+
+        _get_refresh_executor().submit(refresh)
+
+    def put(self, key: str, value: Any, fetched_at: Optional[float] = None):
+        """Store a value (also written to the disk tier)."""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        self._remember(key, value, fetched_at)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.name} (key, value, fetched_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), fetched_at)
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, value: Any, fetched_at: float):
+        with self._lock:
+            self._entries[key] = (value, fetched_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _disk_get(self, key: str) -> Optional[Tuple[Any, float]]:
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                f"SELECT value, fetched_at FROM {self.name} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def clear(self):
+        """Drop every entry from memory and disk."""
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(f"DELETE FROM {self.name}")
+                self._db.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus the in-memory size and hit ratio."""
+        lookups = self.stats['hits'] + self.stats['stale_hits'] + self.stats['misses']
+        served = self.stats['hits'] + self.stats['stale_hits']
+        return {
+            **self.stats,
+            'entries': len(self._entries),
+            'hit_ratio': round(served / lookups, 3) if lookups else 0.0
+        }
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """get_stats() of every live cache by name (caches sharing a name are summed)."""
+    totals: Dict[str, Dict[str, Any]] = {}
+    for cache in list(_caches):
+        stats = cache.get_stats()
+        total = totals.setdefault(cache.name, dict.fromkeys(stats, 0))
+        for key, value in stats.items():
+            total[key] += value
+    for total in totals.values():
+        lookups = total['hits'] + total['stale_hits'] + total['misses']
+        total['hit_ratio'] = round((total['hits'] + total['stale_hits']) / lookups, 3) if lookups else 0.0
+    return totals
+
+
+def refresh_queue_depth() -> int:
+    """Background refreshes waiting for a thread."""
+    executor = _refresh_executor
+    return executor._work_queue.qsize() if executor is not None else 0
@@ -0,0 +1,184 @@
+"""
+Retrieval Gate
+Per-query decision whether knowledge base retrieval is worth its embedding
+call and prompt tokens, and which retrieved chunks to keep
+
+A rule-based classifier sends chit-chat and bare arithmetic straight to the
+model. Retrieved chunks are filtered by distance: anything farther than
+max_distance is dropped, as is anything more than relative_margin behind the
+best chunk, so a query with one strong match does not drag four weak ones
+into the prompt. Every decision is appended as one JSON line to log_path so
+the thresholds can be tuned on real traffic.
+"""
+
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from config import (
+    RETRIEVAL_GATE_ENABLED,
+    RETRIEVAL_MAX_DISTANCE,
+    RETRIEVAL_RELATIVE_MARGIN,
+    RETRIEVAL_GATE_LOG_PATH
+)
+from metrics import RETRIEVAL_CHUNKS, RETRIEVAL_DECISIONS
+from tracing import set_attributes
+
+logger = logging.getLogger("retrieval_gate")
+
+CHITCHAT = "chitchat"
+COMPUTE = "compute"
+QUESTION = "question"
+
+RETRIEVED = "retrieved"
+NO_MATCH = "no_match"
+
+# Messages made only of these words (after dropping punctuation) are small talk
+_CHITCHAT_WORDS = frozenset("""
+    hi hello hey hiya yo howdy greetings good morning afternoon evening night
+    thanks thank you thx ty cheers appreciate it ok okay k cool great nice awesome
+    sure yes yeah yep no nope bye goodbye see later lol haha wow hmm got gotcha
+    how are what's whats up doing who is this there i am fine well a lot so much
+    very
+""".split())
+_META_QUESTIONS = re.compile(
+    r"^(who|what) (are|r) (you|u)\b|^what can you do\b|^are you (a )?(bot|human|ai)\b|^how do you work\b"
+)
+# Numbers, operators and at most a single-letter variable: "12*7", "3x+5=11"
+_ARITHMETIC = re.compile(r"^(what is |what's |calculate |compute |solve )?[\d\s.+\-*/^()=x%]+\??$")
+
+
+def classify(query: str) -> str:
+    """Cheap query class: CHITCHAT, COMPUTE or QUESTION."""
+    text = query.lower().strip()
+    words = re.findall(r"[a-z']+", text)
+    if not re.search(r"\d", text):
+        if not words or all(word in _CHITCHAT_WORDS for word in words):
+            return CHITCHAT
+        if _META_QUESTIONS.search(text):
+            return CHITCHAT
+    if re.search(r"\d", text) and _ARITHMETIC.match(text):
+        return COMPUTE
+    return QUESTION
+
+
+class RetrievalGate:
+    """Decides per query whether to retrieve and which chunks reach the prompt."""
+
+    def __init__(
+        self,
+        enabled: bool = RETRIEVAL_GATE_ENABLED,
+        max_distance: float = RETRIEVAL_MAX_DISTANCE,
+        relative_margin: float = RETRIEVAL_RELATIVE_MARGIN,
+        log_path: Optional[str] = RETRIEVAL_GATE_LOG_PATH
+    ):
+        """
+        Initialize retrieval gate.
+
+        Args:
+            enabled: False retrieves for every query and keeps every chunk
+            max_distance: Largest distance of a chunk kept in the prompt
+            relative_margin: How far behind the best chunk a kept chunk may be
+            log_path: JSON lines file of decisions, or None
+        """
+        self.enabled = enabled
+        self.max_distance = max_distance
+        self.relative_margin = relative_margin
+        self.log_path = log_path
+        if log_path:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+
+    def decide(self, query: str) -> Dict[str, Any]:
+        """
+        Whether to retrieve for a query.
+
+        Returns:
+            Decision dict with 'retrieve' and 'query_class'; a skip is
+            recorded here, a retrieval by select()
+        """
+        if not self.enabled:
+            return {'retrieve': True, 'query_class': QUESTION}
+        query_class = classify(query)
+        decision = {'retrieve': query_class == QUESTION, 'query_class': query_class}
+        if not decision['retrieve']:
+            decision['decision'] = f"skipped_{query_class}"
+            self._record(query, decision)
+        return decision
+
+    def select(
+        self,
+        query: str,
+        docs: List[Dict[str, Any]],
+        decision: Dict[str, Any],
+        record: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Chunks worth putting in the prompt, best first.
+
+        Args:
+            query: Query text
+            docs: Retrieved chunks with 'distance' (RAGEngine.retrieve)
+            decision: Dict from decide(); updated with what was kept
+            record: Whether to record the decision (False for audits)
+
+        Returns:
+            Kept chunks (possibly none)
+        """
+        if not self.enabled:
+            decision.update(decision=RETRIEVED, kept=len(docs), dropped=0)
+            return docs
+
+        distances = [doc['distance'] for doc in docs if doc.get('distance') is not None]
+        best = min(distances) if distances else None
+        if best is None:
+            # No distances to judge by: keep what the store returned
+            kept = list(docs)
+        else:
+            cutoff = min(self.max_distance, best + self.relative_margin)
+            kept = [doc for doc in docs if doc.get('distance') is not None and doc['distance'] <= cutoff]
+
+        decision.update(
+            decision=RETRIEVED if kept else NO_MATCH,
+            kept=len(kept),
+            dropped=len(docs) - len(kept),
+            best_distance=round(best, 4) if best is not None else None,
+            distances=[round(d, 4) for d in distances]
+        )
+        if record:
+            RETRIEVAL_CHUNKS.labels("kept").inc(len(kept))
+            RETRIEVAL_CHUNKS.labels("dropped").inc(len(docs) - len(kept))
+            self._record(query, decision)
+        return kept
+
+    def _record(self, query: str, decision: Dict[str, Any]):
+        RETRIEVAL_DECISIONS.labels(decision['decision']).inc()
+        set_attributes(**{
+            'retrieval.decision': decision['decision'],
+            'retrieval.kept': decision.get('kept', 0),
+            'retrieval.best_distance': decision.get('best_distance') if decision.get('best_distance') is not None else -1.0
+        })
+        if not self.log_path:
+            return
+        line = json.dumps({
+            'at': round(time.time(), 3),
+            'query': query[:500],
+            **{k: v for k, v in decision.items() if k != 'retrieve'},
+            'max_distance': self.max_distance,
+            'relative_margin': self.relative_margin
+        })
+        try:
+            # One write per line on an O_APPEND descriptor: workers sharing the
+            # file do not interleave partial lines
+            fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, (line + "\n").encode("utf-8"))
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.warning(f"Could not log retrieval decision: {e}")
+
+
+retrieval_gate = RetrievalGate()
@@ -0,0 +1,5 @@
+"""
+API Routers
+One router per subsystem (chat, kb, sat, mock_tests, generation); app_factory
+mounts them on a shared, lazily built service container
+"""
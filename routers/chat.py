@@ -0,0 +1,154 @@
+"""
+Chat Router
+General Ollama agent chat, RAG queries and model selection
+"""
+
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from runtime_settings import runtime_settings
+from service_registry import registry
+from services import get_service
+
+router = APIRouter()
+
+
+class ChatRequest(BaseModel):
+    message: str
+    use_rag: bool = True
+    session_id: Optional[str] = None     # keeps multi-turn history when set
+
+
+class QueryRequest(BaseModel):
+    query: str
+    n_results: int = 5
+
+
+class ModelChangeRequest(BaseModel):
+    model_name: str
+
+
+@router.get("/api/models")
+async def get_models():
+    """Get list of available Ollama models."""
+    try:
+        agent = await get_service('agent')
+        models = await asyncio.to_thread(agent.get_available_models)
+        return {
+            "success": True,
+            "models": models,
+            "current_model": agent.model,
+            "count": len(models)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/api/chat")
+async def chat(request: ChatRequest):
+    """Chat with the agent."""
+    try:
+        agent = await get_service('agent')
+        if request.use_rag:
+            result = await agent.aquery_with_rag(request.message, n_results=5, session_id=request.session_id)
+            return {
+                "success": True,
+                "message": request.message,
+                "session_id": request.session_id,
+                "response": result["response"],
+                "retrieved_docs": [
+                    {
+                        "content": doc["content"][:300] + "..." if len(doc["content"]) > 300 else doc["content"],
+                        "source": doc.get("metadata", {}).get("source", "Unknown"),
+                        "distance": doc.get("distance")
+                    }
+                    for doc in result.get("retrieved_docs", [])
+                ],
+                "cache": result.get("cache"),
+                "retrieval": result.get("retrieval"),
+                "model": agent.model
+            }
+        else:
+            response = await agent.achat(request.message, session_id=request.session_id)
+            return {
+                "success": True,
+                "message": request.message,
+                "session_id": request.session_id,
+                "response": response,
+                "model": agent.model
+            }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/api/chat/sessions/{session_id}")
+async def clear_session(session_id: str):
+    """Forget a chat session's history."""
+    try:
+        memory = await get_service('conversation_memory')
+        await asyncio.to_thread(memory.clear, session_id)
+        return {"success": True, "session_id": session_id}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/api/query")
+async def query_kb(request: QueryRequest):
+    """Query the knowledge base using RAG."""
+    try:
+        agent = await get_service('agent')
+        result = await agent.aquery_with_rag(request.query, n_results=request.n_results)
+        
+        return {
+            "success": True,
+            "query": request.query,
+            "response": result["response"],
+            "retrieved_docs": [
+                {
+                    "content": doc["content"][:500] + "..." if len(doc["content"]) > 500 else doc["content"],
+                    "source": doc.get("metadata", {}).get("source", "Unknown"),
+                    "distance": doc.get("distance")
+                }
+                for doc in result.get("retrieved_docs", [])
+            ],
+            "doc_count": len(result.get("retrieved_docs", [])),
+            "cache": result.get("cache"),
+            "retrieval": result.get("retrieval")
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/semantic-cache")
+async def semantic_cache_info():
+    """Semantic answer cache hit rate and recent audited false hits."""
+    try:
+        cache = await get_service('semantic_cache')
+        return {
+            "success": True,
+            "threshold": cache.threshold,
+            "stats": cache.get_stats(),
+            "false_hits": cache.get_false_hits()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/api/model/change")
+async def change_model(request: ModelChangeRequest):
+    """Change the Ollama model."""
+    try:
+        # The agent is rebuilt with the new model on next use (the RAG engine
+        # is kept); every other worker switches on its next request
+        runtime_settings.update(ollama_model=request.model_name)
+        registry.reset('agent')
+        return {
+            "success": True,
+            "model": request.model_name,
+            "message": f"Model changed to {request.model_name}"
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
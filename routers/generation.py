@@ -0,0 +1,212 @@
+"""
+Generation Router
+Practice test generation: the Gemini/Ollama question bank generator and the
+mock test MCP servers (Gemini, Khan Academy, College Board)
+"""
+
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from services import get_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+class QuestionRequest(BaseModel):
+    test_type: str
+    count: Optional[int] = 10
+    difficulty: Optional[str] = "Mixed"
+    topics: Optional[List[str]] = None
+    section: Optional[str] = None
+    practice_test: Optional[int] = 1
+
+
+class QuestionResponse(BaseModel):
+    questions: List[dict]
+    source: str
+    total_count: int
+
+
+class SectionSpec(BaseModel):
+    section: str
+    count: Optional[int] = 10
+    difficulty: Optional[str] = "Mixed"
+    topics: Optional[List[str]] = None
+
+
+class QuestionSetRequest(BaseModel):
+    sections: List[SectionSpec]
+    # e.g. the student ID; without one, students share generated sections for a few minutes
+    seed: Optional[str] = None
+
+
+class QuestionSetResponse(BaseModel):
+    sections: List[dict]
+    total_count: int
+
+
+@router.post("/api/generate-test")
+async def generate_test(request: dict):
+    """Generate a dynamic practice test using Gemini."""
+    try:
+        test_type = request.get("testId", "sat-math")
+        count = request.get("questionCount", 5)
+        student_id = request.get("studentId")
+        
+        # Call the generator
+        generator = await get_service('question_generator')
+        questions = await generator.generate_questions(test_type, count, student_id=student_id)
+        
+        return {
+            "success": True,
+            "test_type": test_type,
+            "count": len(questions),
+            "questions": questions
+        }
+    except Exception as e:
+        print(f"Error generating test: {e}")
+        # Return fallback error structure
+        return {
+            "success": False,
+            "error": str(e),
+            "questions": [] 
+        }
+
+
+# Served as /api/generate-questions by mock_test_api; that path belongs to the
+# SAT router in the combined app
+@router.post("/api/mcp/generate-questions", response_model=QuestionResponse)
+async def generate_mock_test_questions(request: QuestionRequest):
+    """Generate mock test questions using MCP server"""
+    try:
+        mcp_client = await get_service('mock_test_client')
+        questions = []
+        source = "MCP Server"
+        
+        if request.test_type == "sat-math":
+            questions = await mcp_client.generate_sat_math_questions(
+                count=request.count,
+                difficulty=request.difficulty,
+                topics=request.topics or ["Algebra", "Geometry", "Statistics"]
+            )
+        elif request.test_type == "sat-english":
+            questions = await mcp_client.generate_sat_english_questions(
+                count=request.count,
+                difficulty=request.difficulty
+            )
+        elif request.test_type == "act":
+            questions = await mcp_client.generate_act_questions(
+                section=request.section or "Math",
+                count=request.count
+            )
+        else:
+            raise HTTPException(status_code=400, detail="Invalid test type")
+        
+        return QuestionResponse(
+            questions=questions,
+            source=source,
+            total_count=len(questions)
+        )
+    
+    except Exception as e:
+        logger.error(f"Error generating questions: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/api/generate-question-set", response_model=QuestionSetResponse)
+async def generate_question_set(request: QuestionSetRequest):
+    """Generate a full multi-section test with one MCP call"""
+    try:
+        mcp_client = await get_service('mock_test_client')
+        result = await mcp_client.generate_question_set(
+            [spec.model_dump(exclude_none=True) for spec in request.sections],
+            seed=request.seed
+        )
+        return QuestionSetResponse(
+            sections=result.get("sections", []),
+            total_count=result.get("total_count", 0)
+        )
+    
+    except Exception as e:
+        logger.error(f"Error generating question set: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/api/fetch-khan-academy", response_model=QuestionResponse)
+async def fetch_khan_academy_questions(request: QuestionRequest):
+    """Fetch questions from Khan Academy via MCP"""
+    try:
+        if not request.test_type:
+            raise HTTPException(status_code=400, detail="test_type is required")
+        
+        mcp_client = await get_service('mock_test_client')
+        questions = await mcp_client.fetch_khan_academy_questions(
+            subject=request.test_type,
+            count=request.count
+        )
+        
+        return QuestionResponse(
+            questions=questions,
+            source="Khan Academy",
+            total_count=len(questions)
+        )
+    
+    except Exception as e:
+        logger.error(f"Error fetching Khan Academy questions: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/api/fetch-college-board", response_model=QuestionResponse)
+async def fetch_college_board_questions(request: QuestionRequest):
+    """Fetch official questions from College Board via MCP"""
+    try:
+        if not request.test_type:
+            raise HTTPException(status_code=400, detail="test_type is required")
+        
+        mcp_client = await get_service('mock_test_client')
+        questions = await mcp_client.fetch_college_board_questions(
+            test_type=request.test_type,
+            practice_test=request.practice_test
+        )
+        
+        return QuestionResponse(
+            questions=questions,
+            source=f"College Board Practice Test {request.practice_test}",
+            total_count=len(questions)
+        )
+    
+    except Exception as e:
+        logger.error(f"Error fetching College Board questions: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/available-sources")
+async def get_available_sources():
+    """Get list of available question sources"""
+    return {
+        "sources": [
+            {
+                "id": "gemini",
+                "name": "Google Gemini AI",
+                "description": "AI-generated questions using Google Gemini",
+                "test_types": ["sat-math", "sat-english", "act"]
+            },
+            {
+                "id": "khan-academy",
+                "name": "Khan Academy",
+                "description": "Practice questions from Khan Academy",
+                "test_types": ["sat-math", "sat-reading", "act-math"]
+            },
+            {
+                "id": "college-board",
+                "name": "College Board",
+                "description": "Official SAT practice questions",
+                "test_types": ["sat-math", "sat-reading-writing"]
+            }
+        ]
+    }
@@ -0,0 +1,65 @@
+"""
+Knowledge Base Router
+Knowledge base info and document upload, shared by the chat and SAT agents
+"""
+
+import asyncio
+import os
+import time
+from typing import List
+
+from fastapi import APIRouter, File, HTTPException, UploadFile
+
+from config import DATA_DIR, KNOWLEDGE_BASE_NAME
+from runtime_settings import runtime_settings
+from services import get_service
+
+router = APIRouter()
+
+
+@router.get("/api/kb/info")
+async def get_kb_info():
+    """Get knowledge base information."""
+    try:
+        rag_engine = await get_service('rag_engine')
+        info = await asyncio.to_thread(rag_engine.get_kb_info)
+        return {
+            "success": True,
+            "knowledge_base": {
+                "name": KNOWLEDGE_BASE_NAME,
+                "total_chunks": info["total_chunks"],
+                "total_sources": info["total_sources"],
+                "sources": info["sources"]
+            }
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/api/kb/add")
+async def add_documents(files: List[UploadFile] = File(...)):
+    """Add documents to knowledge base."""
+    try:
+        # Ensure data directory exists
+        os.makedirs(DATA_DIR, exist_ok=True)
+        
+        saved_files = []
+        for file in files:
+            file_path = os.path.join(DATA_DIR, file.filename)
+            with open(file_path, "wb") as f:
+                content = await file.read()
+                f.write(content)
+            saved_files.append(file_path)
+        
+        # Add to knowledge base, then have the other workers reopen the index
+        rag_engine = await get_service('rag_engine')
+        await asyncio.to_thread(rag_engine.add_documents_to_kb, saved_files)
+        runtime_settings.update(kb_version=time.time())
+        
+        return {
+            "success": True,
+            "files_added": len(saved_files),
+            "file_names": [os.path.basename(f) for f in saved_files]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
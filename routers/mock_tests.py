@@ -0,0 +1,80 @@
+"""
+Mock Tests Router
+Catalog of full-length SAT mock tests, served with ETags
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+
+from sat_mock_test_mcp import mock_test_catalog, get_test_recommendations_by_level
+
+router = APIRouter()
+
+
+def catalog_response(request: Request, kind: str, key: Optional[str] = None) -> Response:
+    """Serve a precomputed catalog response, or 304 if the client's ETag matches."""
+    body, etag = mock_test_catalog.response(kind, key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/api/mock-tests")
+async def get_mock_tests(request: Request):
+    """Get all available SAT mock tests."""
+    try:
+        return catalog_response(request, "all")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/mock-tests/section/{section}")
+async def get_mock_tests_by_section(section: str, request: Request):
+    """Get mock tests filtered by section."""
+    try:
+        return catalog_response(request, "section", section)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/mock-tests/source/{source}")
+async def get_mock_tests_by_source(source: str, request: Request):
+    """Get mock tests filtered by source."""
+    try:
+        return catalog_response(request, "source", source)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/mock-tests/difficulty/{difficulty}")
+async def get_mock_tests_by_difficulty(difficulty: str, request: Request):
+    """Get mock tests filtered by difficulty."""
+    try:
+        return catalog_response(request, "difficulty", difficulty)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/api/mock-tests/refresh")
+async def refresh_mock_tests():
+    """Re-crawl the mock test sources into the catalog (unchanged pages cost a 304)."""
+    try:
+        from mock_test_crawler import refresh_catalog
+        summary = await refresh_catalog()
+        return {'success': True, **summary}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/mock-tests/recommendations/{level}")
+async def get_mock_test_recommendations(level: str):
+    """Get test recommendations by skill level."""
+    try:
+        result = await get_test_recommendations_by_level(level)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,135 @@
+"""
+Runtime Settings
+Small file-backed settings shared by every worker process, so a change made
+in one worker (a model swap, a knowledge base update) reaches all of them
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import RUNTIME_SETTINGS_PATH, RUNTIME_SETTINGS_RELOAD_INTERVAL
+
+logger = logging.getLogger("runtime_settings")
+
+
+class RuntimeSettings:
+    """
+    Key/value settings in a JSON file, watched by every process.
+
+    update() rewrites the file atomically under an exclusive lock. Other
+    processes see the change on their next poll() (at most one stat() per
+    reload_interval) and run the callbacks subscribed to the changed keys.
+    The process that called update() is expected to have applied the
+    change itself, so its callbacks do not fire.
+    """
+
+    def __init__(self, path: str = RUNTIME_SETTINGS_PATH, reload_interval: float = RUNTIME_SETTINGS_RELOAD_INTERVAL):
+        """
+        Initialize runtime settings.
+
+        Args:
+            path: JSON file holding the settings
+            reload_interval: Minimum seconds between file checks in poll()
+        """
+        self.path = path
+        self.reload_interval = reload_interval
+        self._values: Dict[str, Any] = {}
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._callbacks: Dict[str, List[Callable[[Any], None]]] = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._values, self._stamp = self._read()
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        # os.replace gives every write a new inode, so this catches same-tick writes too
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _read(self) -> Tuple[Dict[str, Any], Optional[Tuple[int, int]]]:
+        stamp = self._file_stamp()
+        if stamp is None:
+            return {}, None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f), stamp
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read runtime settings {self.path}: {e}")
+            return dict(self._values), stamp
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._values.get(key, default)
+
+    def subscribe(self, key: str, callback: Callable[[Any], None]):
+        """Call callback(new_value) when another process changes key."""
+        with self._lock:
+            self._callbacks.setdefault(key, []).append(callback)
+
+    def update(self, **values: Any):
+        """Merge values into the shared file and this process's view."""
+        with self._lock:
+            with open(self.path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                current, _ = self._read()
+                current.update(values)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(current, f)
+                os.replace(tmp_path, self.path)
+                self._values, self._stamp = current, self._file_stamp()
+
+    def reset(self):
+        """Drop all settings (the server master does this before forking workers)."""
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self._values, self._stamp = {}, None
+
+    def _due(self) -> bool:
+        """Whether the file changed since it was last read (checked once per reload_interval)."""
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return False
+        self._checked_at = now
+        return self._file_stamp() != self._stamp
+
+    def poll(self):
+        """Reload the file if another process changed it and fire callbacks."""
+        if self._due():
+            self._reload()
+
+    async def apoll(self):
+        """
+        poll() for the event loop.
+
+        The change check (one stat()) stays inline; reloading and the
+        callbacks, which may reopen clients, run in a worker thread.
+        """
+        if self._due():
+            await asyncio.to_thread(self._reload)
+
+    def _reload(self):
+        with self._lock:
+            values, stamp = self._read()
+            changed = [key for key in set(values) | set(self._values) if values.get(key) != self._values.get(key)]
+            self._values, self._stamp = values, stamp
+            callbacks = [(key, callback) for key in changed for callback in self._callbacks.get(key, [])]
+        for key, callback in callbacks:
+            try:
+                callback(values.get(key))
+            except Exception as e:
+                logger.error(f"Applying runtime setting {key}={values.get(key)!r} failed: {e}")
+
+
+runtime_settings = RuntimeSettings()
@@ -2,14 +2,22 @@
 SAT Practice Agent - Optimized for Speed
 """
 
+import asyncio
 import ollama
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from rag_engine import RAGEngine
 from search_service import SearchService, YouTubeService
+from conversation_memory import ConversationMemory
+from prompt_layout import backend_for, build_messages, client_for, request_options
+from metrics import ollama_call, record_llm_response
+from tracing import traced
 
 SAT_AGENT_INSTRUCTIONS = """You are an expert SAT tutor. Provide concise, clear answers.
 Focus on key concepts and brief explanations."""
 
+# History tokens per chat prompt (chat runs with a 1024 token context)
+SAT_CHAT_HISTORY_TOKENS = 384
+
 class SATAgent:
     """SAT Practice Agent with optimized performance."""
     
@@ -18,19 +26,26 @@ class SATAgent:
         model: str = "llama3.2",
         use_rag: bool = False,  # Disable RAG for speed
         use_search: bool = False,
-        use_youtube: bool = False
+        use_youtube: bool = False,
+        rag_engine: Optional[RAGEngine] = None,
+        search_service: Optional[SearchService] = None,
+        youtube_service: Optional[YouTubeService] = None,
+        memory: Optional[ConversationMemory] = None
     ):
         self.model = model
         self.use_rag = use_rag
         self.use_search = use_search
         self.use_youtube = use_youtube
         
-        self.rag_engine = RAGEngine() if use_rag else None
-        self.search_service = SearchService() if use_search else None
-        self.youtube_service = YouTubeService() if use_youtube else None
+        # Shared services may be passed in so several agents reuse one instance
+        self.rag_engine = (rag_engine or RAGEngine()) if use_rag else None
+        self.search_service = (search_service or SearchService()) if use_search else None
+        self.youtube_service = (youtube_service or YouTubeService()) if use_youtube else None
         
-        self.conversation_history: List[Dict] = []
+        self.memory = memory or ConversationMemory(spill_path=None)
+        self._async_client: Optional[ollama.AsyncClient] = None
     
+    @traced()
     def practice_question(
         self,
         question: str,
@@ -40,39 +55,151 @@ class SATAgent:
     ) -> Dict[str, Any]:
         """Answer a SAT practice question quickly."""
         
-        result = {
-            'question': question,
-            'answer': '',
-            'explanation': '',
-            'rag_sources': [],
-            'search_results': [],
-            'youtube_videos': [],
-            'step_by_step': []
-        }
-        
+        with ollama_call(self.model):
+            response = ollama.chat(**self._practice_request(question))
+            record_llm_response(self.model, response)
+        return self._practice_result(question, response['message']['content'])
+    
+    @traced()
+    async def apractice_question(
+        self,
+        question: str,
+        use_rag: bool = True,
+        use_search: bool = False,
+        use_youtube: bool = False
+    ) -> Dict[str, Any]:
+        """Async practice_question; cancelling it closes the Ollama request."""
+        if self._async_client is None:
+            self._async_client = ollama.AsyncClient()
+        with ollama_call(self.model):
+            response = await self._async_client.chat(**self._practice_request(question))
+            record_llm_response(self.model, response)
+        return self._practice_result(question, response['message']['content'])
+    
+    def _practice_request(self, question: str) -> Dict[str, Any]:
+        """Build the ollama chat arguments for a practice question."""
         # Simple prompt - no RAG for speed
         prompt = f"Question: {question}\n\nProvide a brief SAT answer:"
-
-        response = ollama.chat(
-            model=self.model,
-            messages=[
+        
+        return {
+            "model": self.model,
+            "messages": [
                 {"role": "system", "content": "You are a SAT tutor. Give brief, direct answers."},
                 {"role": "user", "content": prompt}
             ],
-            options={
+            "options": {
                 "temperature": 0.1,
                 "num_predict": 128,
                 "num_ctx": 512
             }
-        )
-        
-        result['answer'] = response['message']['content']
+        }
+    
+    def _practice_result(self, question: str, answer: str) -> Dict[str, Any]:
+        """Shape a practice answer into the response dict."""
+        return {
+            'question': question,
+            'answer': answer,
+            'explanation': answer,
+            'rag_sources': [],
+            'search_results': [],
+            'youtube_videos': [],
+            'step_by_step': []
+        }
+    
+    @traced()
+    def explain_concept(
+        self,
+        concept: str,
+        use_rag: bool = True,
+        use_search: bool = True,
+        use_youtube: bool = True
+    ) -> Dict[str, Any]:
+        """Explain a SAT concept, with resources from the enabled services."""
+        result, context = self._concept_resources(concept, use_rag, use_search, use_youtube)
+        with ollama_call(self.model):
+            response = ollama.chat(**self._explain_request(concept, context))
+            record_llm_response(self.model, response)
         result['explanation'] = response['message']['content']
+        return result
+    
+    @traced()
+    async def aexplain_concept(
+        self,
+        concept: str,
+        use_rag: bool = True,
+        use_search: bool = True,
+        use_youtube: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Async explain_concept; cancelling it closes the Ollama request.
         
+        The resource lookups run in a worker thread; each is bounded by its
+        provider's deadline and is not interrupted by cancellation.
+        """
+        result, context = await asyncio.to_thread(self._concept_resources, concept, use_rag, use_search, use_youtube)
+        if self._async_client is None:
+            self._async_client = ollama.AsyncClient()
+        with ollama_call(self.model):
+            response = await self._async_client.chat(**self._explain_request(concept, context))
+            record_llm_response(self.model, response)
+        result['explanation'] = response['message']['content']
         return result
     
-    def chat(self, message: str, use_rag: bool = True) -> str:
-        """Quick chat with the SAT agent."""
+    def _concept_resources(
+        self,
+        concept: str,
+        use_rag: bool,
+        use_search: bool,
+        use_youtube: bool
+    ) -> Tuple[Dict[str, Any], str]:
+        """Look up a concept in the knowledge base, the web and YouTube; returns (result, prompt context)."""
+        result = {
+            'concept': concept,
+            'explanation': '',
+            'rag_sources': [],
+            'search_results': [],
+            'youtube_videos': []
+        }
+        context = ""
+        if use_rag and self.rag_engine:
+            retrieved_docs = self.rag_engine.retrieve(concept, n_results=3)
+            result['rag_sources'] = [
+                {
+                    'content': doc['content'][:300] + '...' if len(doc['content']) > 300 else doc['content'],
+                    'source': doc.get('metadata', {}).get('source', 'Unknown')
+                }
+                for doc in retrieved_docs
+            ]
+            context += "".join(f"\n[{i}] {doc['content'][:300]}" for i, doc in enumerate(retrieved_docs, 1))
+        if use_search and self.search_service:
+            result['search_results'] = self.search_service.search_sat_related(concept, max_results=3)
+            context += "".join(f"\n- {res['title']}: {res['snippet']}" for res in result['search_results'])
+        if use_youtube and self.youtube_service:
+            result['youtube_videos'] = self.youtube_service.search_sat_explanations(concept, max_results=3)
+        return result, context
+    
+    def _explain_request(self, concept: str, context: str) -> Dict[str, Any]:
+        """Build the ollama chat arguments for a concept explanation."""
+        prompt = f"Explain the SAT concept: {concept}"
+        if context:
+            prompt += f"\n\nReference material:{context}"
+        
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SAT_AGENT_INSTRUCTIONS},
+                {"role": "user", "content": prompt}
+            ],
+            "options": {
+                "temperature": 0.3,
+                "num_predict": 384,
+                "num_ctx": 2048
+            }
+        }
+    
+    @traced()
+    def chat(self, message: str, use_rag: bool = True, session_id: Optional[str] = None) -> str:
+        """Quick chat with the SAT agent; with a session_id the session's history is sent and extended."""
         
         context = ""
         if use_rag and self.rag_engine:
@@ -81,20 +208,24 @@ class SATAgent:
                 context = f"Context: {retrieved_docs[0]['content'][:150]}\n\n"
         
         prompt = f"{context}Question: {message}"
+        history = self.memory.history_messages(session_id, SAT_CHAT_HISTORY_TOKENS) if session_id else None
         
-        response = ollama.chat(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": SAT_AGENT_INSTRUCTIONS},
-                {"role": "user", "content": prompt}
-            ],
-            options={
-                "temperature": 0.3,
-                "top_p": 0.8,
-                "num_predict": 256,
-                "num_ctx": 1024,
-                "repeat_penalty": 1.1
-            }
-        )
+        with ollama_call(self.model):
+            response = client_for(backend_for(session_id)).chat(
+                model=self.model,
+                messages=build_messages(SAT_AGENT_INSTRUCTIONS, history, prompt),
+                **request_options(),
+                options={
+                    "temperature": 0.3,
+                    "top_p": 0.8,
+                    "num_predict": 256,
+                    "num_ctx": 1024,
+                    "repeat_penalty": 1.1
+                }
+            )
+            record_llm_response(self.model, response)
+        answer = response['message']['content']
         
-        return response['message']['content']
\ No newline at end of file
+        if session_id:
+            self.memory.add_turn(session_id, message, answer)
+        return answer
\ No newline at end of file
@@ -4,13 +4,20 @@ Connects to educational websites to fetch SAT practice tests and questions
 """
 
 import asyncio
+import fcntl
+import hashlib
 import json
+import os
+import threading
+import time
 import aiohttp
-from typing import List, Dict, Optional
-from dataclasses import dataclass
+from typing import List, Dict, Mapping, Optional, Tuple
+from dataclasses import dataclass, asdict
 from bs4 import BeautifulSoup
 import re
 
+from config import MOCK_TEST_CATALOG_PATH, MOCK_TEST_CATALOG_RELOAD_INTERVAL, MOCK_TEST_CRAWLED_PATH
+
 
 @dataclass
 class MockTest:
@@ -35,11 +42,245 @@ class Question:
     source: str
 
 
+def _index(values_per_test: List[List[str]]) -> Dict[str, List[int]]:
+    """Map each lowercased value to the positions of the tests that have it."""
+    index: Dict[str, List[int]] = {}
+    for position, values in enumerate(values_per_test):
+        for value in dict.fromkeys(v.lower() for v in values):
+            index.setdefault(value, []).append(position)
+    return index
+
+
+def _substrings(value: str) -> List[str]:
+    """All substrings of a short label, so substring queries become dict lookups."""
+    value = value.lower()
+    return [value[i:j] for i in range(len(value)) for j in range(i + 1, len(value) + 1)]
+
+
+def _mtime(path: Optional[str]) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns if path else None
+    except OSError:
+        return None
+
+
+class _CatalogSnapshot:
+    """One loaded version of the catalog file with its indexes."""
+    
+    MAX_CACHED_RESPONSES = 1024
+    
+    def __init__(self, tests: List[MockTest], recommendations: Dict[str, List[str]]):
+        self.tests = tests
+        self.recommendations = recommendations
+        # Response-ready dicts, built once per load
+        self.records = [asdict(test) for test in tests]
+        self.by_section = _index([test.sections for test in tests])
+        self.by_source = _index([[test.source] for test in tests])
+        # Difficulty search matches substrings ("official" -> "Official Digital")
+        self.by_difficulty = _index([_substrings(test.difficulty) for test in tests])
+        # (kind, key) -> (payload dict, serialized body, ETag)
+        self.responses: Dict[Tuple[str, Optional[str]], Tuple[Dict, bytes, str]] = {}
+
+
+class MockTestCatalog:
+    """
+    SAT mock test catalog loaded from a JSON data file.
+    
+    The file is re-read when its modification time changes (checked at most
+    every reload_interval seconds). Listings found by the crawler are layered
+    on top of the file's tests; they are kept in a second file, reloaded the
+    same way, so every worker (and a restart) sees the same crawl. Lookups go
+    through prebuilt indexes and cost O(result); serialized responses are
+    cached per catalog version.
+    """
+    
+    def __init__(
+        self,
+        path: str = MOCK_TEST_CATALOG_PATH,
+        reload_interval: float = MOCK_TEST_CATALOG_RELOAD_INTERVAL,
+        crawled_path: Optional[str] = MOCK_TEST_CRAWLED_PATH
+    ):
+        self.path = path
+        self.crawled_path = crawled_path
+        self.reload_interval = reload_interval
+        self._snapshot: Optional[_CatalogSnapshot] = None
+        self._mtime: Tuple[Optional[int], Optional[int]] = (None, None)
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._file_tests: List[MockTest] = []
+        self._recommendations: Dict[str, List[str]] = {}
+        # Crawled listings by page URL
+        self._crawled: Dict[str, List[MockTest]] = {}
+    
+    def snapshot(self) -> _CatalogSnapshot:
+        """Current catalog version, reloading the file if it changed."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.reload_interval:
+            return snapshot
+        
+        with self._lock:
+            self._checked_at = time.monotonic()
+            mtime, crawled_mtime = _mtime(self.path), _mtime(self.crawled_path)
+            changed = False
+            if self._snapshot is None or (mtime is not None and mtime != self._mtime[0]):
+                self._load()
+                changed = True
+            if self._snapshot is None or (crawled_mtime is not None and crawled_mtime != self._mtime[1]):
+                self._load_crawled()
+                changed = True
+            self._mtime = (mtime, crawled_mtime)
+            if changed:
+                self._snapshot = self._build()
+            return self._snapshot
+    
+    def _load(self):
+        """Parse the data file; on error the previous contents are kept."""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            self._file_tests = [MockTest(**test) for test in data.get('tests', [])]
+            self._recommendations = data.get('recommendations', {})
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Error loading mock test catalog {self.path}: {e}")
+    
+    def _read_crawled(self) -> Dict[str, List[Dict]]:
+        if not self.crawled_path or not os.path.exists(self.crawled_path):
+            return {}
+        with open(self.crawled_path, encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _load_crawled(self):
+        """Parse the crawled listings file; on error the previous contents are kept."""
+        try:
+            pages = self._read_crawled()
+            self._crawled = {url: [MockTest(**test) for test in tests] for url, tests in pages.items()}
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"Error loading crawled mock tests {self.crawled_path}: {e}")
+    
+    def _build(self) -> _CatalogSnapshot:
+        """Merge file and crawled tests; the file wins on duplicate URLs."""
+        tests = list(self._file_tests)
+        seen = {test.url for test in tests}
+        for page_tests in self._crawled.values():
+            for test in page_tests:
+                if test.url not in seen:
+                    seen.add(test.url)
+                    tests.append(test)
+        return _CatalogSnapshot(tests, self._recommendations)
+    
+    def set_crawled(self, page_url: str, tests: List[MockTest]) -> bool:
+        """
+        Replace the listings extracted from one crawled page.
+        
+        The crawled listings file is re-read under an exclusive lock and
+        replaced atomically, so concurrent crawls of other pages are kept.
+        
+        Returns:
+            True if the catalog changed
+        """
+        with self._lock:
+            if self._crawled.get(page_url) == tests:
+                return False
+            if self.crawled_path:
+                self._write_crawled(page_url, tests)
+            else:
+                self._crawled[page_url] = tests
+            if self._snapshot is not None:
+                self._snapshot = self._build()
+            return True
+    
+    def _write_crawled(self, page_url: str, tests: List[MockTest]):
+        # Caller holds the lock
+        os.makedirs(os.path.dirname(os.path.abspath(self.crawled_path)), exist_ok=True)
+        with open(self.crawled_path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                pages = self._read_crawled()
+            except ValueError:
+                pages = {}  # rebuilt by the crawl
+            pages[page_url] = [asdict(test) for test in tests]
+            tmp_path = f"{self.crawled_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(pages, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.crawled_path)
+        self._crawled = {url: [MockTest(**test) for test in page] for url, page in pages.items()}
+        self._mtime = (self._mtime[0], _mtime(self.crawled_path))
+    
+    def _lookup(self, index_name: str, key: str) -> List[MockTest]:
+        # Index and tests must come from the same snapshot
+        snapshot = self.snapshot()
+        index = getattr(snapshot, index_name)
+        return [snapshot.tests[position] for position in index.get(key.lower(), ())]
+    
+    def all(self) -> List[MockTest]:
+        return list(self.snapshot().tests)
+    
+    def by_section(self, section: str) -> List[MockTest]:
+        return self._lookup('by_section', section)
+    
+    def by_source(self, source: str) -> List[MockTest]:
+        return self._lookup('by_source', source)
+    
+    def by_difficulty(self, difficulty: str) -> List[MockTest]:
+        return self._lookup('by_difficulty', difficulty)
+    
+    def recommendations(self) -> Dict[str, List[str]]:
+        return self.snapshot().recommendations
+    
+    def response(self, kind: str = 'all', key: Optional[str] = None) -> Tuple[bytes, str]:
+        """
+        Serialized JSON response and its ETag.
+        
+        Args:
+            kind: 'all', 'section', 'source' or 'difficulty'
+            key: Filter value for everything but 'all'
+        
+        Returns:
+            (body, etag) - body is compact UTF-8 JSON
+        """
+        _, body, etag = self._response(kind, key)
+        return body, etag
+    
+    def payload(self, kind: str = 'all', key: Optional[str] = None) -> Dict:
+        """
+        The dict response() serializes, for in-process callers.
+        
+        It is shared by every caller until the catalog changes; do not modify it.
+        """
+        return self._response(kind, key)[0]
+    
+    def _response(self, kind: str, key: Optional[str]) -> Tuple[Dict, bytes, str]:
+        snapshot = self.snapshot()
+        cached = snapshot.responses.get((kind, key))
+        if cached is not None:
+            return cached
+        
+        if kind == 'all':
+            positions = range(len(snapshot.records))
+            payload = {'success': True}
+        else:
+            if kind not in ('section', 'source', 'difficulty'):
+                raise ValueError(f"Unknown catalog response kind: {kind}")
+            index = getattr(snapshot, 'by_' + kind)
+            positions = index.get(key.lower(), ())
+            payload = {'success': True, kind: key}
+        payload['total_tests'] = len(positions)
+        payload['tests'] = [snapshot.records[position] for position in positions]
+        
+        body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        result = (payload, body, '"' + hashlib.sha1(body).hexdigest()[:20] + '"')
+        # Unknown keys are cheap to build, so only bound the cache
+        if len(snapshot.responses) < snapshot.MAX_CACHED_RESPONSES:
+            snapshot.responses[(kind, key)] = result
+        return result
+
+
 class SATMockTestMCP:
     """MCP Client for fetching SAT mock tests from various sources."""
     
-    def __init__(self):
+    def __init__(self, catalog: Optional[MockTestCatalog] = None):
         self.session = None
+        self.catalog = catalog or mock_test_catalog
         self.sources = {
             'khan_academy': {
                 'base_url': 'https://www.khanacademy.org',
@@ -64,282 +305,94 @@ class SATMockTestMCP:
         }
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=30),
-            headers={
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-            }
-        )
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.session:
             await self.session.close()
+            self.session = None
     
-    async def fetch_page(self, url: str) -> Optional[str]:
-        """Fetch HTML content from a URL."""
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Create the HTTP session on the first live fetch."""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=30),
+                headers={
+                    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+                }
+            )
+        return self.session
+    
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> Tuple[int, Optional[str], Mapping[str, str]]:
+        """
+        GET a URL with optional extra headers (e.g. conditional GET validators).
+        
+        Returns:
+            (status, body, response headers); status is 0 on network errors
+            and body is None unless the status is 200
+        """
         try:
-            async with self.session.get(url) as response:
-                if response.status == 200:
-                    return await response.text()
-                else:
-                    print(f"Failed to fetch {url}: Status {response.status}")
-                    return None
+            async with self._get_session().get(url, headers=headers) as response:
+                body = await response.text() if response.status == 200 else None
+                # Copy keeps case-insensitive lookups (e.g. 'ETag' vs 'Etag')
+                return response.status, body, response.headers.copy()
         except Exception as e:
             print(f"Error fetching {url}: {e}")
-            return None
+            return 0, None, {}
+    
+    async def fetch_page(self, url: str) -> Optional[str]:
+        """Fetch HTML content from a URL."""
+        status, body, _ = await self.fetch(url)
+        if status and status != 200:
+            print(f"Failed to fetch {url}: Status {status}")
+        return body
     
     async def get_khan_academy_tests(self) -> List[MockTest]:
         """Fetch SAT practice tests from Khan Academy."""
-        tests = []
-        
-        # Khan Academy SAT practice tests (verified working URLs)
-        khan_tests = [
-            {
-                'title': 'Khan Academy SAT Prep',
-                'url': 'https://www.khanacademy.org/test-prep/sat',
-                'sections': ['Reading', 'Writing & Language', 'Math'],
-                'questions_count': 1000,
-                'difficulty': 'All Levels',
-                'description': 'Complete SAT prep course with practice questions and lessons'
-            },
-            {
-                'title': 'Khan Academy Math Practice',
-                'url': 'https://www.khanacademy.org/test-prep/sat/sat-math-practice',
-                'sections': ['Math'],
-                'questions_count': 500,
-                'difficulty': 'All Levels',
-                'description': 'Comprehensive SAT Math practice with instant feedback'
-            },
-            {
-                'title': 'Khan Academy Reading Practice',
-                'url': 'https://www.khanacademy.org/test-prep/sat/sat-reading-writing-practice',
-                'sections': ['Reading', 'Writing'],
-                'questions_count': 400,
-                'difficulty': 'All Levels',
-                'description': 'SAT Reading and Writing practice with detailed explanations'
-            }
-        ]
-        
-        for test_data in khan_tests:
-            tests.append(MockTest(
-                title=test_data['title'],
-                source='Khan Academy',
-                url=test_data['url'],
-                sections=test_data['sections'],
-                questions_count=test_data['questions_count'],
-                difficulty=test_data['difficulty'],
-                description=test_data['description']
-            ))
-        
-        return tests
+        return self.catalog.by_source('Khan Academy')
     
     async def get_college_board_tests(self) -> List[MockTest]:
         """Fetch SAT practice tests from College Board."""
-        tests = []
-        
-        # College Board official practice tests (verified working URLs)
-        cb_tests = [
-            {
-                'title': 'College Board SAT Practice',
-                'url': 'https://collegereadiness.collegeboard.org/sat/practice',
-                'sections': ['Reading & Writing', 'Math'],
-                'questions_count': 98,
-                'difficulty': 'Official',
-                'description': 'Official College Board SAT practice and preparation resources'
-            },
-            {
-                'title': 'Digital SAT Bluebook',
-                'url': 'https://satsuite.collegeboard.org/digital',
-                'sections': ['Reading & Writing', 'Math'],
-                'questions_count': 98,
-                'difficulty': 'Official Digital',
-                'description': 'Official Digital SAT information and Bluebook app download'
-            },
-            {
-                'title': 'PSAT Practice',
-                'url': 'https://collegereadiness.collegeboard.org/psat-nmsqt-psat-10',
-                'sections': ['Reading', 'Writing & Language', 'Math'],
-                'questions_count': 139,
-                'difficulty': 'PSAT Level',
-                'description': 'Official PSAT/NMSQT practice and preparation'
-            }
-        ]
-        
-        for test_data in cb_tests:
-            tests.append(MockTest(
-                title=test_data['title'],
-                source='College Board',
-                url=test_data['url'],
-                sections=test_data['sections'],
-                questions_count=test_data['questions_count'],
-                difficulty=test_data['difficulty'],
-                description=test_data['description']
-            ))
-        
-        return tests
+        return self.catalog.by_source('College Board')
     
     async def get_princeton_review_tests(self) -> List[MockTest]:
         """Fetch SAT practice tests from third-party providers."""
-        tests = []
-        
-        # Third-party reliable practice tests (verified working URLs)
-        pr_tests = [
-            {
-                'title': 'Princeton Review SAT Prep',
-                'url': 'https://www.princetonreview.com/college/sat-test-prep',
-                'sections': ['Reading', 'Writing & Language', 'Math'],
-                'questions_count': 200,
-                'difficulty': 'All Levels',
-                'description': 'Comprehensive SAT prep with practice questions and strategies'
-            },
-            {
-                'title': 'Kaplan SAT Practice',
-                'url': 'https://www.kaptest.com/sat',
-                'sections': ['Reading', 'Writing & Language', 'Math'],
-                'questions_count': 300,
-                'difficulty': 'All Levels',
-                'description': 'SAT practice tests and prep courses from Kaplan'
-            },
-            {
-                'title': 'PrepScholar SAT',
-                'url': 'https://www.prepscholar.com/sat/',
-                'sections': ['Reading', 'Writing & Language', 'Math'],
-                'questions_count': 500,
-                'difficulty': 'All Levels',
-                'description': 'Personalized SAT prep with practice tests and score improvement'
-            },
-            {
-                'title': 'Magoosh SAT Practice',
-                'url': 'https://magoosh.com/sat/',
-                'sections': ['Reading', 'Writing & Language', 'Math'],
-                'questions_count': 400,
-                'difficulty': 'All Levels',
-                'description': 'Online SAT prep with video lessons and practice questions'
-            }
-        ]
-        
-        for test_data in pr_tests:
-            tests.append(MockTest(
-                title=test_data['title'],
-                source='Test Prep Companies',
-                url=test_data['url'],
-                sections=test_data['sections'],
-                questions_count=test_data['questions_count'],
-                difficulty=test_data['difficulty'],
-                description=test_data['description']
-            ))
-        
-        return tests
+        return self.catalog.by_source('Test Prep Companies')
     
     async def get_all_mock_tests(self) -> List[MockTest]:
         """Fetch all available SAT mock tests from all sources."""
-        all_tests = []
-        
-        try:
-            # Fetch from all sources concurrently
-            tasks = [
-                self.get_khan_academy_tests(),
-                self.get_college_board_tests(),
-                self.get_princeton_review_tests()
-            ]
-            
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            for result in results:
-                if isinstance(result, list):
-                    all_tests.extend(result)
-                else:
-                    print(f"Error fetching tests: {result}")
-        
-        except Exception as e:
-            print(f"Error in get_all_mock_tests: {e}")
-        
-        return all_tests
+        return self.catalog.all()
     
     async def search_tests_by_section(self, section: str) -> List[MockTest]:
         """Search for tests that include a specific section."""
-        all_tests = await self.get_all_mock_tests()
-        return [test for test in all_tests if section.lower() in [s.lower() for s in test.sections]]
+        return self.catalog.by_section(section)
     
     async def search_tests_by_difficulty(self, difficulty: str) -> List[MockTest]:
         """Search for tests by difficulty level."""
-        all_tests = await self.get_all_mock_tests()
-        return [test for test in all_tests if difficulty.lower() in test.difficulty.lower()]
+        return self.catalog.by_difficulty(difficulty)
     
     def get_test_recommendations(self) -> Dict[str, List[str]]:
         """Get recommendations for different test preparation stages."""
-        return {
-            'beginner': [
-                'Start with Khan Academy Practice Test 1',
-                'Focus on PSAT/NMSQT Practice Test first',
-                'Use Princeton Review Intermediate level tests'
-            ],
-            'intermediate': [
-                'Take Khan Academy Practice Tests 1-4 in order',
-                'Use College Board Official Practice Tests',
-                'Mix in Princeton Review tests for variety'
-            ],
-            'advanced': [
-                'Focus on College Board Official Tests',
-                'Take Princeton Review Advanced tests',
-                'Time yourself strictly on all practice tests'
-            ]
-        }
+        return self.catalog.recommendations()
+
+
+mock_test_catalog = MockTestCatalog()
 
 
 # MCP Server Functions
 async def list_mock_tests() -> Dict:
     """MCP function to list all available SAT mock tests."""
-    async with SATMockTestMCP() as mcp:
-        tests = await mcp.get_all_mock_tests()
-        
-        return {
-            'success': True,
-            'total_tests': len(tests),
-            'tests': [
-                {
-                    'title': test.title,
-                    'source': test.source,
-                    'url': test.url,
-                    'sections': test.sections,
-                    'questions_count': test.questions_count,
-                    'difficulty': test.difficulty,
-                    'description': test.description
-                }
-                for test in tests
-            ]
-        }
+    return mock_test_catalog.payload('all')
 
 
 async def get_tests_by_section(section: str) -> Dict:
     """MCP function to get tests filtered by section."""
-    async with SATMockTestMCP() as mcp:
-        tests = await mcp.search_tests_by_section(section)
-        
-        return {
-            'success': True,
-            'section': section,
-            'total_tests': len(tests),
-            'tests': [
-                {
-                    'title': test.title,
-                    'source': test.source,
-                    'url': test.url,
-                    'sections': test.sections,
-                    'questions_count': test.questions_count,
-                    'difficulty': test.difficulty,
-                    'description': test.description
-                }
-                for test in tests
-            ]
-        }
+    return mock_test_catalog.payload('section', section)
 
 
 async def get_test_recommendations_by_level(level: str) -> Dict:
     """MCP function to get test recommendations by skill level."""
-    mcp = SATMockTestMCP()
-    recommendations = mcp.get_test_recommendations()
+    recommendations = mock_test_catalog.recommendations()
     
     if level.lower() in recommendations:
         return {
@@ -3,22 +3,135 @@ Internet Search Service for SAT Practice
 Provides web search capabilities using DuckDuckGo
 """
 
+import queue
+import threading
 import requests
-from typing import List, Dict, Optional
-from duckduckgo_search import DDGS
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+from typing import Callable, List, Dict, Optional
+
+from config import (
+    SEARCH_CACHE_TTL,
+    SEARCH_CACHE_STALE_TTL,
+    SEARCH_CACHE_MAX_ENTRIES,
+    SEARCH_CACHE_PATH,
+    SEARCH_TIMEOUT,
+    YOUTUBE_WORKERS,
+    YOUTUBE_QUERY_DEADLINE,
+    YOUTUBE_SOCKET_TIMEOUT,
+    YOUTUBE_CACHE_TTL,
+    YOUTUBE_CACHE_STALE_TTL,
+    YOUTUBE_CACHE_MAX_ENTRIES,
+    YOUTUBE_CACHE_PATH
+)
+from result_cache import ResultCache, normalize_query
+from resource_index import ResourceIndex, get_resource_index
+from resilience import CircuitBreaker, DeadlineExceeded, budget, get_breaker
+from metrics import stage
+from tracing import traced
+
+
+class SearchProvider:
+    """Base class for web search backends used by SearchService."""
+    
+    name = "base"
+    
+    def search(self, query: str, max_results: int) -> List[Dict]:
+        """
+        Run one search.
+        
+        Returns:
+            Results with title, snippet and url; raises on failure so the
+            error is not cached
+        """
+        raise NotImplementedError
+
+
+class DuckDuckGoProvider(SearchProvider):
+    """Live DuckDuckGo text search."""
+    
+    name = "duckduckgo"
+    
+    def __init__(self):
+        from duckduckgo_search import DDGS
+        # Bounds the worker thread, which a timed-out caller cannot cancel
+        self.ddgs = DDGS(timeout=SEARCH_TIMEOUT)
+    
+    def search(self, query: str, max_results: int) -> List[Dict]:
+        return [
+            {
+                'title': result.get('title', ''),
+                'snippet': result.get('body', ''),
+                'url': result.get('href', ''),
+            }
+            for result in self.ddgs.text(query, max_results=max_results)
+        ]
+
+
+class StaticSearchProvider(SearchProvider):
+    """Offline provider for tests: canned results or a callable."""
+    
+    name = "static"
+    
+    def __init__(self, results: Optional[Dict[str, List[Dict]]] = None, handler: Optional[Callable[[str, int], List[Dict]]] = None):
+        """
+        Args:
+            results: Results by normalized query
+            handler: Called for queries not in results
+        """
+        self.results = {normalize_query(q): r for q, r in (results or {}).items()}
+        self.handler = handler
+        self.calls = 0
+    
+    def search(self, query: str, max_results: int) -> List[Dict]:
+        self.calls += 1
+        results = self.results.get(normalize_query(query))
+        if results is None and self.handler is not None:
+            results = self.handler(query, max_results)
+        return (results or [])[:max_results]
 
 
 class SearchService:
     """Service for internet search functionality."""
     
-    def __init__(self):
-        """Initialize search service."""
-        self.ddgs = DDGS()
+    def __init__(
+        self,
+        provider: Optional[SearchProvider] = None,
+        cache: Optional[ResultCache] = None,
+        local_index: Optional[ResourceIndex] = None,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        """
+        Initialize search service.
+        
+        Args:
+            provider: Search backend (defaults to DuckDuckGo)
+            cache: Result cache (defaults to a TTL cache with a SQLite tier)
+            local_index: Curated resources searched first (defaults to the shared index)
+            breaker: Circuit breaker for the provider (defaults to the shared one)
+        """
+        self.provider = provider or DuckDuckGoProvider()
+        self.local_index = local_index or get_resource_index()
+        self.breaker = breaker or get_breaker(f"search:{self.provider.name}")
+        self.cache = cache or ResultCache(
+            "search_results",
+            ttl=SEARCH_CACHE_TTL,
+            stale_ttl=SEARCH_CACHE_STALE_TTL,
+            max_entries=SEARCH_CACHE_MAX_ENTRIES,
+            db_path=SEARCH_CACHE_PATH
+        )
     
+    @stage("search")
     def search(self, query: str, max_results: int = 5) -> List[Dict]:
         """
         Search the internet for information.
         
+        Curated local resources that match the query well come first; the
+        live provider only fills the remaining slots. Live results are cached per normalized query
+        and max_results, and concurrent identical searches share one
+        provider call. While the provider's breaker is open, or once the
+        request deadline has passed, cached or local results are returned
+        without waiting on the provider.
+        
         Args:
             query: Search query
             max_results: Maximum number of results to return
@@ -26,22 +139,34 @@ class SearchService:
         Returns:
             List of search results with title, snippet, and URL
         """
-        try:
-            results = []
-            search_results = self.ddgs.text(query, max_results=max_results)
-            
-            for result in search_results:
-                results.append({
-                    'title': result.get('title', ''),
-                    'snippet': result.get('body', ''),
-                    'url': result.get('href', ''),
-                })
-            
+        results = [
+            {'title': r['title'], 'snippet': r['snippet'], 'url': r['url']}
+            for r in self.local_index.search(query, kind='link', limit=max_results)
+        ]
+        if len(results) >= max_results:
             return results
+        
+        try:
+            live = self.cache.get_or_fetch(
+                f"{self.provider.name}:{max_results}:{normalize_query(query)}",
+                lambda: self._fetch(query, max_results)
+            )
         except Exception as e:
             print(f"Search error: {e}")
-            return []
+            return results
+        
+        # Callers get their own dicts; cached entries stay untouched
+        seen = {result['url'] for result in results}
+        results.extend(dict(result) for result in live if result.get('url') not in seen)
+        return results[:max_results]
     
+    def _fetch(self, query: str, max_results: int) -> List[Dict]:
+        # Checked before the breaker so a spent budget is not blamed on the provider
+        budget()
+        with stage("search_live"):
+            return self.breaker.call(self.provider.search, query, max_results)
+    
+    @traced()
     def search_sat_related(self, topic: str, max_results: int = 5) -> List[Dict]:
         """
         Search for SAT-related content.
@@ -56,6 +181,7 @@ class SearchService:
         query = f"SAT {topic} practice explanation"
         return self.search(query, max_results)
     
+    @traced()
     def get_explanation_links(self, question_topic: str) -> List[Dict]:
         """
         Get explanation links for a specific question topic.
@@ -70,22 +196,239 @@ class SearchService:
         return self.search(query, max_results=3)
 
 
+def _video(video_id: str, title: str) -> Dict:
+    return {
+        'video_id': video_id,
+        'title': title,
+        'url': f"https://www.youtube.com/watch?v={video_id}",
+        'embed_url': f"https://www.youtube.com/embed/{video_id}",
+    }
+
+
+class VideoProvider:
+    """Base class for video search backends used by YouTubeService."""
+    
+    name = "base"
+    
+    def warm_up(self):
+        """Do one-time setup (imports, clients) on the worker thread."""
+    
+    def search(self, query: str, max_results: int) -> List[Dict]:
+        """
+        Run one video search.
+        
+        Returns:
+            Videos with video_id, title, url and embed_url; raises on failure
+        """
+        raise NotImplementedError
+
+
+class YtDlpProvider(VideoProvider):
+    """YouTube search through yt_dlp, with one configured YoutubeDL per worker thread."""
+    
+    name = "yt_dlp"
+    
+    def __init__(self):
+        self._local = threading.local()
+    
+    def _client(self):
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            from yt_dlp import YoutubeDL
+            ydl = YoutubeDL({
+                'quiet': True,
+                'extract_flat': True,
+                'skip_download': True,
+                'socket_timeout': YOUTUBE_SOCKET_TIMEOUT,
+            })
+            self._local.ydl = ydl
+        return ydl
+    
+    def warm_up(self):
+        self._client()
+    
+    def search(self, query: str, max_results: int) -> List[Dict]:
+        search_results = self._client().extract_info(f"ytsearch{max_results}:{query}", download=False)
+        return [
+            _video(entry.get('id', ''), entry.get('title', ''))
+            for entry in search_results.get('entries') or []
+            if entry
+        ]
+
+
+class StaticVideoProvider(VideoProvider):
+    """Offline provider for tests: canned videos or a callable."""
+    
+    name = "static"
+    
+    def __init__(self, results: Optional[Dict[str, List[Dict]]] = None, handler: Optional[Callable[[str, int], List[Dict]]] = None):
+        """
+        Args:
+            results: Videos by normalized query
+            handler: Called for queries not in results
+        """
+        self.results = {normalize_query(q): r for q, r in (results or {}).items()}
+        self.handler = handler
+        self.calls = 0
+    
+    def search(self, query: str, max_results: int) -> List[Dict]:
+        self.calls += 1
+        results = self.results.get(normalize_query(query))
+        if results is None and self.handler is not None:
+            results = self.handler(query, max_results)
+        return (results or [])[:max_results]
+
+
+class VideoLookupWorker:
+    """
+    Long-lived worker threads that run video searches from a queue.
+    
+    Each thread warms the provider once, so the yt_dlp import and
+    YoutubeDL setup are paid at startup rather than per search.
+    """
+    
+    def __init__(self, provider: VideoProvider, workers: int = YOUTUBE_WORKERS, max_queue: int = 64):
+        """
+        Args:
+            provider: Video search backend
+            workers: Searches run at once
+            max_queue: Searches waiting beyond that before submit() rejects
+        """
+        self.provider = provider
+        self.workers = workers
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"youtube-lookup-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+    
+    def _run(self):
+        try:
+            self.provider.warm_up()
+        except Exception as e:
+            print(f"YouTube provider warm-up failed: {e}")
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            future, query, max_results = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self.provider.search(query, max_results))
+            except Exception as e:
+                future.set_exception(e)
+    
+    def submit(self, query: str, max_results: int) -> Future:
+        """Queue a search; raises queue.Full when the worker is saturated."""
+        self.start()
+        future: Future = Future()
+        self._queue.put_nowait((future, query, max_results))
+        return future
+    
+    def stop(self):
+        """Stop the worker threads after queued searches finish."""
+        with self._lock:
+            for _ in self._threads:
+                self._queue.put(None)
+            self._threads = []
+    
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+
 class YouTubeService:
     """Service for YouTube video search and embedding."""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        provider: Optional[VideoProvider] = None,
+        cache: Optional[ResultCache] = None,
+        workers: int = YOUTUBE_WORKERS,
+        deadline: float = YOUTUBE_QUERY_DEADLINE,
+        local_index: Optional[ResourceIndex] = None,
+        breaker: Optional[CircuitBreaker] = None
+    ):
         """
         Initialize YouTube service.
         
         Args:
             api_key: Optional YouTube API key (if not provided, uses web scraping)
+            provider: Video search backend (defaults to yt_dlp)
+            cache: Result cache (defaults to a TTL cache with a SQLite tier)
+            workers: Concurrent lookups
+            deadline: Seconds a caller waits for one lookup (less if the
+                request's own deadline is closer)
+            local_index: Curated videos searched first (defaults to the shared index)
+            breaker: Circuit breaker for the provider (defaults to the shared one)
         """
         self.api_key = api_key
+        self.provider = provider or YtDlpProvider()
+        self.local_index = local_index or get_resource_index()
+        self.worker = VideoLookupWorker(self.provider, workers=workers)
+        self.deadline = deadline
+        self.breaker = breaker or get_breaker(f"youtube:{self.provider.name}")
+        self.cache = cache or ResultCache(
+            "youtube_results",
+            ttl=YOUTUBE_CACHE_TTL,
+            stale_ttl=YOUTUBE_CACHE_STALE_TTL,
+            max_entries=YOUTUBE_CACHE_MAX_ENTRIES,
+            db_path=YOUTUBE_CACHE_PATH
+        )
+    
+    def start(self):
+        """Start the lookup worker now so the first search skips the warm-up."""
+        self.worker.start()
+    
+    def _lookup(self, key: str, query: str, max_results: int) -> List[Dict]:
+        timeout = budget(self.deadline)
+        self.breaker.before_call()
+        try:
+            future = self.worker.submit(query, max_results)
+        except queue.Full:
+            # Saturated here, not failing upstream
+            self.breaker.release()
+            raise
+        try:
+            with stage("youtube_live"):
+                result = future.result(timeout=timeout)
+        except FuturesTimeoutError:
+            # Only a lookup that used its full deadline counts against the provider
+            if timeout >= self.deadline:
+                self.breaker.record_failure()
+            else:
+                self.breaker.release()
+            # Let the lookup finish in the background so the next request hits
+            future.add_done_callback(
+                lambda f: self.cache.put(key, f.result()) if f.exception() is None else None
+            )
+            raise DeadlineExceeded(f"lookup exceeded {timeout:.1f}s deadline")
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
     
+    @stage("youtube")
     def search_videos(self, query: str, max_results: int = 5) -> List[Dict]:
         """
         Search for YouTube videos.
         
+        Curated local videos that match the query well come first and live
+        lookups only fill the remaining slots. Live results are cached per normalized query; a
+        lookup that misses the deadline returns the search-page fallback
+        (or just the local videos) and fills the cache later. While the
+        provider's breaker is open the fallback is returned immediately.
+        
         Args:
             query: Search query
             max_results: Maximum number of results
@@ -93,37 +436,23 @@ class YouTubeService:
         Returns:
             List of video results with title, description, and video ID
         """
-        try:
-            from yt_dlp import YoutubeDL
-            
-            ydl_opts = {
-                'quiet': True,
-                'extract_flat': True,
-                'default_search': 'ytsearch',
-                'max_results': max_results,
-            }
-            
-            videos = []
-            with YoutubeDL(ydl_opts) as ydl:
-                search_results = ydl.extract_info(query, download=False)
-                
-                if 'entries' in search_results:
-                    for entry in search_results['entries']:
-                        if entry:
-                            video_id = entry.get('id', '')
-                            title = entry.get('title', '')
-                            url = f"https://www.youtube.com/watch?v={video_id}"
-                            
-                            videos.append({
-                                'video_id': video_id,
-                                'title': title,
-                                'url': url,
-                                'embed_url': f"https://www.youtube.com/embed/{video_id}",
-                            })
-            
+        videos = [
+            _video(r['video_id'], r['title'])
+            for r in self.local_index.search(query, kind='video', limit=max_results)
+        ]
+        if len(videos) >= max_results:
             return videos
+        
+        key = f"{self.provider.name}:{max_results}:{normalize_query(query)}"
+        try:
+            live = self.cache.get_or_fetch(key, lambda: self._lookup(key, query, max_results))
+            seen = {video['video_id'] for video in videos}
+            videos.extend(dict(video) for video in live if video.get('video_id') not in seen)
+            return videos[:max_results]
         except Exception as e:
             print(f"YouTube search error: {e}")
+            if videos:
+                return videos
             # Fallback: return search query for manual lookup
             return [{
                 'video_id': None,
@@ -132,6 +461,7 @@ class YouTubeService:
                 'embed_url': None,
             }]
     
+    @traced()
     def search_sat_explanations(self, topic: str, max_results: int = 3) -> List[Dict]:
         """
         Search for SAT explanation videos.
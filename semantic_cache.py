@@ -0,0 +1,365 @@
+"""
+Semantic Answer Cache
+Answers keyed by query embedding, so paraphrased questions ("what is slope
+intercept form" / "explain y=mx+b") reuse an earlier answer
+
+Each namespace (model and retrieval settings) holds a fixed-size matrix of
+unit-length query embeddings; a lookup is one matrix-vector product, exact
+and well under a millisecond at a few thousand entries. A hit needs a cosine
+similarity of at least threshold. A sample of hits is audited in the
+background: the new query's own retrieval is compared with the documents the
+cached answer was built from, and a low overlap is counted and logged as a
+false hit so the threshold can be tuned.
+"""
+
+import copy
+import logging
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import (
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_TTL,
+    SEMANTIC_CACHE_REVALIDATE_AFTER,
+    SEMANTIC_CACHE_AUDIT_RATE,
+    SEMANTIC_CACHE_AUDIT_MIN_OVERLAP
+)
+from metrics import register_cache_stats
+
+logger = logging.getLogger("semantic_cache")
+
+# Recent false hits kept for get_false_hits()
+FALSE_HIT_LOG_SIZE = 100
+
+# Audits and revalidations for every semantic cache in the process
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+_caches: "weakref.WeakSet[SemanticCache]" = weakref.WeakSet()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="semantic-cache")
+        return _executor
+
+
+def _overlap(a: Sequence[str], b: Sequence[str]) -> float:
+    """Jaccard overlap of two document ID lists (1.0 when both are empty)."""
+    a, b = set(a), set(b)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class _Namespace:
+    """Embedding matrix and entries of one namespace; slots are reused on eviction."""
+
+    def __init__(self, dim: int, capacity: int):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.entries: List[Optional[Dict[str, Any]]] = [None] * capacity
+        # time.time() each slot's value was stored, so expired slots are masked in one operation
+        self.stored_at = np.full(capacity, -np.inf)
+        self.size = 0
+
+    def free_slot(self) -> int:
+        if self.size < len(self.entries):
+            self.size += 1
+            return self.size - 1
+        # Full: reuse the least recently used slot
+        return min(range(self.size), key=lambda i: self.entries[i]['used_at'] if self.entries[i] else -1.0)
+
+
+class SemanticCache:
+    """
+    Thread-safe semantic cache of answers.
+
+    - lookup() returns the entry of the most similar cached query when the
+      cosine similarity reaches threshold and the entry is younger than ttl
+    - entries older than revalidate_after are still served, and a refresh
+      function given to lookup() rebuilds them in the background
+    - each namespace keeps at most max_entries; the least recently used
+      entry makes room for a new one
+    - generation() (e.g. the knowledge base version) is checked on every
+      call; when it changes every namespace is dropped
+
+    Entries live in the memory of one process.
+    """
+
+    def __init__(
+        self,
+        name: str = "semantic_answers",
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        revalidate_after: float = SEMANTIC_CACHE_REVALIDATE_AFTER,
+        audit_rate: float = SEMANTIC_CACHE_AUDIT_RATE,
+        audit_min_overlap: float = SEMANTIC_CACHE_AUDIT_MIN_OVERLAP,
+        generation: Optional[Callable[[], Any]] = None
+    ):
+        """
+        Initialize semantic cache.
+
+        Args:
+            name: Cache name in metrics
+            threshold: Minimum cosine similarity of a hit
+            max_entries: Entries kept per namespace
+            ttl: Seconds an entry may be served
+            revalidate_after: Age in seconds after which a hit is refreshed in
+                the background (0 disables revalidation)
+            audit_rate: Share of hits audited against a fresh retrieval
+            audit_min_overlap: Document overlap below which an audited hit
+                counts as a false hit
+            generation: Callable whose value changing invalidates the cache
+        """
+        self.name = name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.revalidate_after = revalidate_after
+        self.audit_rate = audit_rate
+        self.audit_min_overlap = audit_min_overlap
+        self.generation = generation
+        self._generation = generation() if generation else None
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.Lock()
+        self._revalidating: set = set()
+        self._false_hits: Deque[Dict[str, Any]] = deque(maxlen=FALSE_HIT_LOG_SIZE)
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'errors': 0,
+                      'evictions': 0, 'audits': 0, 'false_hits': 0}
+        _caches.add(self)
+
+    def _check_generation(self):
+        if self.generation is None:
+            return
+        current = self.generation()
+        if current != self._generation:
+            self.clear()
+            self._generation = current
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        # Failed embeddings come back as zero vectors; never cache or match those
+        return vector / norm if norm > 0 else None
+
+    def lookup(
+        self,
+        namespace: str,
+        embedding: Sequence[float],
+        query: str,
+        audit: Optional[Callable[[], List[str]]] = None,
+        refresh: Optional[Callable[[], Tuple[Dict[str, Any], List[str]]]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for a query.
+
+        Args:
+            namespace: Namespace (e.g. model and retrieval settings)
+            embedding: Query embedding
+            query: Query text (for audits and logs)
+            audit: Returns the document IDs a fresh retrieval would use; run
+                in the background for a sample of hits
+            refresh: Returns a fresh (value, doc_ids); run in the background
+                for hits older than revalidate_after
+
+        Returns:
+            {'value', 'query', 'similarity', 'age'} of the hit, or None;
+            value is a copy the caller may modify
+        """
+        self._check_generation()
+        vector = self._unit(embedding)
+        now = time.time()
+        with self._lock:
+            if vector is None:
+                self.stats['errors'] += 1
+                return None
+            ns = self._namespaces.get(namespace)
+            if ns is None or ns.size == 0 or ns.vectors.shape[1] != vector.shape[0]:
+                self.stats['misses'] += 1
+                return None
+            # Expired entries are masked out so a valid one just below them can match
+            similarities = np.where(ns.stored_at[:ns.size] >= now - self.ttl, ns.vectors[:ns.size] @ vector, -np.inf)
+            slot = int(np.argmax(similarities))
+            similarity = float(similarities[slot])
+            entry = ns.entries[slot]
+            if entry is None or similarity < self.threshold:
+                self.stats['misses'] += 1
+                return None
+            entry['used_at'] = now
+            entry['hits'] += 1
+            value, stored_at = entry['value'], entry['stored_at']
+            stale = bool(self.revalidate_after) and now - entry['stored_at'] > self.revalidate_after
+            self.stats['stale_hits' if stale else 'hits'] += 1
+
+        if stale and refresh is not None:
+            self._revalidate(namespace, entry, refresh)
+        if audit is not None and random.random() < self.audit_rate:
+            _get_executor().submit(self._audit, query, similarity, entry, audit)
+        return {
+            'value': copy.deepcopy(value),
+            'query': entry['query'],
+            'similarity': round(similarity, 4),
+            'age': round(now - stored_at, 1)
+        }
+
+    def store(
+        self,
+        namespace: str,
+        embedding: Sequence[float],
+        query: str,
+        value: Dict[str, Any],
+        doc_ids: Sequence[str] = ()
+    ):
+        """
+        Cache an answer.
+
+        Args:
+            namespace: Namespace (e.g. model and retrieval settings)
+            embedding: Query embedding
+            query: Query text
+            value: Answer to return on later hits (copied)
+            doc_ids: IDs of the documents the answer was built from
+        """
+        self._check_generation()
+        vector = self._unit(embedding)
+        if vector is None:
+            return
+        value = copy.deepcopy(value)
+        now = time.time()
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None or ns.vectors.shape[1] != vector.shape[0]:
+                ns = self._namespaces[namespace] = _Namespace(vector.shape[0], self.max_entries)
+            # A near-identical query replaces its entry instead of taking a slot
+            similarities = ns.vectors[:ns.size] @ vector if ns.size else np.zeros(0)
+            if similarities.size and float(similarities.max()) >= 0.999:
+                slot = int(np.argmax(similarities))
+            else:
+                slot = ns.free_slot()
+                if ns.entries[slot] is not None:
+                    self.stats['evictions'] += 1
+            ns.vectors[slot] = vector
+            ns.stored_at[slot] = now
+            ns.entries[slot] = {
+                'query': query,
+                'value': value,
+                'doc_ids': list(doc_ids),
+                'stored_at': now,
+                'used_at': now,
+                'hits': 0
+            }
+
+    def _revalidate(
+        self,
+        namespace: str,
+        entry: Dict[str, Any],
+        refresh: Callable[[], Tuple[Dict[str, Any], List[str]]]
+    ):
+        key = (namespace, id(entry))
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def run():
+            try:
+                value, doc_ids = refresh()
+                now = time.time()
+                with self._lock:
+                    entry['value'] = value
+                    entry['doc_ids'] = list(doc_ids)
+                    entry['stored_at'] = now
+                    ns = self._namespaces.get(namespace)
+                    if ns is not None:
+                        for slot in range(ns.size):
+                            if ns.entries[slot] is entry:
+                                ns.stored_at[slot] = now
+                                break
+            except Exception as e:
+                with self._lock:
+                    self.stats['errors'] += 1
+                logger.warning(f"Revalidation of {entry['query']!r} failed: {e}")
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+
+        _get_executor().submit(run)
+
+    def _audit(self, query: str, similarity: float, entry: Dict[str, Any], audit: Callable[[], List[str]]):
+        try:
+            fresh_ids = audit()
+        except Exception as e:
+            logger.warning(f"Audit of {query!r} failed: {e}")
+            return
+        overlap = _overlap(fresh_ids, entry['doc_ids'])
+        with self._lock:
+            self.stats['audits'] += 1
+            if overlap >= self.audit_min_overlap:
+                return
+            self.stats['false_hits'] += 1
+        record = {
+            'query': query,
+            'cached_query': entry['query'],
+            'similarity': round(similarity, 4),
+            'doc_overlap': round(overlap, 3),
+            'at': time.time()
+        }
+        self._false_hits.append(record)
+        logger.warning(
+            f"Semantic cache false hit: {query!r} served the answer to {entry['query']!r} "
+            f"(similarity {similarity:.3f}, document overlap {overlap:.2f})"
+        )
+
+    def get_false_hits(self) -> List[Dict[str, Any]]:
+        """Most recent audited false hits, newest last."""
+        return list(self._false_hits)
+
+    def clear(self):
+        """Drop every namespace."""
+        with self._lock:
+            self._namespaces.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus entries held and hit ratio."""
+        with self._lock:
+            entries = sum(sum(1 for e in ns.entries[:ns.size] if e is not None) for ns in self._namespaces.values())
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        served = stats['hits'] + stats['stale_hits']
+        audits = stats['audits']
+        return {
+            **stats,
+            'entries': entries,
+            'hit_ratio': round(served / lookups, 3) if lookups else 0.0,
+            'false_hit_ratio': round(stats['false_hits'] / audits, 3) if audits else 0.0
+        }
+
+
+def semantic_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """get_stats() of every live semantic cache by name (caches sharing a name are summed)."""
+    totals: Dict[str, Dict[str, Any]] = {}
+    for cache in list(_caches):
+        stats = cache.get_stats()
+        total = totals.setdefault(cache.name, dict.fromkeys(stats, 0))
+        for key, value in stats.items():
+            total[key] += value
+    for total in totals.values():
+        lookups = total['hits'] + total['stale_hits'] + total['misses']
+        total['hit_ratio'] = round((total['hits'] + total['stale_hits']) / lookups, 3) if lookups else 0.0
+        total['false_hit_ratio'] = round(total['false_hits'] / total['audits'], 3) if total['audits'] else 0.0
+    return totals
+
+
+register_cache_stats(semantic_cache_stats)
@@ -0,0 +1,164 @@
+"""
+Production Server
+Pre-forking multi-worker runner for the API servers
+
+The master imports the heavy libraries once (SERVER_PRELOAD_MODULES), binds
+the listening socket and forks the workers, so the libraries are shared
+copy-on-write and every worker accepts on the same socket. Each worker then
+imports the app and builds its own services: SQLite connections, Chroma's
+client and worker threads do not survive a fork. Cross-worker state lives
+in shared files instead (Chroma index, search/YouTube cache, question banks,
+runtime settings for model swaps, metrics). Dead workers are respawned.
+
+Usage:
+    python serve.py sat_api_server:app --workers 4 --port 8001
+    python serve.py api_server:app --workers 2
+"""
+
+import argparse
+import glob
+import importlib
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+from config import API_SERVER_PORT, SERVER_WORKERS, SERVER_PRELOAD_MODULES, METRICS_MULTIPROC_DIR
+from runtime_settings import runtime_settings
+
+# A worker that dies sooner than this after starting is respawned after a pause
+MIN_WORKER_UPTIME = 1.0
+
+
+def preload(modules):
+    """Import modules in the master so forked workers share them."""
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"⚠️ Preload skipped {name}: {e}")
+
+
+def prepare_metrics_dir(path: str):
+    """
+    Point every worker's Prometheus client at an empty shared directory.
+
+    Has to run before prometheus_client is first imported.
+    """
+    os.makedirs(path, exist_ok=True)
+    for stale in glob.glob(os.path.join(path, "*.db")):
+        os.remove(stale)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.path.abspath(path)
+
+
+def worker_exited(pid: int):
+    """Drop a dead worker's live gauges (in-flight requests) from the merged metrics."""
+    try:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
+    except ImportError:
+        pass
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app: str, sock: socket.socket, log_level: str):
+    """Serve the app on the inherited socket until told to stop."""
+    import uvicorn
+
+    # Restore default handlers; uvicorn installs its own for a graceful shutdown
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+
+class Master:
+    """Forks, supervises and stops the worker processes."""
+
+    def __init__(self, app: str, workers: int, host: str, port: int, log_level: str = "info"):
+        self.app = app
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.log_level = log_level
+        self.children: Dict[int, float] = {}
+        self.stopping = False
+        self.sock = None
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app, self.sock, self.log_level)
+            except BaseException as e:
+                print(f"❌ Worker {os.getpid()} failed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        prepare_metrics_dir(METRICS_MULTIPROC_DIR)
+        preload(SERVER_PRELOAD_MODULES)
+        self.sock = bind_socket(self.host, self.port)
+        # Settings broadcast between workers only last for this server run
+        runtime_settings.reset()
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        print(f"🚀 Serving {self.app} on http://{self.host}:{self.port} with {self.workers} workers")
+        for _ in range(self.workers):
+            self.spawn()
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.children.pop(pid, None)
+            worker_exited(pid)
+            if self.stopping or started is None:
+                continue
+            print(f"⚠️ Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; respawning")
+            if time.monotonic() - started < MIN_WORKER_UPTIME:
+                time.sleep(MIN_WORKER_UPTIME)
+            if not self.stopping:
+                self.spawn()
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an API server with multiple worker processes")
+    parser.add_argument("app", nargs="?", default="sat_api_server:app", help="module:attribute of the ASGI app")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=API_SERVER_PORT)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    # Workers import the app by name, like uvicorn does, from the project directory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    Master(args.app, args.workers, args.host, args.port, args.log_level).run()
+
+
+if __name__ == "__main__":
+    main()
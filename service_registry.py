@@ -0,0 +1,63 @@
+"""
+Service Registry
+Lazily constructs shared services (agents, RAG, search) on first use
+"""
+
+import threading
+from typing import Any, Callable, Dict, List
+
+
+class ServiceRegistry:
+    """Process-wide registry of lazily built, shared service instances."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """
+        Register a factory for a service.
+
+        Args:
+            name: Service name
+            factory: Zero-argument callable that builds the service; heavy
+                imports belong inside it so they are deferred too
+        """
+        with self._lock:
+            self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        """Get a service, building it on first use."""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            # Another thread may have built it while we waited
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Service not registered: {name}")
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def reset(self, *names: str):
+        """Drop built instances so the next get() rebuilds them."""
+        with self._lock:
+            for name in names:
+                self._instances.pop(name, None)
+
+    def is_initialized(self, name: str) -> bool:
+        """Check whether a service has been built."""
+        return name in self._instances
+
+    def initialized(self) -> List[str]:
+        """Names of services built so far."""
+        return list(self._instances)
+
+    def names(self) -> List[str]:
+        """Names of all registered services."""
+        return list(self._factories)
+
+
+registry = ServiceRegistry()
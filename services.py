@@ -0,0 +1,166 @@
+"""
+API Services
+Factories for the services shared by the API routers, registered on the
+process-wide registry so each is built once, on first use or during warm-up
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable
+
+from config import OLLAMA_MODEL, SEMANTIC_CACHE_ENABLED
+from metrics import register_queue
+from runtime_settings import runtime_settings
+from service_registry import registry
+
+logger = logging.getLogger("services")
+
+
+# Heavy imports stay inside the factories so building the app stays cheap
+def _create_rag_engine():
+    from rag_engine import RAGEngine
+    return RAGEngine()
+
+
+def _create_search_service():
+    from search_service import SearchService
+    return SearchService()
+
+
+def _create_youtube_service():
+    from search_service import YouTubeService
+    return YouTubeService()
+
+
+def _create_conversation_memory():
+    from conversation_memory import ConversationMemory
+    return ConversationMemory()
+
+
+def _create_semantic_cache():
+    from semantic_cache import SemanticCache
+    # A knowledge base upload in any worker invalidates the cached answers
+    return SemanticCache(generation=lambda: runtime_settings.get("kb_version"))
+
+
+def _create_agent():
+    from ollama_agent import OllamaAgent
+    # A worker started after a model swap uses the swapped model
+    model = runtime_settings.get("ollama_model") or OLLAMA_MODEL
+    # Sessions outlive the agent, which is rebuilt on model swaps
+    return OllamaAgent(
+        model=model,
+        use_rag=True,
+        rag_engine=registry.get('rag_engine'),
+        memory=registry.get('conversation_memory'),
+        answer_cache=registry.get('semantic_cache') if SEMANTIC_CACHE_ENABLED else None
+    )
+
+
+def _create_sat_agent():
+    from sat_agent import SATAgent
+    return SATAgent(
+        model="llama3.2",
+        use_rag=False,
+        use_search=False,
+        use_youtube=False,
+        memory=registry.get('conversation_memory')
+    )
+
+
+def _create_question_generator():
+    from gemini_generator import GeminiSATGenerator
+    return GeminiSATGenerator()
+
+
+def _create_mock_test_client():
+    from mock_test_mcp_client import mcp_client
+    return mcp_client
+
+
+registry.register('rag_engine', _create_rag_engine)
+registry.register('search_service', _create_search_service)
+registry.register('youtube_service', _create_youtube_service)
+registry.register('conversation_memory', _create_conversation_memory)
+registry.register('semantic_cache', _create_semantic_cache)
+registry.register('agent', _create_agent)
+registry.register('sat_agent', _create_sat_agent)
+registry.register('question_generator', _create_question_generator)
+registry.register('mock_test_client', _create_mock_test_client)
+
+
+def _reload_vector_store(_):
+    from vector_store import reload_clients
+    reload_clients()
+
+
+# Changes broadcast by other workers (see runtime_settings)
+runtime_settings.subscribe("ollama_model", lambda _: registry.reset('agent'))
+runtime_settings.subscribe("kb_version", _reload_vector_store)
+
+
+def _youtube_queue_depth() -> int:
+    if not registry.is_initialized('youtube_service'):
+        return 0
+    return registry.get('youtube_service').worker.queue_depth()
+
+
+def _mock_test_calls_in_flight() -> int:
+    if not registry.is_initialized('mock_test_client'):
+        return 0
+    return sum(session['in_flight'] for session in registry.get('mock_test_client').pool.get_stats())
+
+
+register_queue('youtube_lookup', _youtube_queue_depth)
+register_queue('mock_test_mcp', _mock_test_calls_in_flight)
+
+
+async def _start_youtube(service):
+    service.start()
+
+
+async def _connect_mock_tests(client):
+    if not await client.connect():
+        logger.warning("⚠️ Mock test MCP server not ready; sessions keep retrying in the background")
+
+
+# Run once a service is built during warm-up
+WARMUP_HOOKS: Dict[str, Callable[[Any], Awaitable[None]]] = {
+    'youtube_service': _start_youtube,
+    'mock_test_client': _connect_mock_tests,
+}
+
+
+async def get_service(name: str):
+    """Get a service, building it in a worker thread so the loop stays free."""
+    if registry.is_initialized(name):
+        return registry.get(name)
+    return await asyncio.to_thread(registry.get, name)
+
+
+async def warm_up(names: Iterable[str]):
+    """
+    Build services ahead of the first request and run their warm-up hooks.
+
+    A service that fails to build is logged and left for first use.
+    """
+    for name in names:
+        try:
+            service = await get_service(name)
+            hook = WARMUP_HOOKS.get(name)
+            if hook is not None:
+                await hook(service)
+            logger.info(f"🔥 Warmed up {name}")
+        except Exception as e:
+            logger.error(f"❌ Warm-up of {name} failed: {e}")
+
+
+async def shutdown():
+    """Release what the built services hold open."""
+    if registry.is_initialized('conversation_memory'):
+        registry.get('conversation_memory').spill_all()
+    if registry.is_initialized('mock_test_client'):
+        await registry.get('mock_test_client').disconnect()
+    if registry.is_initialized('question_generator'):
+        import gemini_client
+        await gemini_client.aclose()
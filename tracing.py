@@ -0,0 +1,382 @@
+"""
+Tracing
+Lightweight span tracing across retrieval, generation and enrichment,
+exported as OpenTelemetry traces (OTLP JSON)
+
+Spans live in memory until their trace's root span (the API request or MCP
+tool call) ends. The whole trace is then exported if it was slow, had an
+error or was randomly sampled, and dropped otherwise (tail sampling), so the
+hot path never waits on I/O. A background thread appends one OTLP JSON line
+per trace to TRACE_EXPORT_PATH and, with TRACE_OTLP_ENDPOINT set, posts it
+to a collector.
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import (
+    TRACING_ENABLED,
+    TRACE_EXPORT_PATH,
+    TRACE_OTLP_ENDPOINT,
+    TRACE_SERVICE_NAME,
+    TRACE_SLOW_THRESHOLD,
+    TRACE_SAMPLE_RATE
+)
+
+logger = logging.getLogger("tracing")
+
+# OTLP enum values
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# Spans kept per trace; a long ingestion run does not grow without bound
+MAX_SPANS_PER_TRACE = 512
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class _Trace:
+    """Spans of one trace buffered until its local root ends."""
+
+    __slots__ = ('trace_id', 'root', 'spans', 'error', 'force', 'decided', 'kept', 'dropped')
+
+    def __init__(self, trace_id: str, force: bool = False):
+        self.trace_id = trace_id
+        self.root: Optional[Span] = None
+        self.spans: List[Span] = []
+        self.error = False
+        self.force = force
+        self.decided = False
+        self.kept = False
+        self.dropped = 0
+
+
+class Span:
+    """One timed operation; use span() or traced() rather than building one directly."""
+
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'kind', 'start_ns', 'end_ns',
+                 'attributes', 'status', 'status_message')
+
+    def __init__(self, trace: _Trace, parent_id: Optional[str], name: str, kind: int, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        trace = self.trace
+        if trace.decided:
+            # Outlived its root (e.g. a background refresh): follows the root's decision
+            if trace.kept:
+                exporter.submit([self])
+            return
+        if self.status == STATUS_ERROR:
+            trace.error = True
+        if len(trace.spans) < MAX_SPANS_PER_TRACE:
+            trace.spans.append(self)
+        else:
+            trace.dropped += 1
+        if self is trace.root:
+            _finish(trace, self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        otlp = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': k, 'value': _otlp_value(v)} for k, v in self.attributes.items()],
+            'status': {'code': self.status, 'message': self.status_message} if self.status_message else {'code': self.status}
+        }
+        if self.parent_id:
+            otlp['parentSpanId'] = self.parent_id
+        return otlp
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _finish(trace: _Trace, root: Span):
+    """Tail sampling: keep slow, failed, forced or randomly sampled traces."""
+    duration = (root.end_ns - root.start_ns) / 1e9
+    trace.kept = (
+        trace.force
+        or trace.error
+        or duration >= TRACE_SLOW_THRESHOLD
+        or random.random() < TRACE_SAMPLE_RATE
+    )
+    trace.decided = True
+    if trace.kept:
+        if trace.dropped:
+            root.set_attribute('trace.dropped_spans', trace.dropped)
+        exporter.submit(trace.spans)
+    trace.spans = []
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """
+    Parse a W3C traceparent header.
+
+    Returns:
+        (trace_id, parent_span_id, sampled), or None if absent or malformed
+    """
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32:
+        return None
+    return parts[1], parts[2], sampled
+
+
+@contextmanager
+def span(
+    name: str,
+    kind: int = SPAN_KIND_INTERNAL,
+    traceparent: Optional[str] = None,
+    **attributes: Any
+) -> Iterator[Optional[Span]]:
+    """
+    Run a block as a span, nested under the current span if there is one.
+
+    Args:
+        name: Span name
+        kind: SPAN_KIND_INTERNAL, SPAN_KIND_SERVER or SPAN_KIND_CLIENT
+        traceparent: W3C header of an upstream caller; starts a new local
+            root in that trace (a sampled upstream trace is always kept)
+        attributes: Span attributes
+
+    Yields:
+        The span, or None when tracing is disabled
+    """
+    if not TRACING_ENABLED:
+        yield None
+        return
+
+    parent = _current.get()
+    upstream = parse_traceparent(traceparent) if traceparent else None
+    if upstream is not None:
+        trace_id, parent_id, sampled = upstream
+        trace = _Trace(trace_id, force=sampled)
+    elif parent is not None:
+        trace, parent_id = parent.trace, parent.span_id
+    else:
+        trace, parent_id = _Trace(f"{random.getrandbits(128):032x}"), None
+
+    current = Span(trace, parent_id, name, kind, attributes)
+    if trace.root is None:
+        trace.root = current
+    token = _current.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.set_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current.reset(token)
+        current.end()
+
+
+def traced(name: Optional[str] = None, kind: int = SPAN_KIND_INTERNAL) -> Callable:
+    """Decorator running each call of a function or coroutine function as a span."""
+    def decorator(fn: Callable) -> Callable:
+        if not TRACING_ENABLED:
+            return fn
+        span_name = name or fn.__qualname__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, kind):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_trace_id() -> Optional[str]:
+    """Trace ID of the current request, for logs and response headers."""
+    current = _current.get()
+    return current.trace_id if current is not None else None
+
+
+def set_attributes(**attributes: Any):
+    """Add attributes to the current span (no-op outside a span)."""
+    current = _current.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+class TraceExporter:
+    """Background thread writing sampled traces as OTLP JSON to a file and/or a collector."""
+
+    def __init__(
+        self,
+        path: Optional[str] = TRACE_EXPORT_PATH,
+        endpoint: Optional[str] = TRACE_OTLP_ENDPOINT,
+        service_name: str = TRACE_SERVICE_NAME,
+        max_queue: int = 1024
+    ):
+        """
+        Initialize trace exporter.
+
+        Args:
+            path: JSON lines file (one OTLP export request per line), or None
+            endpoint: OTLP/HTTP collector base URL, or None
+            service_name: service.name resource attribute
+            max_queue: Traces waiting for export before new ones are dropped
+        """
+        self.path = path
+        self.endpoint = endpoint.rstrip("/") if endpoint else None
+        self.service_name = service_name
+        self.max_queue = max_queue
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._queue: Optional[queue.Queue] = None
+        self._client = None
+
+    def _ensure_started(self) -> queue.Queue:
+        # Threads do not survive a fork; each server worker starts its own
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._client = None
+                threading.Thread(target=self._run, args=(self._queue,), name="trace-exporter", daemon=True).start()
+            return self._queue
+
+    def submit(self, spans: List[Span]):
+        """Queue finished spans for export; drops them if the exporter is behind."""
+        if not spans or not (self.path or self.endpoint):
+            return
+        try:
+            self._ensure_started().put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0):
+        """Wait (up to timeout) for queued traces to be exported."""
+        q = self._queue
+        if q is None or self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        while q.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _run(self, q: queue.Queue):
+        while True:
+            batches = [q.get()]
+            while len(batches) < 64:
+                try:
+                    batches.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.export([s for batch in batches for s in batch])
+            except Exception as e:
+                logger.warning(f"Trace export failed: {e}")
+            finally:
+                for _ in batches:
+                    q.task_done()
+
+    def payload(self, spans: List[Span]) -> Dict[str, Any]:
+        """OTLP ExportTraceServiceRequest for spans."""
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [
+                    {'key': 'service.name', 'value': {'stringValue': self.service_name}},
+                    {'key': 'process.pid', 'value': {'intValue': str(os.getpid())}}
+                ]},
+                'scopeSpans': [{
+                    'scope': {'name': 'sat_practice.tracing'},
+                    'spans': [s.to_otlp() for s in spans]
+                }]
+            }]
+        }
+
+    def export(self, spans: List[Span]):
+        body = json.dumps(self.payload(spans), separators=(",", ":"))
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # One write per line on an O_APPEND descriptor, so workers sharing
+            # the file do not interleave partial lines
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, (body + "\n").encode("utf-8"))
+            finally:
+                os.close(fd)
+        if self.endpoint:
+            import httpx
+            if self._client is None:
+                self._client = httpx.Client(timeout=5.0)
+            response = self._client.post(
+                f"{self.endpoint}/v1/traces",
+                content=body,
+                headers={"Content-Type": "application/json"}
+            )
+            response.raise_for_status()
+
+
+exporter = TraceExporter()
+
+
+def flush(timeout: float = 5.0):
+    """Export traces still queued (call on shutdown)."""
+    exporter.flush(timeout)
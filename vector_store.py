@@ -4,10 +4,115 @@ Uses ChromaDB for local vector storage
 """
 
 import os
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict, Optional
+import threading
+from typing import List, Dict, Optional, Tuple, Any
 from config import CHROMA_PERSIST_DIR, KNOWLEDGE_BASE_NAME
+from tracing import traced
+
+# One client per persist directory and one collection handle per name, shared
+# by every VectorStore in the process so the HNSW index is loaded only once.
+_clients: Dict[str, Any] = {}
+_collections: Dict[Tuple[str, str], Any] = {}
+_registry_lock = threading.Lock()
+
+
+def get_client(persist_dir: str = CHROMA_PERSIST_DIR):
+    """
+    Get the shared Chroma client for a persist directory.
+    
+    Args:
+        persist_dir: Chroma persistence directory
+        
+    Returns:
+        chromadb PersistentClient
+    """
+    key = os.path.abspath(persist_dir)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    
+    with _registry_lock:
+        if key not in _clients:
+            _clients[key] = _open_client(key)
+        return _clients[key]
+
+
+def _open_client(path: str):
+    # chromadb takes seconds to import, so defer it until a store is built
+    import chromadb
+    from chromadb.config import Settings
+    
+    # Create directory if it doesn't exist
+    os.makedirs(path, exist_ok=True)
+    return chromadb.PersistentClient(
+        path=path,
+        settings=Settings(
+            anonymized_telemetry=False,
+            allow_reset=True
+        )
+    )
+
+
+def get_collection(name: str, persist_dir: str = CHROMA_PERSIST_DIR):
+    """
+    Get the shared collection handle, creating the collection if needed.
+    
+    Args:
+        name: Collection name
+        persist_dir: Chroma persistence directory
+        
+    Returns:
+        chromadb Collection
+    """
+    key = (os.path.abspath(persist_dir), name)
+    collection = _collections.get(key)
+    if collection is not None:
+        return collection
+    
+    client = get_client(persist_dir)
+    with _registry_lock:
+        if key not in _collections:
+            _collections[key] = client.get_or_create_collection(
+                name=name,
+                metadata={"hnsw:space": "cosine"}
+            )
+        return _collections[key]
+
+
+def forget_collection(name: str, persist_dir: str = CHROMA_PERSIST_DIR):
+    """Drop a cached collection handle (after the collection is deleted)."""
+    with _registry_lock:
+        _collections.pop((os.path.abspath(persist_dir), name), None)
+
+
+def reload_clients():
+    """
+    Reopen every client and collection handle on a fresh view of the store.
+    
+    A client only sees the index as it was when it loaded it; call this
+    after another process (e.g. another server worker) wrote to the store.
+    It blocks while the index loads, so call it off the event loop.
+    
+    Chroma shares one system per directory between the clients it builds,
+    so its public clear_system_cache() is called first and
+    chromadb.PersistentClient() then opens the store afresh. The new handles
+    are swapped in under the lock. Collection handles taken before keep
+    working on the old system, which is released with the last of them.
+    """
+    with _registry_lock:
+        if not _clients:
+            return
+        next(iter(_clients.values())).clear_system_cache()
+        clients = {key: _open_client(key) for key in _clients}
+        collections = {
+            (path, name): clients[path].get_or_create_collection(name=name, metadata={"hnsw:space": "cosine"})
+            for path, name in _collections
+            if path in clients
+        }
+        _clients.clear()
+        _clients.update(clients)
+        _collections.clear()
+        _collections.update(collections)
 
 
 class VectorStore:
@@ -23,24 +128,20 @@ class VectorStore:
         self.collection_name = collection_name or KNOWLEDGE_BASE_NAME
         self.persist_dir = CHROMA_PERSIST_DIR
         
-        # Create directory if it doesn't exist
-        os.makedirs(self.persist_dir, exist_ok=True)
-        
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(
-            path=self.persist_dir,
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
-        )
-        
-        # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name=self.collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
+        # Shared client; building another VectorStore does not reload the index
+        get_collection(self.collection_name, self.persist_dir)
     
+    @property
+    def client(self):
+        """Shared client (stays valid across reload_clients())."""
+        return get_client(self.persist_dir)
+    
+    @property
+    def collection(self):
+        """Shared collection handle (stays valid across reset())."""
+        return get_collection(self.collection_name, self.persist_dir)
+    
+    @traced()
     def add_documents(
         self,
         documents: List[str],
@@ -69,6 +170,7 @@ class VectorStore:
             ids=ids
         )
     
+    @traced()
     def query(
         self,
         query_texts: List[str],
@@ -94,6 +196,7 @@ class VectorStore:
         
         return results
     
+    @traced()
     def get_all(self) -> List[Dict]:
         """Get all documents from the collection."""
         results = self.collection.get()
@@ -110,19 +213,18 @@ class VectorStore:
     
     def delete_collection(self):
         """Delete the collection."""
+        forget_collection(self.collection_name, self.persist_dir)
         self.client.delete_collection(name=self.collection_name)
     
     def reset(self):
         """Reset the collection (delete and recreate)."""
+        forget_collection(self.collection_name, self.persist_dir)
         try:
             self.client.delete_collection(name=self.collection_name)
         except:
             pass
         
-        self.collection = self.client.get_or_create_collection(
-            name=self.collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
+        get_collection(self.collection_name, self.persist_dir)
     
     def count(self) -> int:
         """Get number of documents in collection."""